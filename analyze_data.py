@@ -1,19 +1,335 @@
 import os
 import csv
-from collections import Counter, defaultdict
+import math
+import time
+import sqlite3
+import argparse
+import itertools
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
 import config
+import inventory
 import utils
 
+# PyMuPDF is only needed for the optional PDF metadata pass
+try:
+    import fitz
+except ImportError:
+    fitz = None
+
+# Display histogram bins for file sizes: (upper bound in bytes, label)
+SIZE_HISTOGRAM_BINS = [
+    (1024, "< 1 KB"),
+    (10 * 1024, "1 KB - 10 KB"),
+    (100 * 1024, "10 KB - 100 KB"),
+    (1024**2, "100 KB - 1 MB"),
+    (10 * 1024**2, "1 MB - 10 MB"),
+    (100 * 1024**2, "10 MB - 100 MB"),
+    (None, ">= 100 MB"),
+]
+
+# Display histogram bins for PDF page counts
+PAGE_HISTOGRAM_BINS = [
+    (1, "0 trang"),
+    (2, "1 trang"),
+    (3, "2 trang"),
+    (6, "3 - 5 trang"),
+    (11, "6 - 10 trang"),
+    (51, "11 - 50 trang"),
+    (101, "51 - 100 trang"),
+    (None, "> 100 trang"),
+]
+
+# Extra CSV columns written by the PDF metadata pass
+METADATA_FIELDNAMES = ["Pages", "Encrypted", "Producer", "HasFonts", "HasImages"]
+
+
+class StreamingStats:
+    """
+    Constant-memory summary of a stream of non-negative numbers.
+    Keeps count, min, max and sum exactly, and a log-bucketed sketch for
+    percentiles with bounded relative error (about `accuracy`, default 1%).
+    The sketch holds at most a few thousand buckets whatever the stream size.
+    """
+
+    def __init__(self, accuracy=0.01, bins=None):
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+        self.zeros = 0
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = Counter()
+        # Optional fixed display bins: list of (upper bound or None, label)
+        self.bins = bins
+        self.bin_counts = [0] * len(bins) if bins else []
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+        if value <= 0:
+            self.zeros += 1
+        else:
+            self.buckets[math.ceil(math.log(value) / self.log_gamma)] += 1
+
+        if self.bins:
+            for i, (upper, _) in enumerate(self.bins):
+                if upper is None or value < upper:
+                    self.bin_counts[i] += 1
+                    break
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0
+
+    def percentile(self, q):
+        """Approximate q-th percentile (0-100)."""
+        if not self.count:
+            return 0
+        rank = q / 100 * (self.count - 1)
+        if rank < self.zeros:
+            return 0
+        seen = self.zeros
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                estimate = 2 * self.gamma**index / (self.gamma + 1)
+                # Never report outside the exact observed range
+                return min(max(estimate, self.min), self.max)
+        return self.max
+
+    def histogram(self):
+        """Returns [(label, count)] for the fixed display bins."""
+        return [(label, n) for (_, label), n in zip(self.bins or [], self.bin_counts)]
+
+
+def read_pdf_metadata(path):
+    """
+    Reads the document metadata of one PDF with PyMuPDF, without extracting text.
+    Fonts/images are detected from the resource lists of the first
+    PDF_METADATA_SAMPLE_PAGES pages. Runs in a worker process.
+
+    Returns:
+        Dict with keys: pages, encrypted, producer, has_fonts, has_images, error
+    """
+    info = {
+        "pages": None,
+        "encrypted": False,
+        "producer": "",
+        "has_fonts": False,
+        "has_images": False,
+        "error": None,
+    }
+    try:
+        with fitz.open(path) as doc:
+            info["pages"] = doc.page_count
+            info["encrypted"] = bool(doc.is_encrypted)
+            info["producer"] = ((doc.metadata or {}).get("producer") or "").strip()
+            if doc.needs_pass:
+                return info
+            for pno in range(min(doc.page_count, config.PDF_METADATA_SAMPLE_PAGES)):
+                if not info["has_fonts"] and doc.get_page_fonts(pno):
+                    info["has_fonts"] = True
+                if not info["has_images"] and doc.get_page_images(pno):
+                    info["has_images"] = True
+                if info["has_fonts"] and info["has_images"]:
+                    break
+    except Exception as e:
+        info["error"] = str(e)
+    return info
+
+
+class PdfMetadataStats:
+    """Aggregates read_pdf_metadata results for the summary report."""
+
+    def __init__(self):
+        self.pages = StreamingStats(bins=PAGE_HISTOGRAM_BINS)
+        self.errors = 0
+        self.encrypted = 0
+        self.no_fonts = 0
+        self.with_images = 0
+        self.producers = Counter()
+
+    def add(self, info):
+        if info["error"] is not None:
+            self.errors += 1
+            return
+        self.pages.add(info["pages"])
+        self.encrypted += info["encrypted"]
+        self.no_fonts += not info["has_fonts"]
+        self.with_images += info["has_images"]
+        self.producers[info["producer"] or "(không rõ)"] += 1
+
+    def report_lines(self, workers):
+        lines = ["\n5. Thống kê nội dung PDF (metadata, không trích xuất text):"]
+        lines.append(f"   - Số PDF đọc được: {self.pages.count}")
+        lines.append(f"   - Không mở được: {self.errors}")
+        lines.append(f"   - Có mã hóa (encrypted): {self.encrypted}")
+        lines.append(
+            f"   - Không có font ở {config.PDF_METADATA_SAMPLE_PAGES} trang đầu "
+            f"(nhiều khả năng là file ảnh/scan): {self.no_fonts}"
+        )
+        lines.append(f"   - Có hình ảnh: {self.with_images}")
+        if not self.pages.count:
+            return lines
+
+        lines.append(f"   - Tổng số trang: {self.pages.total}")
+        lines.append(
+            f"   - Số trang: nhỏ nhất {self.pages.min}, lớn nhất {self.pages.max}, "
+            f"trung bình {self.pages.mean:.1f}"
+        )
+        lines.append(
+            "   - Phân vị số trang (xấp xỉ ±1%): "
+            + ", ".join(
+                f"P{q}: {self.pages.percentile(q):.0f}" for q in (50, 90, 99)
+            )
+        )
+        lines.append("   - Phân bố số trang:")
+        for label, count in self.pages.histogram():
+            lines.append(f"     {label:<16} {count}")
+
+        lines.append("   - Phần mềm tạo PDF (Producer) phổ biến:")
+        for producer, count in self.producers.most_common(5):
+            lines.append(f"     {producer}: {count}")
+
+        cpu_seconds = self.pages.total * config.EXTRACTION_SECONDS_PER_PAGE
+        lines.append(
+            f"   - Dự kiến chi phí trích xuất text "
+            f"({config.EXTRACTION_SECONDS_PER_PAGE}s/trang): "
+            f"{format_duration(cpu_seconds)} CPU, "
+            f"~{format_duration(cpu_seconds / workers)} với {workers} tiến trình"
+        )
+        return lines
+
+
+def format_duration(seconds):
+    """Formats seconds as e.g. '1h 05m', '3m 20s' or '12.5s'."""
+    if seconds < 60:
+        return f"{seconds:.1f}s"
+    minutes, secs = divmod(int(round(seconds)), 60)
+    if minutes < 60:
+        return f"{minutes}m {secs:02d}s"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h {minutes:02d}m"
+
+
+class BasenameIndex:
+    """
+    Finds files that share a path without extension (e.g. a.pdf + a.json).
+    Names are spilled to a temporary SQLite database instead of a dict, so
+    memory stays flat whatever the number of files.
+    """
+
+    BATCH_SIZE = 10000
+
+    def __init__(self):
+        # An empty filename opens a private temporary database on disk,
+        # deleted when the connection is closed
+        self.conn = sqlite3.connect("")
+        self.conn.execute("CREATE TABLE names (base TEXT, path TEXT)")
+        self._batch = []
+
+    def add(self, rel_path):
+        self._batch.append((os.path.splitext(rel_path)[0], rel_path))
+        if len(self._batch) >= self.BATCH_SIZE:
+            self._flush()
+
+    def _flush(self):
+        self.conn.executemany("INSERT INTO names VALUES (?, ?)", self._batch)
+        self._batch = []
+
+    def finish(self):
+        """Index the names once all files are added; returns the number of groups."""
+        self._flush()
+        self.conn.execute("CREATE INDEX names_base ON names (base)")
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM "
+            "(SELECT base FROM names GROUP BY base HAVING COUNT(*) > 1)"
+        ).fetchone()[0]
+
+    def groups(self):
+        """Yields (base, [paths]) for every shared base, by base, files in scan order."""
+        rows = self.conn.execute(
+            "SELECT base, path FROM names WHERE base IN "
+            "(SELECT base FROM names GROUP BY base HAVING COUNT(*) > 1) "
+            "ORDER BY base, rowid"
+        )
+        for base, group in itertools.groupby(rows, key=lambda row: row[0]):
+            yield base, [path for _, path in group]
+
+    def close(self):
+        self.conn.close()
+
+
+def bounded_map(pool, func, items, depth):
+    """
+    Like pool.map, but submits at most `depth` items ahead of the consumer
+    (Executor.map submits every item at once). Results are in input order.
+    """
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(func, item))
+        if len(pending) >= depth:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
 
 def analyze_directories(
-    output_csv=config.DEFAULT_OUTPUT_CSV, output_report=config.DEFAULT_OUTPUT_REPORT
+    output_csv=config.DEFAULT_OUTPUT_CSV,
+    output_report=config.DEFAULT_OUTPUT_REPORT,
+    pdf_metadata=None,
 ):
-    all_files = []
+    """
+    Write per-file statistics (CSV) and a summary report for every source directory.
+
+    Args:
+        output_csv: Per-file CSV path
+        output_report: Summary report path
+        pdf_metadata: Also read PDF metadata (pages, encryption, producer,
+            fonts/images) in parallel; default: config.PDF_METADATA_ENABLED
+    """
+    started = time.perf_counter()
+    if pdf_metadata is None:
+        pdf_metadata = config.PDF_METADATA_ENABLED
+    if pdf_metadata and fitz is None:
+        print("Warning: PyMuPDF not installed, skipping PDF metadata pass")
+        pdf_metadata = False
+
     report_lines = []
+    directory_metrics = {}
 
     report_lines.append("BÁO CÁO THỐNG KÊ DỮ LIỆU CHI TIẾT")
     report_lines.append("=" * 60)
 
+    fieldnames = [
+        "Category",
+        "FileName",
+        "Extension",
+        "SizeBytes",
+        "ReadableSize",
+    ]
+    if pdf_metadata:
+        fieldnames += METADATA_FIELDNAMES
+    workers = config.PDF_WORKERS
+    pool = ProcessPoolExecutor(max_workers=workers) if pdf_metadata else None
+
+    # Per-file rows are streamed to the CSV while the statistics are aggregated
+    try:
+        csvfile = open(output_csv, "w", newline="", encoding="utf-8")
+    except Exception as e:
+        print(f"Error writing CSV: {e}")
+        csvfile = None
+    writer = csv.DictWriter(csvfile, fieldnames=fieldnames) if csvfile else None
+    if writer:
+        writer.writeheader()
+
     for category, path in config.DIRECTORIES.items():
         if not os.path.exists(path):
             print(f"Error: Directory not found: {path}")
@@ -22,46 +338,84 @@ def analyze_directories(
         report_lines.append(f"\n[{category}]")
         report_lines.append("-" * 40)
 
-        file_list = []
-        sizes = []
-        non_pdf_files = []
-        basename_map = defaultdict(list)
+        size_stats = StreamingStats(bins=SIZE_HISTOGRAM_BINS)
+        type_counts = Counter()
+        # Counts are exact; only the first names are kept for the report
+        non_pdf_count = 0
+        non_pdf_sample = []
+        names = BasenameIndex()
+        pdf_stats = PdfMetadataStats() if pdf_metadata else None
 
         try:
-            for f in os.listdir(path):
-                full_path = os.path.join(path, f)
-                if os.path.isfile(full_path):
-                    file_list.append(f)
-                    size = os.path.getsize(full_path)
-                    sizes.append(size)
-
-                    ext = os.path.splitext(f)[1].lower()
-
-                    # Track non-PDFs (specifically for Dataset, but good general info)
-                    if category == "Dataset" and ext != ".pdf":
-                        non_pdf_files.append(f)
-
-                    # Group by basename for duplicate check
-                    basename = os.path.splitext(f)[0]
-                    basename_map[basename].append(f)
-
-                    all_files.append(
-                        {
-                            "Category": category,
-                            "FileName": f,
-                            "Extension": ext,
-                            "SizeBytes": size,
-                            "ReadableSize": utils.format_size(size),
-                        }
-                    )
+            # Recursive, like every other stage (scandir + parallel stat in
+            # inventory); the shared snapshot is iterated without copying it
+            entries = inventory.get_inventory(path).entries
+
+            # Metadata of the PDFs is read on the process pool, in file order
+            metadata = iter(())
+            if pool is not None:
+                pdf_paths = (
+                    os.path.join(path, e.rel_path) for e in entries if e.ext == ".pdf"
+                )
+                metadata = bounded_map(
+                    pool, read_pdf_metadata, pdf_paths, workers * 4
+                )
+
+            for entry in entries:
+                f = entry.rel_path
+                size = entry.size
+                ext = entry.ext
+
+                size_stats.add(size)
+                type_counts[ext] += 1
+
+                # Track non-PDFs (specifically for Dataset, but good general info)
+                if category == "Dataset" and ext != ".pdf":
+                    non_pdf_count += 1
+                    if len(non_pdf_sample) < config.ANALYZE_SAMPLE_LIMIT:
+                        non_pdf_sample.append(f)
+
+                # Group by basename for duplicate check
+                names.add(f)
+
+                row = {
+                    "Category": category,
+                    "FileName": f,
+                    "Extension": ext,
+                    "SizeBytes": size,
+                    "ReadableSize": utils.format_size(size),
+                }
+                if pdf_stats is not None and ext == ".pdf":
+                    info = next(metadata)
+                    pdf_stats.add(info)
+                    if info["error"] is None:
+                        row.update(
+                            {
+                                "Pages": info["pages"],
+                                "Encrypted": info["encrypted"],
+                                "Producer": info["producer"],
+                                "HasFonts": info["has_fonts"],
+                                "HasImages": info["has_images"],
+                            }
+                        )
+
+                if writer:
+                    writer.writerow(row)
+            duplicate_groups = names.finish()
         except Exception as e:
             print(f"Error reading {category}: {e}")
+            names.close()
             continue
 
         # 1. Quantity & Types
-        total_count = len(file_list)
-        extensions = [os.path.splitext(f)[1].lower() for f in file_list]
-        type_counts = Counter(extensions)
+        total_count = size_stats.count
+        directory_metrics[category] = {
+            "files": total_count,
+            "types": dict(type_counts),
+            "total_bytes": size_stats.total,
+            "non_pdf_files": non_pdf_count,
+            "duplicate_name_groups": duplicate_groups,
+        }
 
         report_lines.append(f"1. Số lượng & Định dạng:")
         report_lines.append(f"   - Tổng số file: {total_count}")
@@ -69,10 +423,10 @@ def analyze_directories(
             report_lines.append(f"   - {ext}: {count}")
 
         # 2. Size Statistics
-        if sizes:
-            min_size = min(sizes)
-            max_size = max(sizes)
-            avg_size = sum(sizes) / len(sizes)
+        if total_count:
+            min_size = size_stats.min
+            max_size = size_stats.max
+            avg_size = size_stats.mean
             report_lines.append(f"\n2. Thống kê kích thước file:")
             report_lines.append(f"   - Nhỏ nhất: {utils.format_size(min_size)}")
             report_lines.append(f"   - Lớn nhất: {utils.format_size(max_size)}")
@@ -80,46 +434,64 @@ def analyze_directories(
             report_lines.append(
                 f"   - Khoảng kích thước: {utils.format_size(min_size)} - {utils.format_size(max_size)}"
             )
+            report_lines.append(
+                f"   - Tổng dung lượng: {utils.format_size(size_stats.total)}"
+            )
+            report_lines.append(
+                "   - Phân vị (xấp xỉ ±1%): "
+                + ", ".join(
+                    f"P{q}: {utils.format_size(size_stats.percentile(q))}"
+                    for q in (50, 90, 99)
+                )
+            )
+            report_lines.append("   - Phân bố kích thước:")
+            for label, count in size_stats.histogram():
+                report_lines.append(f"     {label:<16} {count}")
 
         # 3. Non-PDF Files (Dataset Only)
         if category == "Dataset":
             report_lines.append(
-                f"\n3. Danh sách file KHÔNG PHẢI PDF ({len(non_pdf_files)} file):"
+                f"\n3. Danh sách file KHÔNG PHẢI PDF ({non_pdf_count} file):"
             )
-            if non_pdf_files:
-                for npf in non_pdf_files:
+            if non_pdf_count:
+                for npf in non_pdf_sample:
                     report_lines.append(f"   - {npf}")
+                if non_pdf_count > len(non_pdf_sample):
+                    report_lines.append(
+                        f"   ... và {non_pdf_count - len(non_pdf_sample)} file khác "
+                        f"(danh sách đầy đủ trong {os.path.basename(output_csv)})"
+                    )
             else:
                 report_lines.append("   (Không có)")
 
         # 4. Duplicate Names (Same basename, different extensions)
-        duplicates = {k: v for k, v in basename_map.items() if len(v) > 1}
         report_lines.append(
-            f"\n4. Các file trùng tên (khác đuôi mở rộng): {len(duplicates)} nhóm"
+            f"\n4. Các file trùng tên (khác đuôi mở rộng): {duplicate_groups} nhóm"
         )
-        if duplicates:
-            for base, files in duplicates.items():
+        if duplicate_groups:
+            for base, files in itertools.islice(
+                names.groups(), config.ANALYZE_SAMPLE_LIMIT
+            ):
                 report_lines.append(f"   - {base}: {', '.join(files)}")
+            if duplicate_groups > config.ANALYZE_SAMPLE_LIMIT:
+                report_lines.append(
+                    f"   ... và {duplicate_groups - config.ANALYZE_SAMPLE_LIMIT} nhóm khác"
+                )
         else:
             report_lines.append("   (Không có)")
+        names.close()
 
-    # Write CSV
-    try:
-        with open(output_csv, "w", newline="", encoding="utf-8") as csvfile:
-            fieldnames = [
-                "Category",
-                "FileName",
-                "Extension",
-                "SizeBytes",
-                "ReadableSize",
-            ]
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            for data in all_files:
-                writer.writerow(data)
+        # 5. PDF content statistics (optional metadata pass)
+        if pdf_stats is not None and (pdf_stats.pages.count or pdf_stats.errors):
+            report_lines.extend(pdf_stats.report_lines(workers))
+
+    if pool is not None:
+        pool.shutdown()
+
+    # Close CSV
+    if csvfile:
+        csvfile.close()
         print(f"Detailed statistics saved to {os.path.abspath(output_csv)}")
-    except Exception as e:
-        print(f"Error writing CSV: {e}")
 
     # Write Report
     try:
@@ -129,6 +501,22 @@ def analyze_directories(
     except Exception as e:
         print(f"Error writing Report: {e}")
 
+    # Named after the report: data_summary_report(_pre)
+    utils.write_metrics(
+        os.path.splitext(os.path.basename(output_report))[0],
+        {"directories": directory_metrics, "report": output_report, "csv": output_csv},
+        started,
+    )
+
 
 if __name__ == "__main__":
-    analyze_directories()
+    parser = argparse.ArgumentParser(description="Summarize dataset files")
+    parser.add_argument(
+        "--pdf-metadata",
+        action="store_true",
+        default=None,
+        help="Also read PDF metadata (pages, encryption, producer, fonts/images)",
+    )
+    args = parser.parse_args()
+
+    analyze_directories(pdf_metadata=args.pdf_metadata)
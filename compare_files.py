@@ -1,8 +1,142 @@
 import os
+import json
+import time
 import config
+import inventory
 import utils
 
+SNAPSHOT_VERSION = 1
+
+
+def snapshot_path(output_file):
+    """Snapshot of the previous run, one per report (pre/post comparisons differ)."""
+    stem = os.path.splitext(os.path.basename(output_file))[0]
+    return os.path.join(config.CACHE_DIR, f"compare_snapshot_{stem}.json")
+
+
+def delta_path(output_file):
+    """Machine-readable delta written next to the text report."""
+    return os.path.splitext(output_file)[0] + "_delta.json"
+
+
+def load_snapshot(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+        if snapshot.get("version") != SNAPSHOT_VERSION:
+            return None
+        return snapshot
+    except Exception as e:
+        print(f"Warning: ignoring unreadable snapshot {path}: {e}")
+        return None
+
+
+def save_snapshot(snapshot, path):
+    utils.ensure_dir_exists(os.path.dirname(path))
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def diff_files(old_files, new_files):
+    """
+    Compare two {filename: [size, mtime_ns]} maps.
+
+    Returns:
+        Dict with sorted "added", "removed" and "modified" filename lists
+    """
+    return {
+        "added": sorted(set(new_files) - set(old_files)),
+        "removed": sorted(set(old_files) - set(new_files)),
+        "modified": sorted(
+            f for f in set(old_files) & set(new_files)
+            if list(old_files[f]) != list(new_files[f])
+        ),
+    }
+
+
+def current_stats(root, entries, old_files):
+    """
+    {filename: [size, mtime_ns]} of a directory from its inventory entries.
+    Files the inventory still shows as in the previous snapshot are stat()ed
+    again: a file rewritten in place keeps its directory mtime, so the shared
+    snapshot can hold its old values. Other files are new or already changed.
+    """
+    files = {f: [e.size, e.mtime_ns] for f, e in entries.items()}
+    for f, values in files.items():
+        if list(old_files.get(f, ())) != values:
+            continue
+        try:
+            st = os.stat(os.path.join(root, f))
+        except OSError:
+            continue
+        files[f] = [st.st_size, st.st_mtime_ns]
+    return files
+
+
+def compute_delta(previous, current):
+    """
+    Changes between two snapshots: files added/removed/modified per directory,
+    and orphan names (missing in the other directory) that appeared or were resolved.
+    """
+    delta = {
+        "previous_run": previous["created"] if previous else None,
+        "current_run": current["created"],
+    }
+    for category in ("Dataset", "Label"):
+        old_files = previous[category] if previous else {}
+        delta[category] = diff_files(old_files, current[category])
+    for key in ("missing_in_label", "missing_in_dataset"):
+        old = set(previous[key]) if previous else set()
+        new = set(current[key])
+        delta[key] = {"new": sorted(new - old), "resolved": sorted(old - new)}
+    return delta
+
+
+def format_delta(delta):
+    """Text section of the report describing the delta."""
+    lines = []
+    lines.append("\n3. Thay đổi so với lần chạy trước")
+    if delta["previous_run"] is None:
+        lines.append("  (Chưa có snapshot lần chạy trước - toàn bộ file được tính là mới)")
+    else:
+        lines.append(f"  Lần chạy trước: {delta['previous_run']}")
+    lines.append("-" * 90)
+
+    labels = [("added", "Thêm mới"), ("removed", "Đã xóa"), ("modified", "Đã thay đổi")]
+    for category in ("Dataset", "Label"):
+        changes = delta[category]
+        summary = ", ".join(f"{label}: {len(changes[key])}" for key, label in labels)
+        lines.append(f"[{category}] {summary}")
+        if delta["previous_run"] is None:
+            continue
+        for key, label in labels:
+            for f in changes[key]:
+                lines.append(f"   {label:<12} {f}")
+
+    orphan_labels = [
+        ("missing_in_label", "Dataset thiếu Label"),
+        ("missing_in_dataset", "Label thiếu Dataset"),
+    ]
+    for key, label in orphan_labels:
+        orphans = delta[key]
+        lines.append(
+            f"{label}: {len(orphans['new'])} mới, {len(orphans['resolved'])} đã khắc phục"
+        )
+        for base in orphans["new"]:
+            lines.append(f"   Mới          {base}")
+        for base in orphans["resolved"]:
+            lines.append(f"   Đã khắc phục {base}")
+    return lines
+
+
 def compare_directories(output_file=config.DEFAULT_OUTPUT_DIFF):
+    dataset_entries = inventory.get_inventory(config.DATASET_DIR).by_name()
+    label_entries = inventory.get_inventory(config.LABEL_DIR).by_name()
+
     dataset_files = utils.get_files_map(config.DATASET_DIR)
     label_files = utils.get_files_map(config.LABEL_DIR)
 
@@ -28,13 +162,9 @@ def compare_directories(output_file=config.DEFAULT_OUTPUT_DIFF):
         for base in sorted(missing_in_label):
             # List all actual files with this base name
             for f in dataset_files[base]:
-                full_path = os.path.join(config.DATASET_DIR, f)
                 ext = os.path.splitext(f)[1].lower()
-                try:
-                    size_bytes = os.path.getsize(full_path)
-                    readable_size = utils.format_size(size_bytes)
-                except:
-                    readable_size = "N/A"
+                entry = dataset_entries.get(f)
+                readable_size = utils.format_size(entry.size) if entry else "N/A"
                 
                 lines.append(f"{f:<60} | {ext:<10} | {readable_size}")
     else:
@@ -46,18 +176,32 @@ def compare_directories(output_file=config.DEFAULT_OUTPUT_DIFF):
         lines.append("-" * 90)
         for base in sorted(missing_in_dataset):
             for f in label_files[base]:
-                full_path = os.path.join(config.LABEL_DIR, f)
                 ext = os.path.splitext(f)[1].lower()
-                try:
-                    size_bytes = os.path.getsize(full_path)
-                    readable_size = utils.format_size(size_bytes)
-                except:
-                    readable_size = "N/A"
+                entry = label_entries.get(f)
+                readable_size = utils.format_size(entry.size) if entry else "N/A"
                 
                 lines.append(f"{f:<60} | {ext:<10} | {readable_size}")
     else:
         lines.append("  (Không có)")
 
+    # Delta against the snapshot of the previous run
+    snapshot_file = snapshot_path(output_file)
+    previous = load_snapshot(snapshot_file)
+    current = {
+        "version": SNAPSHOT_VERSION,
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "Dataset": current_stats(
+            config.DATASET_DIR, dataset_entries, previous["Dataset"] if previous else {}
+        ),
+        "Label": current_stats(
+            config.LABEL_DIR, label_entries, previous["Label"] if previous else {}
+        ),
+        "missing_in_label": sorted(missing_in_label),
+        "missing_in_dataset": sorted(missing_in_dataset),
+    }
+    delta = compute_delta(previous, current)
+    lines.extend(format_delta(delta))
+
     try:
         with open(output_file, 'w', encoding='utf-8') as f:
             f.write('\n'.join(lines))
@@ -65,5 +209,15 @@ def compare_directories(output_file=config.DEFAULT_OUTPUT_DIFF):
     except Exception as e:
         print(f"Error writing report: {e}")
 
+    try:
+        with open(delta_path(output_file), 'w', encoding='utf-8') as f:
+            json.dump(delta, f, indent=2, ensure_ascii=False)
+        print(f"Delta saved to {os.path.abspath(delta_path(output_file))}")
+        save_snapshot(current, snapshot_file)
+    except Exception as e:
+        print(f"Error writing delta: {e}")
+
+    return delta
+
 if __name__ == "__main__":
     compare_directories()
@@ -46,9 +46,140 @@ NO_LABEL_PDF_REPORT = os.path.join(REVIEW_DIR, "pdf_no_label_files.txt")
 # Label Verification Reports
 VERIFY_REPORT_CSV = os.path.join(REVIEW_DIR, "label_verification.csv")
 VERIFY_REPORT_TXT = os.path.join(REVIEW_DIR, "label_verification_report.txt")
+# One row per label: status counts and VERIFIED/REVIEW verdict
+VERIFY_VERDICTS_CSV = os.path.join(REVIEW_DIR, "label_verification_verdicts.csv")
+# Per-stage metrics (counts, timings, output paths) for generate_final_reports.py
+METRICS_DIR = os.path.join(REVIEW_DIR, "metrics")
+# Statuses split out by filter_verification_results.py when none are given
+# (each to review_data/label_verification_<status>.csv)
+FILTER_STATUSES = ["MISSING", "SIMILAR"]
+# Indexed copy of the verification results (SQLite), queried by the filter and
+# report scripts instead of re-reading the CSV; used only while it matches the CSV
+VERIFY_RESULTS_DB = os.path.join(REVIEW_DIR, "label_verification.sqlite")
+VERIFY_RESULTS_DB_ENABLED = True
+
+# Final Reports
+# Lists longer than this are cut to their first entries in Detailed_Error_Report.md;
+# the full list goes to paginated files with an index in REPORT_PAGES_DIR
+REPORT_INLINE_LIMIT = 50
+REPORT_PAGE_SIZE = 5000
+REPORT_PAGES_DIR = os.path.join(BASE_DIR, "Detailed_Error_Report_pages")
 
 # Default Paths (for standalone execution)
 DEFAULT_OUTPUT_CSV = os.path.join(BASE_DIR, OUTPUT_CSV_NAME)
 DEFAULT_OUTPUT_REPORT = os.path.join(BASE_DIR, OUTPUT_REPORT_NAME)
 DEFAULT_OUTPUT_DIFF = os.path.join(BASE_DIR, OUTPUT_DIFF_NAME)
 DEFAULT_OUTPUT_FINAL = os.path.join(BASE_DIR, OUTPUT_FINAL_NAME)
+
+# Review Folder Materialization
+# "auto" tries reflink -> copy; "manifest" writes only a manifest.
+# "hardlink" and "symlink" are opt-in: edits to a hardlinked review file write
+# through to the source label/PDF, and symlinks break when the source is moved
+MATERIALIZE_MODE = "auto"
+MATERIALIZE_WORKERS = 8
+
+# Label Verification Loading
+# Number of (JSON, text) pairs read ahead while the current label is matched
+VERIFY_PREFETCH_DEPTH = 16
+# "auto" uses orjson when installed, "json" forces the standard library parser
+JSON_PARSER = "auto"
+
+# Worker processes for CPU-heavy PDF extraction / verification
+PDF_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+# File Inventory (shared directory snapshot, see inventory.py)
+CACHE_DIR = os.path.join(BASE_DIR, "output_analyze", ".cache")
+INVENTORY_CACHE_DIR = CACHE_DIR
+INVENTORY_CACHE_ENABLED = True
+INVENTORY_STAT_WORKERS = 16
+
+# Pipeline Stage Runner
+PIPELINE_STATE_FILE = os.path.join(CACHE_DIR, "pipeline_state.json")
+PIPELINE_JOBS = 2
+
+# Run History (see run_history.py): one record per main_pipeline.py run.
+# Not in CACHE_DIR: deleting the caches must not lose the history
+RUN_HISTORY_DB = os.path.join(BASE_DIR, "output_analyze", "run_history.sqlite")
+RUN_HISTORY_ENABLED = True
+# Retention: runs beyond the newest RUN_HISTORY_KEEP_RUNS or older than
+# RUN_HISTORY_KEEP_DAYS are deleted after each run (None disables a limit)
+RUN_HISTORY_KEEP_RUNS = 200
+RUN_HISTORY_KEEP_DAYS = 180
+# "compare" flags a stage whose throughput dropped by more than this fraction
+RUN_HISTORY_REGRESSION = 0.2
+
+# Label content hashes reused by find_duplicates.py while (name, size, mtime) match
+# (shard runs use label_hashes.shard<i>of<N>.pkl next to it)
+HASH_CACHE_FILE = os.path.join(CACHE_DIR, "label_hashes.pkl")
+HASH_CACHE_ENABLED = True
+
+# Journaled File Moves (see move_engine.py)
+MOVE_JOURNAL_DIR = os.path.join(CACHE_DIR, "move_journals")
+MOVE_BATCH_SIZE = 500
+MOVE_WORKERS = 8
+# Newest journals kept for undo; older ones are deleted once their batch fully
+# succeeded (incomplete journals and journals with failed moves are kept)
+MOVE_JOURNAL_KEEP = 100
+
+# Watch Mode (see watch_pipeline.py)
+# Seconds between directory scans (used as a safety net when watchdog is installed)
+WATCH_POLL_INTERVAL = 2.0
+# A PDF/label pair is processed once both files kept the same size for this long
+WATCH_SETTLE_SECONDS = 2.0
+# Between full passes only pairs in directories whose mtime changed (and, with
+# watchdog, pairs named by events) are stat()ed; every pair is stat()ed at this
+# interval for files rewritten in place and missed events
+WATCH_FULL_SCAN_INTERVAL = 60.0
+WATCH_WORKERS = PDF_WORKERS
+WATCH_STATE_FILE = os.path.join(CACHE_DIR, "watch_state.json")
+WATCH_LOG = os.path.join(REVIEW_DIR, "watch_verdicts.txt")
+
+# Sharded Runs (--shard i/N, merged with merge_shards.py)
+SHARD_DIR = os.path.join(REVIEW_DIR, "shards")
+
+# analyze_data.py report: non-PDF files and duplicate-name groups listed per
+# directory (counts are always complete; every file is in the statistics CSV)
+ANALYZE_SAMPLE_LIMIT = 50
+
+# PDF Metadata Pass (analyze_data.py --pdf-metadata; PyMuPDF metadata only, no text)
+PDF_METADATA_ENABLED = False
+# Pages inspected per PDF for fonts/images (resource lists only)
+PDF_METADATA_SAMPLE_PAGES = 3
+# Measured text extraction cost, used to predict extraction time in the report
+EXTRACTION_SECONDS_PER_PAGE = 0.02
+
+# Near-Duplicate Labels (near_duplicates.py, MinHash + LSH)
+# Minimum Jaccard similarity of the flattened key=value pairs
+NEAR_DUP_THRESHOLD = 0.8
+# Signature length and LSH bands (20 bands x 6 rows: pairs above ~0.6 become
+# candidates; a pair at 0.8 is found with > 99% probability)
+NEAR_DUP_NUM_PERM = 120
+NEAR_DUP_BANDS = 20
+# Buckets larger than this are compared pair by pair while scoring instead of
+# being expanded into the candidate pair set (labels or texts identical
+# to an earlier one are paired with it directly and not indexed)
+NEAR_DUP_MAX_BUCKET = 1000
+# Near-duplicate documents (near_duplicates.py --text, SimHash of extracted text)
+# Word n-gram size of the shingles
+TEXT_DUP_SHINGLE_WORDS = 3
+# Maximum differing bits of the 64-bit fingerprints (~2% of the shingles changed
+# gives 0-7 bits; unrelated documents are 16+ bits apart)
+TEXT_DUP_MAX_DISTANCE = 6
+# Fingerprints are cut into this many blocks; index keys combine
+# (TEXT_DUP_BLOCKS - max distance) blocks, e.g. 8 - 6 = 2 blocks = 16-bit keys
+TEXT_DUP_BLOCKS = 8
+
+# PDF Duplicate Detection (find_duplicates.py --pdf)
+# Bytes hashed at the start and end of a file before deciding to read it in full
+PDF_DUP_BLOCK_SIZE = 64 * 1024
+PDF_DUP_WORKERS = 8
+
+# Review Server (review_server.py, local HTTP review of labels)
+REVIEW_SERVER_HOST = "127.0.0.1"
+REVIEW_SERVER_PORT = 8765
+# Labels per page of the case list
+REVIEW_LIST_PAGE_SIZE = 100
+# Rendered PDF pages (PNG); least recently viewed pages are evicted above the limit
+REVIEW_PAGE_CACHE_DIR = os.path.join(CACHE_DIR, "page_images")
+REVIEW_PAGE_CACHE_MB = 512
+REVIEW_PAGE_ZOOM = 1.5
@@ -0,0 +1,262 @@
+import os
+import csv
+import time
+import argparse
+import itertools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import config
+import utils
+import extract_pdf
+import verify_labels
+
+
+def process_pdf(filename, save_text=False):
+    """
+    Extract one PDF and verify its label against the in-memory text.
+    Runs in a worker process; file moves are left to the main process.
+
+    Args:
+        filename: PDF path relative to DATASET_DIR
+        save_text: Also write the extracted text to EXTRACTED_TEXT_DIR
+
+    Returns:
+        Dict with keys: filename, label, has_label, kind ("text", "image", "error"),
+        error, label_error, rows (verification rows) and stats (counters)
+    """
+    base_name = os.path.splitext(filename)[0]
+    label_filename = base_name + ".json"
+    label_path = os.path.join(config.LABEL_DIR, label_filename)
+
+    result = {
+        "filename": filename,
+        "label": label_filename,
+        "has_label": os.path.exists(label_path),
+        "kind": "text",
+        "error": None,
+        "label_error": None,
+        "rows": [],
+        "stats": verify_labels.new_stats(),
+    }
+
+    try:
+        text_content = extract_pdf.extract_text(
+            os.path.join(config.DATASET_DIR, filename)
+        )
+    except Exception as e:
+        result["kind"] = "error"
+        result["error"] = str(e)
+        text_content = ""
+    else:
+        if extract_pdf.is_image_text(text_content):
+            result["kind"] = "image"
+
+        if save_text:
+            txt_path = os.path.join(config.EXTRACTED_TEXT_DIR, base_name + ".txt")
+            utils.ensure_dir_exists(os.path.dirname(txt_path))
+            with open(txt_path, "w", encoding="utf-8") as f_out:
+                f_out.write(text_content)
+
+    # Image PDFs are moved out with their label before verification (as in extract_pdf)
+    if result["has_label"] and result["kind"] != "image":
+        try:
+            data = utils.load_json(label_path)
+        except Exception as e:
+            result["label_error"] = str(e)
+        else:
+            # verify_labels reads texts with utils.read_file, which strips them
+            result["rows"] = verify_labels.verify_label_data(
+                label_filename, data, text_content.strip(), result["stats"]
+            )
+
+    return result
+
+
+def iter_results(files, save_text, workers):
+    """
+    Yields process_pdf results in the order of files (so the CSV rows are
+    written in a deterministic order), keeping the pool queue bounded: up to
+    workers * 4 files are in flight while the oldest one is awaited.
+    """
+    files = iter(files)
+    max_pending = workers * 4
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque(
+            pool.submit(process_pdf, filename, save_text)
+            for filename in itertools.islice(files, max_pending)
+        )
+        while pending:
+            future = pending.popleft()
+            for filename in itertools.islice(files, 1):
+                pending.append(pool.submit(process_pdf, filename, save_text))
+            yield future.result()
+
+
+def format_verdict(rows):
+    """One-line per-file verdict from verification rows."""
+    counts = {}
+    for row in rows:
+        counts[row["Status"]] = counts.get(row["Status"], 0) + 1
+
+    found = sum(v for k, v in counts.items() if "FOUND" in k)
+    issues = {k: v for k, v in counts.items() if "FOUND" not in k}
+    if not rows:
+        return "NO FIELDS"
+    if not issues:
+        return f"OK ({found}/{len(rows)} found)"
+    detail = ", ".join(f"{k}: {v}" for k, v in sorted(issues.items()))
+    return f"REVIEW ({found}/{len(rows)} found; {detail})"
+
+
+def extract_and_verify(save_text=False, workers=None):
+    """
+    Extract every PDF and verify its label in the same worker pool, without
+    the intermediate Extracted_Text round-trip. Produces the same reports,
+    review folders and CSV as extract_pdf.py followed by verify_labels.py.
+    """
+    print(">>> STARTING FUSED PDF EXTRACTION + LABEL VERIFICATION")
+    started = time.perf_counter()
+
+    workers = workers or config.PDF_WORKERS
+
+    verify_labels.check_file_consistency()
+
+    utils.ensure_dir_exists(config.REVIEW_DIR)
+    if save_text:
+        utils.ensure_dir_exists(config.EXTRACTED_TEXT_DIR)
+    os.makedirs(config.PDF_ERROR_FILES_DIR, exist_ok=True)
+    os.makedirs(config.PDF_ERROR_LABELS_DIR, exist_ok=True)
+    os.makedirs(config.PDF_IMAGE_FILES_DIR, exist_ok=True)
+    os.makedirs(config.PDF_IMAGE_LABELS_DIR, exist_ok=True)
+    os.makedirs(config.PDF_NO_LABEL_DIR, exist_ok=True)
+
+    if not os.path.exists(config.DATASET_DIR):
+        print(f"Error: Dataset directory not found: {config.DATASET_DIR}")
+        return
+
+    files = utils.list_files_recursive(config.DATASET_DIR, ".pdf")
+    total_files = len(files)
+    print(f"Found {total_files} PDF files in {config.DATASET_DIR}")
+    print(f"Workers: {workers} | Save text: {'yes' if save_text else 'no'}")
+
+    # Extraction results
+    count_success = 0
+    error_files = []
+    image_files = []
+    no_label_files = []
+    error_filenames = []
+
+    # Verification results
+    results = []
+    json_errors = []
+    stats = verify_labels.new_stats()
+    verified_labels = 0
+
+    with open(config.VERIFY_REPORT_CSV, "w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=verify_labels.RESULT_FIELDNAMES)
+        writer.writeheader()
+
+        for i, r in enumerate(iter_results(files, save_text, workers)):
+            filename = r["filename"]
+
+            if r["kind"] == "image":
+                # Moved in one journaled batch once the pool is done
+                if r["has_label"]:
+                    image_files.append(filename)
+                else:
+                    no_label_files.append(filename)
+                print(f"[IMAGE] {filename}")
+            elif r["kind"] == "error":
+                print(f"Error reading {filename}: {r['error']}")
+                error_files.append(f"{filename} | Error: {r['error']}")
+                error_filenames.append(filename)
+            else:
+                count_success += 1
+
+            if r["label_error"] is not None:
+                print(f"Error reading JSON {r['label']}: {r['label_error']}")
+                json_errors.append({"Filename": r["label"], "Error": r["label_error"]})
+                verified_labels += 1
+            elif r["has_label"] and r["kind"] != "image":
+                verified_labels += 1
+                writer.writerows(r["rows"])
+                results.extend(r["rows"])
+                for key, value in r["stats"].items():
+                    stats[key] += value
+                print(f"[{format_verdict(r['rows'])}] {filename}")
+
+            if (i + 1) % 100 == 0:
+                print(f"Processed {i + 1}/{total_files} files...")
+
+        # Labels without a PDF are verified against their (usually missing) text,
+        # exactly as verify_labels.py does
+        pdf_bases = {os.path.splitext(f)[0] for f in files}
+        orphan_labels = [
+            f
+            for f in utils.list_files_recursive(config.LABEL_DIR, ".json")
+            if os.path.splitext(f)[0] not in pdf_bases
+        ]
+        for json_filename, data, text_content, error in utils.prefetch(
+            verify_labels.load_label_pair,
+            orphan_labels,
+            depth=config.VERIFY_PREFETCH_DEPTH,
+        ):
+            verified_labels += 1
+            if error is not None:
+                print(f"Error reading JSON {json_filename}: {error}")
+                json_errors.append({"Filename": json_filename, "Error": str(error)})
+                continue
+            rows = verify_labels.verify_label_data(
+                json_filename, data, text_content, stats
+            )
+            writer.writerows(rows)
+            results.extend(rows)
+
+    print(f"Detailed verification CSV saved to: {config.VERIFY_REPORT_CSV}")
+
+    # Move image files (PDF + Label) to image folder, no-label PDFs to No Label folder
+    extract_pdf.separate_image_files(image_files, no_label_files)
+
+    # Copy error files (PDF + Label) to error folder
+    if error_filenames:
+        extract_pdf.copy_files_and_labels(
+            error_filenames, config.PDF_ERROR_FILES_DIR, config.PDF_ERROR_LABELS_DIR
+        )
+
+    extract_pdf.write_extraction_reports(
+        error_files,
+        image_files,
+        no_label_files,
+        total_files=total_files,
+        success=count_success,
+        started=started,
+    )
+    verify_labels.write_verification_outputs(
+        results, json_errors, verified_labels, stats, write_csv=False, started=started
+    )
+
+    print("\n>>> FUSED EXTRACTION + VERIFICATION COMPLETE")
+    print(f"Total PDFs processed: {total_files}")
+    print(f"Success (Text found): {count_success}")
+    print(f"Image - Has Label: {len(image_files)}")
+    print(f"Image - No Label: {len(no_label_files)}")
+    print(f"Errors (Read failed): {len(error_files)}")
+    print(f"Labels verified: {verified_labels}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Extract PDFs and verify labels in one pass"
+    )
+    parser.add_argument(
+        "--save-text",
+        action="store_true",
+        help="Also save extracted text to Extracted_Text for reviewers",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="Worker processes (default: config)"
+    )
+    args = parser.parse_args()
+
+    extract_and_verify(save_text=args.save_text, workers=args.workers)
@@ -1,13 +1,43 @@
 import os
-import shutil
+import json
+import time
+import argparse
 import fitz  # PyMuPDF
 import config
+import materialize
+import move_engine
 import utils
 
+# Extracted text shorter than this is treated as an image/scanned PDF
+IMAGE_TEXT_MIN_CHARS = 50
+
+# Per-shard file lists and counters, combined by merge_shards.py
+SHARD_SUMMARY = os.path.join(config.SHARD_DIR, "extract_pdf_summary.json")
+
+
+def label_pair_jobs(filename, dest_folder_files, dest_folder_labels):
+    """
+    Build (src, dst) pairs for a PDF file and its corresponding JSON label.
+    Pairs whose source does not exist are skipped.
+    """
+    jobs = []
+
+    source_pdf = os.path.join(config.DATASET_DIR, filename)
+    if os.path.exists(source_pdf):
+        jobs.append((source_pdf, os.path.join(dest_folder_files, filename)))
+
+    label_filename = os.path.splitext(filename)[0] + ".json"
+    source_label = os.path.join(config.LABEL_DIR, label_filename)
+    if os.path.exists(source_label):
+        jobs.append((source_label, os.path.join(dest_folder_labels, label_filename)))
+
+    return jobs
+
 
 def copy_file_and_label(filename, dest_folder_files, dest_folder_labels):
     """
     Copy both the PDF file and its corresponding JSON label to destination folders.
+    Files are reflinked where possible (see materialize.py).
 
     Args:
         filename: Name of the PDF file
@@ -17,43 +47,36 @@ def copy_file_and_label(filename, dest_folder_files, dest_folder_labels):
     Returns:
         Tuple of (pdf_copied: bool, label_copied: bool)
     """
-    pdf_copied = False
-    label_copied = False
-
-    # Copy PDF file
-    source_pdf = os.path.join(config.DATASET_DIR, filename)
-    dest_pdf = os.path.join(dest_folder_files, filename)
-
-    # Ensure dest dir exists
-    dest_dir = os.path.dirname(dest_pdf)
-    utils.ensure_dir_exists(dest_dir)
-
-    if os.path.exists(source_pdf):
-        try:
-            shutil.copy2(source_pdf, dest_pdf)
-            pdf_copied = True
-        except Exception as e:
-            print(f"  Error copying PDF {filename}: {e}")
-
-    # Copy corresponding JSON label
-    label_filename = os.path.splitext(filename)[0] + ".json"
-    # Copy corresponding JSON label
-    label_filename = os.path.splitext(filename)[0] + ".json"
-    source_label = os.path.join(config.LABEL_DIR, label_filename)
-    dest_label = os.path.join(dest_folder_labels, label_filename)
+    return copy_files_and_labels([filename], dest_folder_files, dest_folder_labels)[
+        filename
+    ]
 
-    # Ensure dest label dir exists
-    dest_label_dir = os.path.dirname(dest_label)
-    utils.ensure_dir_exists(dest_label_dir)
 
-    if os.path.exists(source_label):
-        try:
-            shutil.copy2(source_label, dest_label)
-            label_copied = True
-        except Exception as e:
-            print(f"  Error copying label {label_filename}: {e}")
+def copy_files_and_labels(filenames, dest_folder_files, dest_folder_labels):
+    """
+    Batch version of copy_file_and_label: materializes all pairs in one parallel pool.
 
-    return pdf_copied, label_copied
+    Returns:
+        Dict {filename: (pdf_copied: bool, label_copied: bool)}
+    """
+    jobs = []
+    owners = []
+    for filename in filenames:
+        for job in label_pair_jobs(filename, dest_folder_files, dest_folder_labels):
+            jobs.append(job)
+            owners.append(filename)
+
+    copied = {filename: [False, False] for filename in filenames}
+    results = materialize.materialize_files(jobs)
+    for filename, (src, _, _, error) in zip(owners, results):
+        is_pdf = src.startswith(config.DATASET_DIR)
+        if error:
+            kind = "PDF" if is_pdf else "label"
+            print(f"  Error copying {kind} {os.path.basename(src)}: {error}")
+        else:
+            copied[filename][0 if is_pdf else 1] = True
+
+    return {filename: tuple(flags) for filename, flags in copied.items()}
 
 
 def move_file_and_label(filename, dest_folder_files, dest_folder_labels):
@@ -68,47 +91,159 @@ def move_file_and_label(filename, dest_folder_files, dest_folder_labels):
     Returns:
         Tuple of (pdf_moved: bool, label_moved: bool)
     """
-    pdf_moved = False
-    label_moved = False
+    jobs = label_pair_jobs(filename, dest_folder_files, dest_folder_labels)
+    moved = [False, False]
+    for src, _, error in move_engine.move_files(jobs, name="extract_pdf"):
+        is_pdf = src.startswith(config.DATASET_DIR)
+        if error:
+            kind = "PDF" if is_pdf else "label"
+            print(f"  Error moving {kind} {os.path.basename(src)}: {error}")
+        else:
+            moved[0 if is_pdf else 1] = True
+    return tuple(moved)
+
+
+def separate_image_files(image_files, no_label_files):
+    """
+    Move image/scanned PDFs out of the dataset in one journaled batch:
+    PDFs with a label go (with the label) to the image folders,
+    PDFs without a label go to the No Label folder.
 
-    # Move PDF file
-    source_pdf = os.path.join(config.DATASET_DIR, filename)
-    dest_pdf = os.path.join(dest_folder_files, filename)
+    Returns:
+        Number of files moved
+    """
+    jobs = []
+    for filename in image_files:
+        jobs.extend(
+            label_pair_jobs(
+                filename, config.PDF_IMAGE_FILES_DIR, config.PDF_IMAGE_LABELS_DIR
+            )
+        )
+    for filename in no_label_files:
+        jobs.append(
+            (
+                os.path.join(config.DATASET_DIR, filename),
+                os.path.join(config.PDF_NO_LABEL_DIR, filename),
+            )
+        )
 
-    # Ensure dest dir exists
-    dest_dir = os.path.dirname(dest_pdf)
-    utils.ensure_dir_exists(dest_dir)
+    moved = 0
+    for src, _, error in move_engine.move_files(jobs, name="extract_pdf"):
+        if error:
+            print(f"  Error moving {os.path.basename(src)}: {error}")
+        else:
+            moved += 1
+    return moved
 
-    if os.path.exists(source_pdf):
-        try:
-            shutil.move(source_pdf, dest_pdf)
-            pdf_moved = True
-        except Exception as e:
-            print(f"  Error moving PDF {filename}: {e}")
 
-    # Move corresponding JSON label
-    label_filename = os.path.splitext(filename)[0] + ".json"
-    # Move corresponding JSON label
-    label_filename = os.path.splitext(filename)[0] + ".json"
-    source_label = os.path.join(config.LABEL_DIR, label_filename)
-    dest_label = os.path.join(dest_folder_labels, label_filename)
+def extract_text(pdf_path):
+    """
+    Extract the text of every page with PyMuPDF (one newline after each page).
+    Raises whatever PyMuPDF raises for unreadable files.
+    """
+    text_content = ""
+    with fitz.open(pdf_path) as doc:
+        for page in doc:
+            text_content += page.get_text() + "\n"
+    return text_content
 
-    # Ensure dest label dir exists
-    dest_label_dir = os.path.dirname(dest_label)
-    utils.ensure_dir_exists(dest_label_dir)
 
-    if os.path.exists(source_label):
-        try:
-            shutil.move(source_label, dest_label)
-            label_moved = True
-        except Exception as e:
-            print(f"  Error moving label {label_filename}: {e}")
+def is_image_text(text_content):
+    """True if the extracted text is too short to be a text PDF (image/scanned PDF)."""
+    clean_text = text_content.strip()
+    return not clean_text or len(clean_text) < IMAGE_TEXT_MIN_CHARS
 
-    return pdf_moved, label_moved
 
+def move_no_label_pdf(filename):
+    """Move an image PDF without label to the No Label folder (PDF only)."""
+    return separate_image_files([], [filename]) == 1
 
-def extract_text_from_pdfs():
+
+def write_extraction_reports(
+    error_files,
+    image_files,
+    no_label_files,
+    shard=None,
+    total_files=None,
+    success=None,
+    started=None,
+):
+    """
+    Write the error, image and no-label PDF report files and, for a complete
+    run, the "extract_pdf" metrics (total_files/success: counters for them;
+    started: perf_counter() at the start of the run).
+    With a shard (index, count), the partial reports go to SHARD_DIR.
+    """
+    error_report = utils.shard_path(config.ERROR_PDF_REPORT, shard)
+    image_report = utils.shard_path(config.IMAGE_PDF_REPORT, shard)
+    no_label_report = utils.shard_path(config.NO_LABEL_PDF_REPORT, shard)
+    if shard:
+        utils.ensure_dir_exists(config.SHARD_DIR)
+
+    # 1. Error Files
+    with open(error_report, "w", encoding="utf-8") as f:
+        f.write(f"DANH SÁCH FILE LỖI KHÔNG ĐỌC ĐƯỢC ({len(error_files)} files)\n")
+        f.write("=" * 60 + "\n")
+        f.write("\n".join(error_files))
+    print(f"Error report saved to: {error_report}")
+
+    # 2. Image/Scanned Files (With Labels)
+    with open(image_report, "w", encoding="utf-8") as f:
+        f.write(
+            f"DANH SÁCH FILE ẢNH/KHÔNG CÓ TEXT - CÓ LABEL ({len(image_files)} files)\n"
+        )
+        f.write("=" * 60 + "\n")
+        f.write("\n".join(image_files))
+    print(f"Image report saved to: {image_report}")
+
+    # 3. No Label Files (Image/Scanned)
+    with open(no_label_report, "w", encoding="utf-8") as f:
+        f.write(
+            f"DANH SÁCH FILE ẢNH/KHÔNG CÓ TEXT - KHÔNG CÓ LABEL ({len(no_label_files)} files)\n"
+        )
+        f.write("=" * 60 + "\n")
+        f.write("\n".join(no_label_files))
+    print(f"No Label report saved to: {no_label_report}")
+
+    if not shard:
+        utils.write_metrics(
+            "extract_pdf",
+            {
+                "total": total_files,
+                "success": success,
+                "errors": len(error_files),
+                "images": len(image_files),
+                "no_label": len(no_label_files),
+                "reports": {
+                    "errors": error_report,
+                    "images": image_report,
+                    "no_label": no_label_report,
+                },
+            },
+            started,
+            sources=[error_report, image_report],
+        )
+
+
+def write_shard_summary(shard, summary):
+    """Save the file lists and counters of one shard for merge_shards.py."""
+    path = utils.shard_path(SHARD_SUMMARY, shard)
+    utils.ensure_dir_exists(config.SHARD_DIR)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    print(f"Shard summary saved to: {path}")
+
+
+def extract_text_from_pdfs(shard=None):
+    """
+    Extract the text of every PDF in DATASET_DIR and separate image/error PDFs.
+
+    Args:
+        shard: Optional (index, count); only PDFs of that shard are processed
+            and the reports are written as partial outputs (see merge_shards.py)
+    """
     print(">>> STARTING PDF EXTRACTION (using PyMuPDF)")
+    started = time.perf_counter()
 
     # Ensure output directory exists
     utils.ensure_dir_exists(config.EXTRACTED_TEXT_DIR)
@@ -129,6 +264,7 @@ def extract_text_from_pdfs():
     error_files = []
     image_files = []
     no_label_files = []
+    error_filenames = []
 
     # Get List of PDF files
     if not os.path.exists(config.DATASET_DIR):
@@ -136,6 +272,9 @@ def extract_text_from_pdfs():
         return
 
     files = utils.list_files_recursive(config.DATASET_DIR, ".pdf")
+    if shard:
+        files = [f for f in files if utils.in_shard(f, shard)]
+        print(f"Shard {shard[0]}/{shard[1]}")
     total_files = len(files)
     print(f"Found {total_files} PDF files in {config.DATASET_DIR}")
 
@@ -153,37 +292,17 @@ def extract_text_from_pdfs():
         has_label = os.path.exists(label_path)
 
         try:
-            text_content = ""
-            # PyMuPDF Open
-            with fitz.open(pdf_path) as doc:
-                for page in doc:
-                    text_content += page.get_text() + "\n"
-
-            # Analyze extracted text
-            clean_text = text_content.strip()
+            text_content = extract_text(pdf_path)
 
             # HEURISTIC: If text is empty or very short (< 50 chars), assume it's an image/scanned PDF
-            if not clean_text or len(clean_text) < 50:
+            if is_image_text(text_content):
+                # Moved in one journaled batch after the loop
                 if has_label:
                     image_files.append(filename)
                     count_image_with_label += 1
-                    # Move to image folder (PDF + Label)
-                    move_file_and_label(
-                        filename,
-                        config.PDF_IMAGE_FILES_DIR,
-                        config.PDF_IMAGE_LABELS_DIR,
-                    )
                 else:
                     no_label_files.append(filename)
                     count_image_no_label += 1
-                    # Move to No Label folder (PDF only)
-                    # Move to No Label folder (PDF only)
-                    try:
-                        dest_no_label = os.path.join(config.PDF_NO_LABEL_DIR, filename)
-                        utils.ensure_dir_exists(os.path.dirname(dest_no_label))
-                        shutil.move(pdf_path, dest_no_label)
-                    except Exception as e:
-                        print(f"  Error moving PDF {filename} to No Label: {e}")
             else:
                 count_success += 1
 
@@ -195,39 +314,42 @@ def extract_text_from_pdfs():
             print(f"Error reading {filename}: {e}")
             error_files.append(f"{filename} | Error: {str(e)}")
             count_error += 1
-            # Copy to error folder
-            copy_file_and_label(
-                filename, config.PDF_ERROR_FILES_DIR, config.PDF_ERROR_LABELS_DIR
-            )
+            # Copied to error folder in one batch after the loop
+            error_filenames.append(filename)
 
         if (i + 1) % 100 == 0:
             print(f"Processed {i + 1}/{total_files} files...")
 
-    # Write Report Files
-    # 1. Error Files
-    with open(config.ERROR_PDF_REPORT, "w", encoding="utf-8") as f:
-        f.write(f"DANH SÁCH FILE LỖI KHÔNG ĐỌC ĐƯỢC ({len(error_files)} files)\n")
-        f.write("=" * 60 + "\n")
-        f.write("\n".join(error_files))
-    print(f"Error report saved to: {config.ERROR_PDF_REPORT}")
+    # Move image files (PDF + Label) to image folder, no-label PDFs to No Label folder
+    separate_image_files(image_files, no_label_files)
 
-    # 2. Image/Scanned Files (With Labels)
-    with open(config.IMAGE_PDF_REPORT, "w", encoding="utf-8") as f:
-        f.write(
-            f"DANH SÁCH FILE ẢNH/KHÔNG CÓ TEXT - CÓ LABEL ({len(image_files)} files)\n"
+    # Copy error files (PDF + Label) to error folder
+    if error_filenames:
+        copy_files_and_labels(
+            error_filenames, config.PDF_ERROR_FILES_DIR, config.PDF_ERROR_LABELS_DIR
         )
-        f.write("=" * 60 + "\n")
-        f.write("\n".join(image_files))
-    print(f"Image report saved to: {config.IMAGE_PDF_REPORT}")
 
-    # 3. No Label Files (Image/Scanned)
-    with open(config.NO_LABEL_PDF_REPORT, "w", encoding="utf-8") as f:
-        f.write(
-            f"DANH SÁCH FILE ẢNH/KHÔNG CÓ TEXT - KHÔNG CÓ LABEL ({len(no_label_files)} files)\n"
+    # Write Report Files
+    write_extraction_reports(
+        error_files,
+        image_files,
+        no_label_files,
+        shard,
+        total_files=total_files,
+        success=count_success,
+        started=started,
+    )
+    if shard:
+        write_shard_summary(
+            shard,
+            {
+                "total": total_files,
+                "success": count_success,
+                "error_files": error_files,
+                "image_files": image_files,
+                "no_label_files": no_label_files,
+            },
         )
-        f.write("=" * 60 + "\n")
-        f.write("\n".join(no_label_files))
-    print(f"No Label report saved to: {config.NO_LABEL_PDF_REPORT}")
 
     # Summary
     print("\n>>> EXTRACTION COMPLETE")
@@ -243,4 +365,12 @@ def extract_text_from_pdfs():
 
 
 if __name__ == "__main__":
-    extract_text_from_pdfs()
+    parser = argparse.ArgumentParser(description="Extract text from dataset PDFs")
+    parser.add_argument(
+        "--shard",
+        type=utils.shard_arg,
+        help="Process only shard i of N (e.g. 1/4), see merge_shards.py",
+    )
+    args = parser.parse_args()
+
+    extract_text_from_pdfs(shard=args.shard)
@@ -1,48 +1,151 @@
 import csv
 import os
+import re
+import time
+import argparse
+from collections import Counter
 import config
+import results_db
+import utils
 
-def filter_results():
+# Output rows are buffered; a multi-GB input then needs few write calls
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+def status_output_path(status):
+    """review_data/label_verification_<status>.csv (e.g. ..._missing.csv, ..._n_a.csv)."""
+    name = re.sub(r"[^0-9a-z]+", "_", status.lower()).strip("_")
+    return os.path.join(config.REVIEW_DIR, f"label_verification_{name}.csv")
+
+
+def filter_results(statuses=None, all_statuses=False):
+    """
+    Split the verification results by status. With a current results database
+    each status is an indexed query; otherwise the CSV is read in a single
+    streaming pass, every row written to the output of its status as soon as it
+    is read, so memory use does not depend on the size of the input.
+
+    Args:
+        statuses: Statuses to extract (default: config.FILTER_STATUSES); an
+            output with only the header is written for statuses without rows
+        all_statuses: Also write one output for every other status found
+
+    Returns:
+        Counter {status: row count} over the whole input, or None on error
+    """
+    started = time.perf_counter()
     input_csv = config.VERIFY_REPORT_CSV
-    
+    statuses = list(dict.fromkeys(statuses or config.FILTER_STATUSES))
+
     if not os.path.exists(input_csv):
         print(f"Error: Input CSV not found: {input_csv}")
-        return
-
-    output_missing = os.path.join(config.REVIEW_DIR, "label_verification_missing.csv")
-    output_similar = os.path.join(config.REVIEW_DIR, "label_verification_similar.csv")
-    
-    missing_rows = []
-    similar_rows = []
-    
+        return None
+
+    counts = Counter()
+    outputs = {}  # {status: (file, writerow)}
+
+    def open_output(status, header):
+        out = open(
+            status_output_path(status),
+            "w",
+            newline="",
+            encoding="utf-8",
+            buffering=WRITE_BUFFER_SIZE,
+        )
+        writer = csv.writer(out)
+        writer.writerow(header)
+        outputs[status] = (out, writer.writerow)
+        return writer.writerow
+
+    db = results_db.connect()
+    if db is not None:
+        print(f"Querying results database: {config.VERIFY_RESULTS_DB}")
+        try:
+            counts = results_db.status_counts(db)
+            if all_statuses:
+                statuses += [s for s in counts if s and s not in statuses]
+            for status in statuses:
+                writerow = open_output(status, results_db.COLUMNS)
+                for row in results_db.rows_with_status(db, status):
+                    writerow(row)
+        except Exception as e:
+            print(f"Error querying results database: {e}")
+            return None
+        finally:
+            db.close()
+            for out, _ in outputs.values():
+                out.close()
+        return report_counts(statuses, counts, started)
+
     try:
-        with open(input_csv, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            fieldnames = reader.fieldnames
-            
+        with open(input_csv, "r", newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if not header or "Status" not in header:
+                print(f"Error: No Status column in {input_csv}")
+                return None
+            status_col = header.index("Status")
+
+            for status in statuses:
+                open_output(status, header)
+
             for row in reader:
-                status = row.get('Status', '')
-                if status == 'MISSING':
-                    missing_rows.append(row)
-                elif status == 'SIMILAR':
-                    similar_rows.append(row)
-                    
-        # Write Missing
-        with open(output_missing, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(missing_rows)
-        print(f"Created Missing Report: {output_missing} ({len(missing_rows)} rows)")
-
-        # Write Similar
-        with open(output_similar, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(similar_rows)
-        print(f"Created Similar Report: {output_similar} ({len(similar_rows)} rows)")
-            
+                status = row[status_col] if len(row) > status_col else ""
+                counts[status] += 1
+                output = outputs.get(status)
+                if output is not None:
+                    output[1](row)
+                elif all_statuses and status:
+                    open_output(status, header)(row)
     except Exception as e:
         print(f"Error processing CSV: {e}")
+        return None
+    finally:
+        for out, _ in outputs.values():
+            out.close()
+
+    return report_counts(list(outputs), counts, started)
+
+
+def report_counts(statuses, counts, started=None):
+    """
+    Print the outputs written and the rows of every status, save them as the
+    "filter_results" metrics; returns counts.
+    """
+    for status in statuses:
+        print(f"Created {status} Report: {status_output_path(status)} ({counts[status]} rows)")
+
+    print(f"\nRows read: {sum(counts.values())}")
+    for status, count in counts.most_common():
+        print(f"  {status or '(empty)'}: {count}")
+
+    utils.write_metrics(
+        "filter_results",
+        {
+            "rows": sum(counts.values()),
+            "statuses": dict(counts),
+            "outputs": {status: status_output_path(status) for status in statuses},
+        },
+        started,
+    )
+    return counts
+
 
 if __name__ == "__main__":
-    filter_results()
+    parser = argparse.ArgumentParser(
+        description="Split label_verification.csv into one CSV per status"
+    )
+    parser.add_argument(
+        "statuses",
+        nargs="*",
+        help="Statuses to extract, e.g. MISSING SIMILAR CHECK_DATE "
+        "FOUND_NUMERIC_FORMAT (default: config.FILTER_STATUSES)",
+    )
+    parser.add_argument(
+        "--all",
+        action="store_true",
+        help="Write one CSV for every status found",
+    )
+    args = parser.parse_args()
+
+    filter_results(statuses=args.statuses, all_statuses=args.all)
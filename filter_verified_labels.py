@@ -1,8 +1,32 @@
 import os
 import csv
-import shutil
+import time
 import config
+import move_engine
 import utils
+import verify_labels
+
+
+def load_verdicts(csv_path):
+    """
+    Per-label verdicts from the table verify_labels writes next to the CSV. If
+    the table is missing or older than the CSV, it is rebuilt from the CSV once.
+
+    Returns:
+        Dict {filename: verdict row (see verify_labels.VERDICT_FIELDNAMES)} in
+        CSV order; a label listed twice (re-processed in watch mode) keeps its
+        last verdict
+    """
+    if verify_labels.verdicts_current():
+        print(f"Reading per-file verdicts from: {config.VERIFY_VERDICTS_CSV}")
+        with open(config.VERIFY_VERDICTS_CSV, "r", newline="", encoding="utf-8") as f:
+            return {row["Filename"]: row for row in csv.DictReader(f)}
+
+    print(f"Rebuilding per-file verdicts from: {csv_path}")
+    with open(csv_path, "r", newline="", encoding="utf-8") as f:
+        verdicts = list(verify_labels.file_verdicts(csv.DictReader(f)))
+    verify_labels.write_verdicts(verdicts)
+    return {row["Filename"]: row for row in verdicts}
 
 
 def filter_verified_labels():
@@ -11,6 +35,7 @@ def filter_verified_labels():
     to a separate folder 'Label_true'
     """
     print(">>> FILTERING VERIFIED LABELS")
+    started = time.perf_counter()
 
     # Read verification CSV
     csv_path = config.VERIFY_REPORT_CSV
@@ -27,87 +52,48 @@ def filter_verified_labels():
     os.makedirs(files_dir, exist_ok=True)
     os.makedirs(labels_dir, exist_ok=True)
 
-    # Track files and their field statuses
-    file_statuses = {}  # {filename: {'total': 0, 'found': 0, 'has_issues': False}}
-
-    print(f"Reading verification results from: {csv_path}")
-
     try:
-        with open(csv_path, "r", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                filename = row["Filename"]
-                status = row["Status"]
-
-                if filename not in file_statuses:
-                    file_statuses[filename] = {
-                        "total": 0,
-                        "found": 0,
-                        "has_issues": False,
-                    }
-
-                file_statuses[filename]["total"] += 1
-
-                # Check if status is FOUND or any variant (explicit check)
-                accepted_statuses = [
-                    "FOUND",
-                    "FOUND_DATE_ALT_FORMAT",
-                    "FOUND_CASE_INSENSITIVE",
-                    "FOUND_NORMALIZED",
-                    "CHECK_DATE",
-                    # "FOUND_NUMERIC_FORMAT",
-                ]
-
-                if status in accepted_statuses:
-                    file_statuses[filename]["found"] += 1
-                elif status in ["MISSING", "SIMILAR", "CHECK_DATE"]:
-                    file_statuses[filename]["has_issues"] = True
-                # N/A status is OK (empty fields - not counted as issues)
-
+        verdicts = load_verdicts(csv_path)
     except Exception as e:
         print(f"Error reading CSV: {e}")
         return
 
-    # Filter files where ALL checked fields are FOUND
-    verified_files = []
-    for filename, stats in file_statuses.items():
-        # All fields are FOUND (no MISSING or SIMILAR)
-        if not stats["has_issues"] and stats["found"] > 0:
-            verified_files.append(filename)
+    # Verified: at least one accepted field and no MISSING or SIMILAR field
+    verified_files = [f for f, row in verdicts.items() if row["Verdict"] == "VERIFIED"]
 
     print(f"\nFound {len(verified_files)} files with ALL fields verified (FOUND)")
-    print(f"Total files processed: {len(file_statuses)}")
+    print(f"Total files processed: {len(verdicts)}")
+
+    # Move files to Label_true folder (organized into subfolders)
+    # JSONs first; a PDF is moved only if its JSON was moved
+    json_jobs = [
+        (os.path.join(config.LABEL_DIR, f), os.path.join(labels_dir, f))
+        for f in verified_files
+    ]
+    json_results = move_engine.move_files(json_jobs, name="filter_verified_labels")
 
-    # Copy files to Label_true folder (organized into subfolders)
     copied_json = 0
-    copied_pdf = 0
-
-    for filename in verified_files:
-        try:
-            # Copy JSON file to labels subfolder
-            src_json = os.path.join(config.LABEL_DIR, filename)
-            dst_json = os.path.join(labels_dir, filename)
-
-            if os.path.exists(src_json):
-                utils.ensure_dir_exists(os.path.dirname(dst_json))
-                shutil.move(src_json, dst_json)
-                copied_json += 1
-
-                # Copy corresponding PDF file to files subfolder
-                base_name = os.path.splitext(filename)[0]
-                pdf_filename = base_name + ".pdf"
-                src_pdf = os.path.join(config.DATASET_DIR, pdf_filename)
-                dst_pdf = os.path.join(files_dir, pdf_filename)
-
-                if os.path.exists(src_pdf):
-                    utils.ensure_dir_exists(os.path.dirname(dst_pdf))
-                    shutil.move(src_pdf, dst_pdf)
-                    copied_pdf += 1
-            else:
-                print(f"Warning: JSON file not found: {filename}")
-
-        except Exception as e:
-            print(f"Error copying {filename}: {e}")
+    pdf_jobs = []
+    for filename, (_, _, error) in zip(verified_files, json_results):
+        if error is None:
+            copied_json += 1
+            pdf_filename = os.path.splitext(filename)[0] + ".pdf"
+            pdf_jobs.append(
+                (
+                    os.path.join(config.DATASET_DIR, pdf_filename),
+                    os.path.join(files_dir, pdf_filename),
+                )
+            )
+        elif error.startswith("skipped"):
+            print(f"Warning: JSON file not found: {filename}")
+        else:
+            print(f"Error copying {filename}: {error}")
+
+    pdf_results = move_engine.move_files(pdf_jobs, name="filter_verified_labels")
+    copied_pdf = sum(1 for _, _, error in pdf_results if error is None)
+    for src, _, error in pdf_results:
+        if error and not error.startswith("skipped"):
+            print(f"Error copying {os.path.basename(src)}: {error}")
 
     # Create summary report
     report_path = os.path.join(label_true_dir, "verified_summary.txt")
@@ -130,6 +116,18 @@ def filter_verified_labels():
     except Exception as e:
         print(f"Error writing summary report: {e}")
 
+    utils.write_metrics(
+        "filter_verified",
+        {
+            "labels": len(verdicts),
+            "verified": len(verified_files),
+            "moved_json": copied_json,
+            "moved_pdf": copied_pdf,
+            "outputs": {"dir": label_true_dir, "summary": report_path},
+        },
+        started,
+    )
+
     print(f"\n✅ Successfully moved files:")
     print(f"   - {copied_json} JSON files → {labels_dir}")
     print(f"   - {copied_pdf} PDF files → {files_dir}")
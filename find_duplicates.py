@@ -1,8 +1,15 @@
 import os
 import json
 import hashlib
-import shutil
+import mmap
+import pickle
+import time
+import argparse
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import config
+import move_engine
+import inventory
 import utils
 
 # Output directories for duplicates
@@ -10,55 +17,408 @@ DUPLICATE_DIR = os.path.join(config.BASE_DIR, "output_analyze", "duplicates")
 DUPLICATE_LABELS_DIR = os.path.join(DUPLICATE_DIR, "labels")
 DUPLICATE_FILES_DIR = os.path.join(DUPLICATE_DIR, "files")
 
+PDF_DUPLICATE_REPORT = os.path.join(DUPLICATE_DIR, "pdf_duplicate_report.txt")
 
-def get_json_content_hash(json_path):
+# Per-shard {filename: content hash}, grouped and moved by merge_shards.py
+SHARD_HASHES = os.path.join(config.SHARD_DIR, "duplicate_hashes.json")
+
+
+# Below this many files, hashing runs in-process (pool startup costs more)
+PARALLEL_HASH_MIN_FILES = 256
+HASH_CHUNK_SIZE = 256
+
+HASH_CACHE_VERSION = 1
+
+
+def canonical_digest(json_path):
     """
-    Read JSON, parse it, dump it with sorted keys to ensure canonical representation,
-    and return MD5 hash.
+    Parse a JSON file, dump it with sorted keys (so key order and formatting do
+    not matter) and return the 16-byte BLAKE2b digest of that canonical form.
+    Raises on unreadable or invalid JSON.
     """
+    data = utils.load_json(json_path)
+    canonical_str = json.dumps(data, sort_keys=True)
+    return hashlib.blake2b(canonical_str.encode("utf-8"), digest_size=16).digest()
+
+
+def get_json_content_hash(json_path):
+    """Hex content hash of a JSON file, or None (error printed) if it cannot be read."""
     try:
-        with open(json_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        # Dump with sort_keys=True to ensure key order doesn't affect hash
-        # indent=0 to ignore whitespace differences if we were reading text,
-        # but since we parse and dump, formatting is normalized.
-        canonical_str = json.dumps(data, sort_keys=True)
-        return hashlib.md5(canonical_str.encode("utf-8")).hexdigest()
+        return canonical_digest(json_path).hex()
     except Exception as e:
         print(f"Error processing {json_path}: {e}")
         return None
 
 
-def find_and_move_duplicates():
+def _hash_file(json_path):
+    # Worker: errors are returned, the main process prints them in order
+    try:
+        return canonical_digest(json_path), None
+    except Exception as e:
+        return None, str(e)
+
+
+def hash_labels(filenames, workers=None):
+    """
+    Content digests of labels in LABEL_DIR. Parsing and canonicalization are
+    CPU-bound, so large sets are spread over a process pool in chunks.
+
+    Yields:
+        (filename, digest bytes or None, error message or None) in input order
+    """
+    paths = [os.path.join(config.LABEL_DIR, f) for f in filenames]
+    workers = workers or config.PDF_WORKERS
+    if len(paths) < PARALLEL_HASH_MIN_FILES or workers <= 1:
+        results = map(_hash_file, paths)
+        yield from ((f, *r) for f, r in zip(filenames, results))
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(_hash_file, paths, chunksize=HASH_CHUNK_SIZE)
+        yield from ((f, *r) for f, r in zip(filenames, results))
+
+
+def hash_cache_path(shard=None):
+    """
+    Hash cache file of a run: HASH_CACHE_FILE, or one file per shard so shard
+    runs sharing CACHE_DIR do not overwrite each other's cache.
+    """
+    if shard is None:
+        return config.HASH_CACHE_FILE
+    index, count = shard
+    name, ext = os.path.splitext(config.HASH_CACHE_FILE)
+    return f"{name}.shard{index}of{count}{ext}"
+
+
+def load_hash_cache(path=None):
+    """
+    Returns the persistent label hash cache
+    {filename: (size, mtime_ns, digest bytes)}, or {} if missing or unusable.
+    """
+    path = path or config.HASH_CACHE_FILE
+    if not config.HASH_CACHE_ENABLED or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        if (
+            data.get("version") != HASH_CACHE_VERSION
+            or data.get("root") != os.path.normpath(config.LABEL_DIR)
+        ):
+            return {}
+        return data["hashes"]
+    except Exception as e:
+        print(f"Warning: ignoring unreadable hash cache {path}: {e}")
+        return {}
+
+
+def save_hash_cache(hashes, path=None):
+    if not config.HASH_CACHE_ENABLED:
+        return
+    path = path or config.HASH_CACHE_FILE
+    # Per-process temporary file: concurrent runs never write the same one
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        utils.ensure_dir_exists(os.path.dirname(path))
+        with open(tmp_path, "wb") as f:
+            pickle.dump(
+                {
+                    "version": HASH_CACHE_VERSION,
+                    "root": os.path.normpath(config.LABEL_DIR),
+                    "hashes": hashes,
+                },
+                f,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"Warning: could not save hash cache {path}: {e}")
+
+
+def cached_hash_labels(
+    entries, all_entries=None, stats=None, workers=None, cache_path=None
+):
+    """
+    hash_labels() with a persistent cache keyed by (filename, size, mtime_ns):
+    only new or changed labels are read. Once all results are consumed, the
+    cache is saved with the entries of all_entries (default: entries) that are
+    still unchanged, so deleted or moved labels are dropped.
+
+    Args:
+        entries: Inventory FileEntry objects of the labels to hash
+        all_entries: Every label currently in LABEL_DIR (e.g. when entries is
+            one shard)
+        stats: Optional dict, receives "hits" and "misses" counts
+        workers: Worker processes for hashing
+        cache_path: Cache file (default: config.HASH_CACHE_FILE)
+
+    Yields:
+        (filename, digest bytes or None, error message or None) in input order
+    """
+    stats = stats if stats is not None else {}
+    stats["hits"] = stats["misses"] = 0
+    cache = load_hash_cache(cache_path)
+
+    def file_stat(e):
+        # The inventory snapshot is reused while directory mtimes are unchanged,
+        # so a label rewritten in place can still show its old size/mtime there:
+        # a would-be cache hit is confirmed with a stat(); misses are read anyway
+        cached = cache.get(e.rel_path)
+        if cached is None or cached[:2] != (e.size, e.mtime_ns):
+            return e.size, e.mtime_ns
+        try:
+            st = os.stat(os.path.join(config.LABEL_DIR, e.rel_path))
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    current = {e.rel_path: (e.size, e.mtime_ns) for e in (all_entries or entries)}
+    current.update((e.rel_path, file_stat(e)) for e in entries)
+
+    def is_hit(e):
+        cached = cache.get(e.rel_path)
+        return cached is not None and cached[:2] == current[e.rel_path]
+
+    # Misses are hashed (in parallel, in order) while hits are yielded in between
+    misses = [e for e in entries if not is_hit(e)]
+    computed = hash_labels([e.rel_path for e in misses], workers)
+    for e in entries:
+        if is_hit(e):
+            stats["hits"] += 1
+            yield e.rel_path, cache[e.rel_path][2], None
+            continue
+        stats["misses"] += 1
+        filename, digest, error = next(computed)
+        if digest is not None and current[filename] is not None:
+            cache[filename] = current[filename] + (digest,)
+        yield filename, digest, error
+
+    save_hash_cache(
+        {
+            name: value
+            for name, value in cache.items()
+            if current.get(name) == value[:2]
+        },
+        cache_path,
+    )
+
+
+def _pdf_digest(path, size, partial):
+    """
+    BLAKE2b digest of a file read through mmap: only the first and last
+    PDF_DUP_BLOCK_SIZE bytes if partial, otherwise the whole file.
+    """
+    block = config.PDF_DUP_BLOCK_SIZE
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if partial:
+            digest.update(mm[:block])
+            digest.update(mm[-block:])
+        else:
+            digest.update(mm)
+    return digest.digest()
+
+
+def _refine(groups, partial, workers):
+    """
+    Split each group of (rel_path, size) by digest; keep sub-groups of 2+ files.
+
+    Returns:
+        Tuple of (list of groups, number of files read)
+    """
+    items = [item for group in groups for item in group]
+
+    def digest(item):
+        rel_path, size = item
+        try:
+            return _pdf_digest(os.path.join(config.DATASET_DIR, rel_path), size, partial)
+        except (OSError, ValueError) as e:
+            print(f"Error reading {rel_path}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        digests = list(pool.map(digest, items))
+
+    buckets = defaultdict(list)
+    for (rel_path, size), d in zip(items, digests):
+        if d is not None:
+            buckets[(size, d)].append((rel_path, size))
+    return [g for g in buckets.values() if len(g) > 1], len(items)
+
+
+def find_duplicate_pdfs(workers=None):
+    """
+    Find byte-identical PDFs (the same file uploaded under different names).
+    Files are grouped by size first; only files sharing a size are partially
+    hashed (first and last block), and only files that still collide are hashed
+    in full. Writes pdf_duplicate_report.txt; files are not moved.
+
+    Returns:
+        List of (size, sorted relative paths); the first file is the one kept
+    """
+    print(">>> STARTING PDF DUPLICATE DETECTION")
+    print(f"Scanning directory: {config.DATASET_DIR}")
+
+    if not os.path.exists(config.DATASET_DIR):
+        print(f"Error: Dataset directory not found: {config.DATASET_DIR}")
+        return []
+
+    workers = workers or config.PDF_DUP_WORKERS
+    entries = inventory.get_inventory(config.DATASET_DIR).files(".pdf")
+    print(f"Found {len(entries)} PDF files.")
+
+    # 1. Same size (from the inventory, nothing is read)
+    by_size = defaultdict(list)
+    for e in entries:
+        by_size[e.size].append((e.rel_path, e.size))
+    candidates = [g for g in by_size.values() if len(g) > 1]
+
+    # Empty files are identical to each other without reading them
+    groups = [g for g in candidates if g[0][1] == 0]
+    candidates = [g for g in candidates if g[0][1] > 0]
+    print(f"Files sharing a size: {sum(len(g) for g in candidates)}")
+
+    # 2. First + last block; files up to two blocks are fully read here already
+    block = config.PDF_DUP_BLOCK_SIZE
+    small = [g for g in candidates if g[0][1] <= 2 * block]
+    large = [g for g in candidates if g[0][1] > 2 * block]
+    small_groups, read_small = _refine(small, False, workers)
+    large_groups, read_partial = _refine(large, True, workers)
+
+    # 3. Full hash only for large files whose blocks still collide
+    full_groups, read_full = _refine(large_groups, False, workers)
+    groups += small_groups + full_groups
+
+    groups = sorted(
+        (sorted(rel_path for rel_path, _ in g), g[0][1]) for g in groups
+    )
+    groups = [(size, paths) for paths, size in groups]
+    write_pdf_duplicate_report(
+        groups, len(entries), read_partial - read_full, read_small + read_full
+    )
+    return groups
+
+
+def write_pdf_duplicate_report(groups, total_files, read_partial, read_full):
+    """Write pdf_duplicate_report.txt in the style of duplicate_report.txt."""
+    utils.ensure_dir_exists(DUPLICATE_DIR)
+    total_duplicates = sum(len(paths) - 1 for _, paths in groups)
+
+    with open(PDF_DUPLICATE_REPORT, "w", encoding="utf-8") as f:
+        f.write("BÁO CÁO CÁC FILE PDF TRÙNG LẶP NỘI DUNG (PDF DUPLICATE REPORT)\n")
+        f.write("=" * 70 + "\n")
+        f.write(f"Tổng số file PDF: {total_files}\n")
+        f.write(f"Số file chỉ đọc một phần (đầu + cuối): {read_partial}\n")
+        f.write(f"Số file đọc toàn bộ: {read_full}\n")
+        f.write(f"Tổng số nhóm trùng lặp: {len(groups)}\n")
+        f.write(f"Tổng số file trùng lặp: {total_duplicates}\n")
+        f.write("=" * 70 + "\n\n")
+
+        for size, paths in groups:
+            f.write(f"Nhóm trùng lặp (Kích thước: {utils.format_size(size)}):\n")
+            for i, rel_path in enumerate(paths):
+                marker = "[GIỮ LẠI]" if i == 0 else "[TRÙNG]"
+                label = os.path.splitext(rel_path)[0] + ".json"
+                has_label = os.path.exists(os.path.join(config.LABEL_DIR, label))
+                note = f"label: {label}" if has_label else "không có label"
+                f.write(f"   {marker} {rel_path} ({note})\n")
+            f.write("-" * 50 + "\n")
+
+    print(
+        f"\nFound {len(groups)} groups of identical PDFs, "
+        f"totaling {total_duplicates} duplicate files."
+    )
+    print(f"Files read partially: {read_partial}, in full: {read_full}")
+    print(f"Report saved to: {PDF_DUPLICATE_REPORT}")
+
+
+def find_and_move_duplicates(shard=None):
+    """
+    Group labels with identical content and move all but one of each group.
+
+    Args:
+        shard: Optional (index, count); only the labels of that shard are hashed
+            and the hashes saved; grouping and moving happen in merge_shards.py,
+            since duplicates can span shards
+    """
     print(">>> STARTING DUPLICATE DETECTION")
+    started = time.perf_counter()
     print(f"Scanning directory: {config.LABEL_DIR}")
 
     if not os.path.exists(config.LABEL_DIR):
         print(f"Error: Label directory not found: {config.LABEL_DIR}")
         return
 
-    # Map: hash -> list of filenames
-    content_map = {}
-
-    json_files = [
-        f for f in os.listdir(config.LABEL_DIR) if f.lower().endswith(".json")
-    ]
-    total_files = len(json_files)
+    all_entries = inventory.get_inventory(config.LABEL_DIR).files(
+        ".json", recursive=False
+    )
+    entries = all_entries
+    if shard:
+        entries = [e for e in all_entries if utils.in_shard(e.name, shard)]
+        print(f"Shard {shard[0]}/{shard[1]}")
+    total_files = len(entries)
 
     print(f"Found {total_files} JSON files. Calculating hashes...")
 
-    for i, filename in enumerate(json_files):
-        file_path = os.path.join(config.LABEL_DIR, filename)
-        file_hash = get_json_content_hash(file_path)
+    # Compact grouping: one 16-byte digest -> (position, filename) per distinct
+    # content; lists are only built for contents seen more than once
+    first_by_digest = {}
+    content_map = {}
+    shard_hashes = {}
+    cache_stats = {}
 
-        if file_hash:
-            if file_hash not in content_map:
-                content_map[file_hash] = []
-            content_map[file_hash].append(filename)
+    results = cached_hash_labels(
+        entries, all_entries, cache_stats, cache_path=hash_cache_path(shard)
+    )
+    for i, (filename, digest, error) in enumerate(results):
+        if error is not None:
+            print(f"Error processing {os.path.join(config.LABEL_DIR, filename)}: {error}")
+        elif shard:
+            shard_hashes[filename] = digest.hex()
+        elif digest in content_map:
+            content_map[digest][1].append(filename)
+        elif digest in first_by_digest:
+            position, first = first_by_digest.pop(digest)
+            content_map[digest] = (position, [first, filename])
+        else:
+            first_by_digest[digest] = (i, filename)
 
         if (i + 1) % 100 == 0:
             print(f"Processed {i + 1}/{total_files} files...")
 
+    print(
+        f"Hash cache: {cache_stats['hits']} reused, "
+        f"{cache_stats['misses']} hashed (new or changed)"
+    )
+
+    if shard:
+        hashes = shard_hashes
+        path = utils.shard_path(SHARD_HASHES, shard)
+        utils.ensure_dir_exists(config.SHARD_DIR)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(hashes, f, ensure_ascii=False)
+        print(f"Shard hashes saved to: {path}")
+        return
+
+    # Groups in the order their first file was scanned
+    groups = sorted(content_map.items(), key=lambda item: item[1][0])
+    move_duplicates(
+        {digest.hex(): names for digest, (_, names) in groups},
+        total_files,
+        started=started,
+    )
+
+
+def move_duplicates(content_map, total_files, started=None):
+    """
+    Move every label of a content group except the alphabetically first one
+    (and its PDF) to the duplicates folder and write the report.
+
+    Args:
+        content_map: Dict {content hash: [label filenames]}
+        total_files: Number of labels scanned (recorded in the metrics)
+        started: perf_counter() at the start of the run, for the metrics duration
+    """
     # Identify duplicates
     duplicates = {k: v for k, v in content_map.items() if len(v) > 1}
 
@@ -69,6 +429,17 @@ def find_and_move_duplicates():
 
     if total_duplicates == 0:
         print("No duplicates found.")
+        utils.write_metrics(
+            "find_duplicates",
+            {
+                "labels": total_files,
+                "groups": 0,
+                "duplicates": 0,
+                "moved": 0,
+                "report": None,
+            },
+            started,
+        )
         return
 
     # Create duplicate directories
@@ -77,6 +448,29 @@ def find_and_move_duplicates():
 
     report_path = os.path.join(DUPLICATE_DIR, "duplicate_report.txt")
 
+    # Sort filenames to ensure deterministic behavior (keep the first one alphabetically)
+    for filenames in duplicates.values():
+        filenames.sort()
+
+    # Plan all JSON + PDF moves, then run them as one journaled batch
+    jobs = []
+    for filenames in duplicates.values():
+        for dupe_json in filenames[1:]:
+            pdf_filename = os.path.splitext(dupe_json)[0] + ".pdf"
+            jobs.append(
+                (
+                    os.path.join(config.LABEL_DIR, dupe_json),
+                    os.path.join(DUPLICATE_LABELS_DIR, dupe_json),
+                )
+            )
+            jobs.append(
+                (
+                    os.path.join(config.DATASET_DIR, pdf_filename),
+                    os.path.join(DUPLICATE_FILES_DIR, pdf_filename),
+                )
+            )
+    move_results = iter(move_engine.move_files(jobs, name="find_duplicates"))
+
     moved_count = 0
 
     with open(report_path, "w", encoding="utf-8") as f:
@@ -87,9 +481,6 @@ def find_and_move_duplicates():
         f.write("=" * 70 + "\n\n")
 
         for file_hash, filenames in duplicates.items():
-            # Sort filenames to ensure deterministic behavior (keep the first one alphabetically)
-            filenames.sort()
-
             original = filenames[0]
             dupes = filenames[1:]
 
@@ -99,37 +490,54 @@ def find_and_move_duplicates():
             for dupe_json in dupes:
                 f.write(f"   [DI CHUYỂN] {dupe_json}\n")
 
-                # Move JSON
-                try:
-                    src_json = os.path.join(config.LABEL_DIR, dupe_json)
-                    dst_json = os.path.join(DUPLICATE_LABELS_DIR, dupe_json)
-                    if os.path.exists(src_json):
-                        shutil.move(src_json, dst_json)
-                except Exception as e:
-                    f.write(f"      -> Lỗi di chuyển JSON: {e}\n")
-
-                # Move PDF
-                try:
-                    base_name = os.path.splitext(dupe_json)[0]
-                    pdf_filename = base_name + ".pdf"
-
-                    src_pdf = os.path.join(config.DATASET_DIR, pdf_filename)
-                    dst_pdf = os.path.join(DUPLICATE_FILES_DIR, pdf_filename)
-
-                    if os.path.exists(src_pdf):
-                        shutil.move(src_pdf, dst_pdf)
-                        f.write(f"      -> Đã di chuyển PDF: {pdf_filename}\n")
-                    else:
-                        f.write(f"      -> PDF không tồn tại: {pdf_filename}\n")
-                except Exception as e:
-                    f.write(f"      -> Lỗi di chuyển PDF: {e}\n")
+                # JSON result
+                _, _, error = next(move_results)
+                if error and not error.startswith("skipped"):
+                    f.write(f"      -> Lỗi di chuyển JSON: {error}\n")
+
+                # PDF result
+                _, dst_pdf, error = next(move_results)
+                pdf_filename = os.path.basename(dst_pdf)
+                if error is None:
+                    f.write(f"      -> Đã di chuyển PDF: {pdf_filename}\n")
+                elif error.startswith("skipped"):
+                    f.write(f"      -> PDF không tồn tại: {pdf_filename}\n")
+                else:
+                    f.write(f"      -> Lỗi di chuyển PDF: {error}\n")
 
                 moved_count += 1
             f.write("-" * 50 + "\n")
 
     print(f"\nMoved {moved_count} duplicate files to: {DUPLICATE_DIR}")
     print(f"Report saved to: {report_path}")
+    utils.write_metrics(
+        "find_duplicates",
+        {
+            "labels": total_files,
+            "groups": len(duplicates),
+            "duplicates": total_duplicates,
+            "moved": moved_count,
+            "report": report_path,
+        },
+        started,
+    )
 
 
 if __name__ == "__main__":
-    find_and_move_duplicates()
+    parser = argparse.ArgumentParser(description="Move labels with duplicate content")
+    parser.add_argument(
+        "--shard",
+        type=utils.shard_arg,
+        help="Only hash shard i of N (e.g. 1/4), see merge_shards.py",
+    )
+    parser.add_argument(
+        "--pdf",
+        action="store_true",
+        help="Report byte-identical PDFs instead of moving duplicate labels",
+    )
+    args = parser.parse_args()
+
+    if args.pdf:
+        find_duplicate_pdfs()
+    else:
+        find_and_move_duplicates(shard=args.shard)
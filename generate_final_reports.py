@@ -1,12 +1,28 @@
 import os
+import glob
+import json
+import hashlib
+import itertools
 import config
+import results_db
 import utils
 
-def read_lines(path):
-    if os.path.exists(path):
-        with open(path, 'r', encoding='utf-8') as f:
-            return [l.strip() for l in f.readlines()]
-    return []
+OVERVIEW_REPORT = os.path.join(config.BASE_DIR, "General_Overview_Report.md")
+ERRORS_REPORT = os.path.join(config.BASE_DIR, "Detailed_Error_Report.md")
+SUMMARY_REPORT = os.path.join(config.REVIEW_DIR, "data_summary_report.txt")
+
+# Rendered sections with the signature of the metrics/files they came from
+SECTION_CACHE = os.path.join(config.CACHE_DIR, "final_report_sections.json")
+
+# Metrics of these stages are shown in the timing section
+TIMED_STAGES = [
+    "data_summary_report",
+    "find_duplicates",
+    "extract_pdf",
+    "verify_labels",
+    "filter_results",
+    "filter_verified",
+]
 
 def count_lines_in_csv(path):
     if os.path.exists(path):
@@ -14,105 +30,374 @@ def count_lines_in_csv(path):
             return sum(1 for line in f) - 1 # Subtract header
     return 0
 
-def generate_reports():
-    print("Generating Final Reports...")
+def iter_report_entries(path):
+    """
+    Yields the entries of a PDF report from extract_pdf.write_extraction_reports
+    (title + separator, then one line each), reading the file line by line.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in itertools.islice(f, 2, None):
+            line = line.strip()
+            if line:
+                yield line
 
-    # Output Paths
-    report_overview = os.path.join(config.BASE_DIR, "General_Overview_Report.md")
-    report_errors = os.path.join(config.BASE_DIR, "Detailed_Error_Report.md")
+def error_row(line):
+    """Markdown table row of a pdf_error_files.txt entry ("file | error")."""
+    if "|" in line:
+        parts = line.split("|", 1)
+        return f"| {parts[0].strip()} | {parts[1].strip()} |\n"
+    return f"| {line} | - |\n"
+
+def page_link(path):
+    """Link to a file in REPORT_PAGES_DIR, relative to the reports in BASE_DIR."""
+    return os.path.relpath(path, config.BASE_DIR).replace(os.sep, "/")
+
+def pages_index(name):
+    return os.path.join(config.REPORT_PAGES_DIR, f"{name}_index.md")
+
+def remove_report_pages(name):
+    for path in glob.glob(os.path.join(config.REPORT_PAGES_DIR, f"{name}_*.md")):
+        os.remove(path)
+
+def write_report_pages(name, title, entries, page_header="", page_footer=""):
+    """
+    Write a long list to REPORT_PAGES_DIR/<name>_0001.md, ... (REPORT_PAGE_SIZE
+    entries per page) and an index <name>_index.md linking every page. Entries are
+    streamed: only one page is held in memory.
+
+    Args:
+        name: File name prefix of the pages
+        title: Heading of the index and the pages
+        entries: Iterable of formatted lines (with newline)
+        page_header: Text before the entries of each page (e.g. a table header)
+        page_footer: Text after the entries of each page
+
+    Returns:
+        Number of pages written
+    """
+    utils.ensure_dir_exists(config.REPORT_PAGES_DIR)
+    # Pages of a previous, longer list would stay linked from nowhere
+    remove_report_pages(name)
+
+    entries = iter(entries)
+    index_name = os.path.basename(pages_index(name))
+    pages = []  # (file name, first entry, last entry)
+    first = 1
+    while True:
+        chunk = list(itertools.islice(entries, config.REPORT_PAGE_SIZE))
+        if not chunk:
+            break
+        page_name = f"{name}_{len(pages) + 1:04d}.md"
+        last = first + len(chunk) - 1
+        with open(os.path.join(config.REPORT_PAGES_DIR, page_name), 'w', encoding='utf-8') as f:
+            f.write(f"# {title} - Trang {len(pages) + 1} (mục {first}-{last})\n\n")
+            f.write(f"[Mục lục]({index_name})\n\n")
+            f.write(page_header)
+            f.writelines(chunk)
+            f.write(page_footer)
+        pages.append((page_name, first, last))
+        first = last + 1
+
+    with open(pages_index(name), 'w', encoding='utf-8') as f:
+        f.write(f"# {title}\n\n")
+        f.write(f"Tổng số: {first - 1} mục, {len(pages)} trang.\n\n")
+        f.write("| Trang | Mục |\n|---|---|\n")
+        for number, (page_name, page_first, page_last) in enumerate(pages, 1):
+            f.write(f"| [{number}]({page_name}) | {page_first}-{page_last} |\n")
+    return len(pages)
+
+def render_list(name, title, entries, count, header="", footer=""):
+    """
+    Render a report list: all entries inline up to REPORT_INLINE_LIMIT; longer
+    lists show their first entries and a link to the paginated full list.
+
+    Args:
+        entries: Function returning a fresh iterable of formatted lines
+        count: Number of entries
+    """
+    limit = config.REPORT_INLINE_LIMIT
+    lines = [header]
+    lines += itertools.islice(entries(), limit)
+    lines.append(footer)
+    if count <= limit:
+        remove_report_pages(name)
+        return "".join(lines)
+
+    pages = write_report_pages(name, title, entries(), header, footer)
+    lines.append(
+        f"\n> Hiển thị {limit}/{count} mục đầu tiên. "
+        f"Danh sách đầy đủ ({pages} trang): [{title}]({page_link(pages_index(name))})\n"
+    )
+    return "".join(lines)
+
+def paged_files(name, count):
+    """Files a list section writes besides its text (re-rendered if missing)."""
+    return [pages_index(name)] if count > config.REPORT_INLINE_LIMIT else []
+
+def file_signature(path):
+    """Size and mtime of a file embedded in a section, None if missing."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+def section_inputs(metrics):
+    """Metrics without their run time: re-running a stage with the same results does not re-render."""
+    if metrics is None:
+        return None
+    return {k: v for k, v in metrics.items() if k not in ("finished", "seconds")}
+
+def extraction_metrics():
+    """
+    Counts and report paths of the PDF extraction: from the extract_pdf metrics
+    while the reports they describe are unchanged, else from the report files.
+    """
+    metrics = utils.load_metrics("extract_pdf")
+    if metrics is not None and utils.metrics_current(metrics):
+        reports = metrics.get("reports", {})
+        if None not in (
+            metrics.get("errors"),
+            metrics.get("images"),
+            reports.get("errors"),
+            reports.get("images"),
+        ):
+            return metrics
+    reports = {"errors": config.ERROR_PDF_REPORT, "images": config.IMAGE_PDF_REPORT}
+    return {
+        "errors": sum(1 for _ in iter_report_entries(reports["errors"])),
+        "images": sum(1 for _ in iter_report_entries(reports["images"])),
+        "reports": reports,
+    }
+
+def verification_counts():
+    """
+    Number of MISSING and SIMILAR fields: verification metrics while the CSV they
+    describe is unchanged, else the results database, else the filtered CSVs
+    (line count).
+    """
+    metrics = utils.load_metrics("verify_labels")
+    if metrics is not None and utils.metrics_current(metrics):
+        statuses = metrics.get("statuses")
+        if isinstance(statuses, dict):
+            return statuses.get("MISSING", 0), statuses.get("SIMILAR", 0)
+
+    db = results_db.connect()
+    if db is not None:
+        # Exact row counts from the status index
+        status_counts = results_db.status_counts(db)
+        db.close()
+        return status_counts["MISSING"], status_counts["SIMILAR"]
 
-    # Gather Data
-    # 1. File Stats
-    summary_txt = utils.read_file(os.path.join(config.REVIEW_DIR, "data_summary_report.txt"))
-    
-    # 2. PDF Issues
-    pdf_errors = read_lines(config.ERROR_PDF_REPORT) # First few lines are header
-    pdf_images = read_lines(config.IMAGE_PDF_REPORT)
-    
-    count_pdf_errors = max(0, len(pdf_errors) - 3) # Approx adjustment for header
-    count_pdf_images = max(0, len(pdf_images) - 3)
-
-    # 3. Label Verification
     missing_csv = os.path.join(config.REVIEW_DIR, "label_verification_missing.csv")
     similar_csv = os.path.join(config.REVIEW_DIR, "label_verification_similar.csv")
-    
-    count_missing_fields = count_lines_in_csv(missing_csv)
-    count_similar_fields = count_lines_in_csv(similar_csv)
-    
+    return count_lines_in_csv(missing_csv), count_lines_in_csv(similar_csv)
+
+def load_section_cache():
+    if not os.path.exists(SECTION_CACHE):
+        return {}
+    try:
+        with open(SECTION_CACHE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Warning: ignoring unreadable section cache {SECTION_CACHE}: {e}")
+        return {}
+
+def save_section_cache(cache):
+    utils.ensure_dir_exists(os.path.dirname(SECTION_CACHE))
+    tmp_path = SECTION_CACHE + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False)
+    os.replace(tmp_path, SECTION_CACHE)
+
+def render_sections(sections, cache, out):
+    """
+    Write (name, inputs, render function[, files]) sections to an open report,
+    one at a time, reusing the cached text of sections whose inputs are unchanged
+    since the last run and whose extra files (e.g. report pages) still exist.
+
+    Returns:
+        Names of the re-rendered sections
+    """
+    rendered = []
+    for name, inputs, render, *files in sections:
+        signature = hashlib.sha1(
+            json.dumps(inputs, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        ).hexdigest()
+        cached = cache.get(name)
+        if (
+            cached is None
+            or cached["signature"] != signature
+            or not all(os.path.exists(p) for p in (files[0] if files else []))
+        ):
+            cached = {"signature": signature, "text": render()}
+            cache[name] = cached
+            rendered.append(name)
+        out.write(cached["text"])
+    return rendered
+
+# --- GENERAL OVERVIEW REPORT ---
+def render_overview_files():
+    summary_txt = utils.read_file(SUMMARY_REPORT)
+    lines = ["# BÁO CÁO TỔNG QUAN HỆ THỐNG XỬ LÝ DỮ LIỆU\n\n"]
+    lines.append("## 1. Tình trạng dữ liệu gốc (Files)\n")
+    lines.append("Dựa trên kết quả phân tích file ban đầu:\n")
+    lines.append("```\n")
+    lines.append(summary_txt)
+    lines.append("\n```\n\n")
+    return "".join(lines)
+
+def render_overview_extraction(extraction):
+    lines = ["## 2. Kết quả trích xuất PDF (Extraction)\n"]
+    lines.append(f"- Thư viện sử dụng: **PyMuPDF (fitz)**\n")
+    lines.append(f"- Tổng số file lỗi (Không đọc được): **{extraction['errors']}**\n")
+    lines.append(f"- Tổng số file dạng ảnh/scan (Không có text): **{extraction['images']}**\n\n")
+    return "".join(lines)
+
+def render_overview_verification(count_missing_fields, count_similar_fields):
     verify_txt = utils.read_file(config.VERIFY_REPORT_TXT)
+    lines = ["## 3. Kết quả đối soát nhãn (Label Verification)\n"]
+    lines.append("So sánh dữ liệu file JSON (Label) với Text trích xuất:\n")
+    lines.append(f"- Số trường MISSING (Không tìm thấy): **{count_missing_fields}**\n")
+    lines.append(f"- Số trường SIMILAR (Tương đồng > 80%): **{count_similar_fields}**\n")
+    lines.append("- Chi tiết thống kê:\n")
+    lines.append("```\n")
+    lines.append(verify_txt)
+    lines.append("\n```\n")
+    return "".join(lines)
+
+def render_overview_timings(timings):
+    if not timings:
+        return ""
+    lines = ["\n## 4. Thời gian xử lý (Timings)\n"]
+    lines.append("| Bước | Thời gian | Hoàn thành |\n|---|---|---|\n")
+    for name, seconds, finished in timings:
+        lines.append(f"| {name} | {seconds:.2f}s | {finished} |\n")
+    return "".join(lines)
+
+# --- DETAILED ERROR REPORT ---
+def render_errors_pdf(extraction):
+    count_pdf_errors = extraction["errors"]
+    lines = ["# BÁO CÁO CHI TIẾT LỖI & VẤN ĐỀ\n\n"]
+    lines.append("## 1. Các file PDF bị lỗi (Corrupt/Error)\n")
+    lines.append(f"Tổng số: {count_pdf_errors}\n")
+    if count_pdf_errors > 0:
+        lines.append(render_list(
+            "pdf_errors",
+            "Các file PDF bị lỗi",
+            lambda: map(error_row, iter_report_entries(extraction["reports"]["errors"])),
+            count_pdf_errors,
+            header="| Tên File | Lỗi |\n|---|---|\n",
+        ))
+    else:
+        lines.append("> Không có file lỗi.\n")
+    return "".join(lines)
+
+def render_errors_images(extraction):
+    count_pdf_images = extraction["images"]
+    lines = ["\n## 2. Các file PDF dạng ảnh/Scan (Cần OCR)\n"]
+    lines.append(f"Tổng số: {count_pdf_images}\n")
+    if count_pdf_images > 0:
+        lines.append(render_list(
+            "pdf_images",
+            "Các file PDF dạng ảnh/Scan",
+            lambda: (line + "\n" for line in iter_report_entries(extraction["reports"]["images"])),
+            count_pdf_images,
+            header="```\n",
+            footer="```\n",
+        ))
+    else:
+        lines.append("> Không có file dạng ảnh.\n")
+    return "".join(lines)
+
+def render_errors_verification(count_missing_fields, count_similar_fields):
+    lines = ["\n## 3. Vấn đề đối soát dữ liệu (Verification Issues)\n"]
+    lines.append("### A. Dữ liệu KHÔNG tìm thấy (Missing)\n")
+    lines.append(f"- Số lượng: {count_missing_fields} trường dữ liệu.\n")
+    lines.append(f"- Xem chi tiết file: `review_data/label_verification_missing.csv`\n")
+    lines.append("- Các trường hợp phổ biến cần kiểm tra:\n")
+    lines.append("  - Lỗi format ngày tháng (dd/mm/yyyy vs mm/dd/yyyy).\n")
+    lines.append("  - Lỗi format số tiền (dấu phẩy/chấm).\n")
+    lines.append("  - OCR đọc sai ký tự (O vs 0, I vs 1).\n")
+    lines.append("  - Key trong JSON không tồn tại trong văn bản.\n")
+
+    lines.append("\n### B. Dữ liệu tương đồng (Fuzzy Match - Cần người duyệt)\n")
+    lines.append(f"- Số lượng: {count_similar_fields} trường dữ liệu.\n")
+    lines.append(f"- Xem chi tiết file: `review_data/label_verification_similar.csv`\n")
+    lines.append("- Đây là các trường có độ tự tin > 80%. Cần review nhanh để confirm đúng/sai.\n")
+    return "".join(lines)
+
+def generate_reports():
+    """
+    Render the Markdown reports from the per-stage metrics (review_data/metrics).
+    Each section is cached with the signature of its inputs; only sections whose
+    metrics or embedded files changed are rendered again. Long file lists are
+    cut to REPORT_INLINE_LIMIT entries, the rest paginated in REPORT_PAGES_DIR.
+    """
+    print("Generating Final Reports...")
+
+    # Gather Data
+    extraction = extraction_metrics()
+    count_missing_fields, count_similar_fields = verification_counts()
+    verification = (count_missing_fields, count_similar_fields)
+
+    timings = []
+    for name in TIMED_STAGES:
+        metrics = utils.load_metrics(name)
+        if metrics is not None and "seconds" in metrics:
+            timings.append((name, metrics["seconds"], metrics.get("finished", "")))
+
+    extraction_inputs = section_inputs(extraction)
+    paging = [config.REPORT_INLINE_LIMIT, config.REPORT_PAGE_SIZE]
+    overview_sections = [
+        ("overview_files", file_signature(SUMMARY_REPORT), render_overview_files),
+        (
+            "overview_extraction",
+            extraction_inputs,
+            lambda: render_overview_extraction(extraction),
+        ),
+        (
+            "overview_verification",
+            [verification, file_signature(config.VERIFY_REPORT_TXT)],
+            lambda: render_overview_verification(*verification),
+        ),
+        ("overview_timings", timings, lambda: render_overview_timings(timings)),
+    ]
+    error_sections = [
+        (
+            "errors_pdf",
+            [extraction_inputs, file_signature(extraction["reports"]["errors"]), paging],
+            lambda: render_errors_pdf(extraction),
+            paged_files("pdf_errors", extraction["errors"]),
+        ),
+        (
+            "errors_images",
+            [extraction_inputs, file_signature(extraction["reports"]["images"]), paging],
+            lambda: render_errors_images(extraction),
+            paged_files("pdf_images", extraction["images"]),
+        ),
+        (
+            "errors_verification",
+            verification,
+            lambda: render_errors_verification(*verification),
+        ),
+    ]
+
+    cache = load_section_cache()
+    rendered = []
+    for report_path, sections in (
+        (OVERVIEW_REPORT, overview_sections),
+        (ERRORS_REPORT, error_sections),
+    ):
+        with open(report_path, 'w', encoding='utf-8') as f:
+            rendered += render_sections(sections, cache, f)
+        print(f"Created: {report_path}")
 
-    # --- 1. GENERAL OVERVIEW REPORT ---
-    with open(report_overview, 'w', encoding='utf-8') as f:
-        f.write("# BÁO CÁO TỔNG QUAN HỆ THỐNG XỬ LÝ DỮ LIỆU\n\n")
-        
-        f.write("## 1. Tình trạng dữ liệu gốc (Files)\n")
-        f.write("Dựa trên kết quả phân tích file ban đầu:\n")
-        f.write("```\n")
-        f.write(summary_txt)
-        f.write("\n```\n\n")
-        
-        f.write("## 2. Kết quả trích xuất PDF (Extraction)\n")
-        f.write(f"- Thư viện sử dụng: **PyMuPDF (fitz)**\n")
-        f.write(f"- Tổng số file lỗi (Không đọc được): **{count_pdf_errors}**\n")
-        f.write(f"- Tổng số file dạng ảnh/scan (Không có text): **{count_pdf_images}**\n\n")
-
-        f.write("## 3. Kết quả đối soát nhãn (Label Verification)\n")
-        f.write("So sánh dữ liệu file JSON (Label) với Text trích xuất:\n")
-        f.write(f"- Số trường MISSING (Không tìm thấy): **{count_missing_fields}**\n")
-        f.write(f"- Số trường SIMILAR (Tương đồng > 80%): **{count_similar_fields}**\n")
-        f.write("- Chi tiết thống kê:\n")
-        f.write("```\n")
-        f.write(verify_txt)
-        f.write("\n```\n")
-    
-    print(f"Created: {report_overview}")
-
-    # --- 2. DETAILED ERROR REPORT ---
-    with open(report_errors, 'w', encoding='utf-8') as f:
-        f.write("# BÁO CÁO CHI TIẾT LỖI & VẤN ĐỀ\n\n")
-        
-        f.write("## 1. Các file PDF bị lỗi (Corrupt/Error)\n")
-        f.write(f"Tổng số: {count_pdf_errors}\n")
-        if count_pdf_errors > 0:
-            f.write("| Tên File | Lỗi |\n|---|---|\n")
-            # Skip headers (assuming first 2 lines are title/separator)
-            for line in pdf_errors[2:]:
-                if "|" in line:
-                    parts = line.split("|", 1)
-                    f.write(f"| {parts[0].strip()} | {parts[1].strip()} |\n")
-                elif line.strip():
-                    f.write(f"| {line.strip()} | - |\n")
-        else:
-            f.write("> Không có file lỗi.\n")
-            
-        f.write("\n## 2. Các file PDF dạng ảnh/Scan (Cần OCR)\n")
-        f.write(f"Tổng số: {count_pdf_images}\n")
-        if count_pdf_images > 0:
-            # f.write("Danh sách (Top 50):\n")
-            f.write("```\n")
-            # Skip headers
-            for line in pdf_images[2:]:
-                f.write(line + "\n")
-            f.write("```\n")
-        else:
-            f.write("> Không có file dạng ảnh.\n")
-
-        f.write("\n## 3. Vấn đề đối soát dữ liệu (Verification Issues)\n")
-        f.write("### A. Dữ liệu KHÔNG tìm thấy (Missing)\n")
-        f.write(f"- Số lượng: {count_missing_fields} trường dữ liệu.\n")
-        f.write(f"- Xem chi tiết file: `review_data/label_verification_missing.csv`\n")
-        f.write("- Các trường hợp phổ biến cần kiểm tra:\n")
-        f.write("  - Lỗi format ngày tháng (dd/mm/yyyy vs mm/dd/yyyy).\n")
-        f.write("  - Lỗi format số tiền (dấu phẩy/chấm).\n")
-        f.write("  - OCR đọc sai ký tự (O vs 0, I vs 1).\n")
-        f.write("  - Key trong JSON không tồn tại trong văn bản.\n")
-
-        f.write("\n### B. Dữ liệu tương đồng (Fuzzy Match - Cần người duyệt)\n")
-        f.write(f"- Số lượng: {count_similar_fields} trường dữ liệu.\n")
-        f.write(f"- Xem chi tiết file: `review_data/label_verification_similar.csv`\n")
-        f.write("- Đây là các trường có độ tự tin > 80%. Cần review nhanh để confirm đúng/sai.\n")
-
-    print(f"Created: {report_errors}")
+    save_section_cache(cache)
+    total = len(overview_sections) + len(error_sections)
+    print(f"Sections rendered: {len(rendered)}/{total} (others unchanged)")
 
 if __name__ == "__main__":
     generate_reports()
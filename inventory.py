@@ -0,0 +1,251 @@
+import os
+import pickle
+import hashlib
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import config
+
+# One file in a scanned directory tree.
+# rel_path: path relative to the scanned root; base: name without extension;
+# ext: lowercase extension; mtime_ns: modification time in nanoseconds
+FileEntry = namedtuple("FileEntry", "rel_path name base ext size mtime_ns")
+
+CACHE_VERSION = 1
+
+# Directories with at least this many files are stat()ed on a thread pool
+PARALLEL_STAT_MIN_FILES = 64
+
+# In-process cache: {root: Inventory}
+_inventories = {}
+
+
+class Inventory:
+    """
+    Snapshot of every file below a root directory.
+    Built once with os.scandir and shared by all pipeline stages.
+    """
+
+    def __init__(self, root, entries, dir_mtimes):
+        self.root = root
+        self.entries = entries
+        # {relative dir path: st_mtime_ns} for every scanned directory
+        self.dir_mtimes = dir_mtimes
+        self._signature = None
+        self._by_base = {}
+
+    def is_fresh(self):
+        """
+        True if no directory in the tree has changed since the scan.
+        Adding, removing or renaming a file changes its directory mtime;
+        rewriting a file in place does not.
+        """
+        for rel_dir, mtime_ns in self.dir_mtimes.items():
+            try:
+                if os.stat(os.path.join(self.root, rel_dir)).st_mtime_ns != mtime_ns:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def signature(self):
+        """Digest of every (path, size, mtime) in the snapshot; computed once."""
+        if self._signature is None:
+            digest = hashlib.sha1()
+            for e in sorted(self.entries):
+                line = f"{e.rel_path}\0{e.size}\0{e.mtime_ns}\n"
+                digest.update(line.encode("utf-8"))
+            self._signature = digest.hexdigest()
+        return self._signature
+
+    def files(self, extension=None, recursive=True):
+        """
+        Returns FileEntry objects, optionally filtered by extension
+        (case-insensitive, e.g. ".pdf") and limited to the top-level directory.
+        """
+        ext = extension.lower() if extension else None
+        return [
+            e
+            for e in self.entries
+            if (ext is None or e.ext == ext)
+            and (recursive or e.rel_path == e.name)
+        ]
+
+    def by_name(self, recursive=False):
+        """Returns {rel_path: FileEntry}."""
+        return {e.rel_path: e for e in self.files(recursive=recursive)}
+
+    def by_base(self, extension):
+        """
+        Returns {base name: [absolute paths]} of the files with an extension
+        (e.g. ".pdf"), in scan order; built once per snapshot, so lookups by
+        name do not walk the tree.
+        """
+        ext = extension.lower()
+        index = self._by_base.get(ext)
+        if index is None:
+            index = {}
+            for e in self.files(ext):
+                index.setdefault(e.base, []).append(os.path.join(self.root, e.rel_path))
+            self._by_base[ext] = index
+        return index
+
+
+def scan(root, previous=None):
+    """
+    Walks root recursively with os.scandir.
+    Directories whose mtime is unchanged in `previous` (an older Inventory of the
+    same root) are not listed again: their files are reused from the snapshot.
+
+    Returns:
+        Tuple of (entries: list of FileEntry, dir_mtimes: dict)
+    """
+    entries = []
+    dir_mtimes = {}
+    stack = [""]
+    pool = None
+
+    old_files = {}
+    old_subdirs = {}
+    if previous is not None:
+        for e in previous.entries:
+            old_files.setdefault(os.path.dirname(e.rel_path), []).append(e)
+        for rel_dir in previous.dir_mtimes:
+            if rel_dir:
+                old_subdirs.setdefault(os.path.dirname(rel_dir), []).append(rel_dir)
+
+    while stack:
+        rel_dir = stack.pop()
+        dir_path = os.path.join(root, rel_dir) if rel_dir else root
+        try:
+            mtime_ns = os.stat(dir_path).st_mtime_ns
+            dir_mtimes[rel_dir] = mtime_ns
+
+            if previous is not None and previous.dir_mtimes.get(rel_dir) == mtime_ns:
+                entries.extend(old_files.get(rel_dir, []))
+                stack.extend(old_subdirs.get(rel_dir, []))
+                continue
+
+            file_entries = []
+            with os.scandir(dir_path) as it:
+                for entry in it:
+                    rel_path = os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(rel_path)
+                        elif entry.is_file():
+                            file_entries.append((rel_path, entry))
+                    except OSError as e:
+                        print(f"Error reading {entry.path}: {e}")
+
+            # stat() is a syscall per file on POSIX (free on Windows); on network
+            # shares the round-trips dominate, so large directories stat in parallel
+            if (
+                len(file_entries) >= PARALLEL_STAT_MIN_FILES
+                and config.INVENTORY_STAT_WORKERS > 1
+            ):
+                if pool is None:
+                    pool = ThreadPoolExecutor(max_workers=config.INVENTORY_STAT_WORKERS)
+                entries.extend(e for e in pool.map(_make_entry, file_entries) if e)
+            else:
+                entries.extend(e for e in map(_make_entry, file_entries) if e)
+        except OSError as e:
+            print(f"Error reading {dir_path}: {e}")
+
+    if pool is not None:
+        pool.shutdown()
+
+    return entries, dir_mtimes
+
+
+def _make_entry(item):
+    rel_path, entry = item
+    try:
+        st = entry.stat()
+    except OSError as e:
+        print(f"Error reading {entry.path}: {e}")
+        return None
+    base, ext = os.path.splitext(entry.name)
+    return FileEntry(rel_path, entry.name, base, ext.lower(), st.st_size, st.st_mtime_ns)
+
+
+def cache_path(root):
+    """Cache file used for the inventory of root."""
+    key = hashlib.md5(os.path.abspath(root).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(config.INVENTORY_CACHE_DIR, f"inventory_{key}.pkl")
+
+
+def _load_cache(root):
+    path = cache_path(root)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        if data.get("version") != CACHE_VERSION or data.get("root") != root:
+            return None
+        entries = [FileEntry(*e) for e in data["entries"]]
+        return Inventory(root, entries, data["dir_mtimes"])
+    except Exception as e:
+        print(f"Warning: ignoring unreadable inventory cache {path}: {e}")
+        return None
+
+
+def _save_cache(inv):
+    path = cache_path(inv.root)
+    # Stages run on threads (--jobs) and in other processes (watch, review):
+    # each writer gets its own temporary file, the last os.replace() wins
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            pickle.dump(
+                {
+                    "version": CACHE_VERSION,
+                    "root": inv.root,
+                    "entries": [tuple(e) for e in inv.entries],
+                    "dir_mtimes": inv.dir_mtimes,
+                },
+                f,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"Warning: could not save inventory cache {path}: {e}")
+
+
+def get_inventory(root, refresh=False):
+    """
+    Returns the Inventory of root, rescanning only directories whose mtime changed.
+    Lookup order: in-process cache, on-disk cache (config.INVENTORY_CACHE_DIR), scan.
+
+    Args:
+        root: Directory to inventory
+        refresh: Force a rescan
+
+    Returns:
+        Inventory (empty if root does not exist)
+    """
+    root = os.path.normpath(root)
+    if not os.path.isdir(root):
+        return Inventory(root, [], {})
+
+    previous = None
+    if not refresh:
+        previous = _inventories.get(root)
+        if previous is not None and previous.is_fresh():
+            return previous
+
+        if previous is None:
+            previous = _load_cache(root)
+            if previous is not None and previous.is_fresh():
+                _inventories[root] = previous
+                return previous
+
+    # Only directories that changed since the previous snapshot are listed again
+    entries, dir_mtimes = scan(root, previous)
+    inv = Inventory(root, entries, dir_mtimes)
+    _inventories[root] = inv
+    if config.INVENTORY_CACHE_ENABLED:
+        _save_cache(inv)
+    return inv
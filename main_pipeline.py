@@ -1,59 +1,264 @@
 import os
-import shutil
+import time
+import argparse
+from functools import partial
 import config
 import utils
+import stage_runner
+import run_history
+from stage_runner import Stage
 
 # Import existing modules
 import analyze_data
 import compare_files
 import merge_reports
 import separate_files
+import find_duplicates
+import extract_pdf
+import verify_labels
+import filter_verification_results
+import filter_verified_labels
+import generate_final_reports
+
+# --- Output Paths ---
+PRE_REPORT = os.path.join(config.REVIEW_DIR, "data_summary_report_pre.txt")
+PRE_DIFF = os.path.join(config.REVIEW_DIR, "file_differences_pre.txt")
+PRE_FINAL = os.path.join(config.REVIEW_DIR, "final_summary_pre.txt")
+PRE_CSV = os.path.join(config.REVIEW_DIR, "data_statistics_pre.csv")
+
+POST_REPORT = os.path.join(config.REVIEW_DIR, "data_summary_report.txt")
+POST_DIFF = os.path.join(config.REVIEW_DIR, "file_differences.txt")
+POST_CSV = os.path.join(config.REVIEW_DIR, "data_statistics.csv")
+
+MISSING_CSV = os.path.join(config.REVIEW_DIR, "label_verification_missing.csv")
+SIMILAR_CSV = os.path.join(config.REVIEW_DIR, "label_verification_similar.csv")
+
+OVERVIEW_REPORT = os.path.join(config.BASE_DIR, "General_Overview_Report.md")
+ERRORS_REPORT = os.path.join(config.BASE_DIR, "Detailed_Error_Report.md")
+
+SOURCE_DIRS = [config.DATASET_DIR, config.LABEL_DIR]
+
+# Review folders and reports verify_labels writes besides its CSV/TXT
+VERIFY_REVIEW_OUTPUTS = [
+    os.path.join(config.REVIEW_DIR, name)
+    for name in (
+        "check_for",
+        "check_for_missing",
+        "check_for_na",
+        "check_for_similar",
+        "json_parsing_errors.txt",
+        "missing_files_report.txt",
+        "na_files_report.txt",
+        "similar_files_report.txt",
+    )
+]
+
+
+# --- Stage Graph ---
+# Order matters only between stages touching the same paths; the runner infers
+# dependencies from inputs/outputs and runs independent stages concurrently.
+def build_stages():
+    return [
+        # 1. Initial Analysis (Pre-Separation)
+        Stage(
+            "analyze_pre",
+            partial(
+                analyze_data.analyze_directories,
+                output_csv=PRE_CSV,
+                output_report=PRE_REPORT,
+            ),
+            inputs=SOURCE_DIRS,
+            outputs=[
+                PRE_CSV,
+                PRE_REPORT,
+                utils.metrics_path("data_summary_report_pre"),
+            ],
+            description="Initial Analysis...",
+        ),
+        Stage(
+            "compare_pre",
+            partial(compare_files.compare_directories, output_file=PRE_DIFF),
+            inputs=SOURCE_DIRS,
+            outputs=[PRE_DIFF, compare_files.delta_path(PRE_DIFF)],
+            description="Initial Comparison...",
+        ),
+        Stage(
+            "merge_pre",
+            partial(
+                merge_reports.merge,
+                report_path=PRE_REPORT,
+                diff_path=PRE_DIFF,
+                output_path=PRE_FINAL,
+            ),
+            inputs=[PRE_REPORT, PRE_DIFF],
+            outputs=[PRE_FINAL],
+            description="Merging pre-separation reports...",
+        ),
+        # 2. Files Separation (Move)
+        Stage(
+            "separate",
+            separate_files.copy_files,
+            inputs=SOURCE_DIRS,
+            outputs=[config.DATASET_DIR, config.DEST_MISSING, config.DEST_DOCX],
+            description="Moving Files...",
+        ),
+        Stage(
+            "find_duplicates",
+            find_duplicates.find_and_move_duplicates,
+            inputs=SOURCE_DIRS,
+            outputs=SOURCE_DIRS
+            + [find_duplicates.DUPLICATE_DIR, utils.metrics_path("find_duplicates")],
+            optional=True,
+            description="Moving duplicate labels...",
+        ),
+        # 3. Post-Separation Analysis
+        Stage(
+            "analyze_post",
+            partial(
+                analyze_data.analyze_directories,
+                output_csv=POST_CSV,
+                output_report=POST_REPORT,
+            ),
+            inputs=SOURCE_DIRS,
+            outputs=[POST_CSV, POST_REPORT, utils.metrics_path("data_summary_report")],
+            description="Post-Separation Analysis...",
+        ),
+        Stage(
+            "compare_post",
+            partial(compare_files.compare_directories, output_file=POST_DIFF),
+            inputs=SOURCE_DIRS,
+            outputs=[POST_DIFF, compare_files.delta_path(POST_DIFF)],
+            description="Post-Separation Comparison...",
+        ),
+        # 4. PDF Extraction
+        Stage(
+            "extract",
+            extract_pdf.extract_text_from_pdfs,
+            inputs=SOURCE_DIRS,
+            outputs=SOURCE_DIRS
+            + [
+                config.EXTRACTED_TEXT_DIR,
+                config.PDF_ERROR_DIR,
+                config.PDF_IMAGE_DIR,
+                config.PDF_NO_LABEL_DIR,
+                config.ERROR_PDF_REPORT,
+                config.IMAGE_PDF_REPORT,
+                config.NO_LABEL_PDF_REPORT,
+                utils.metrics_path("extract_pdf"),
+            ],
+            description="Extracting PDF text...",
+        ),
+        # 5. Label Verification
+        Stage(
+            "verify",
+            verify_labels.verify_labels,
+            inputs=SOURCE_DIRS + [config.EXTRACTED_TEXT_DIR],
+            outputs=[
+                config.VERIFY_REPORT_CSV,
+                config.VERIFY_REPORT_TXT,
+                config.VERIFY_VERDICTS_CSV,
+                config.VERIFY_RESULTS_DB,
+                utils.metrics_path("verify_labels"),
+            ]
+            + VERIFY_REVIEW_OUTPUTS,
+            description="Verifying labels...",
+        ),
+        Stage(
+            "filter_results",
+            filter_verification_results.filter_results,
+            inputs=[config.VERIFY_REPORT_CSV],
+            outputs=[MISSING_CSV, SIMILAR_CSV, utils.metrics_path("filter_results")],
+            description="Filtering verification results...",
+        ),
+        Stage(
+            "filter_verified",
+            filter_verified_labels.filter_verified_labels,
+            inputs=[config.VERIFY_REPORT_CSV] + SOURCE_DIRS,
+            # The verdict table is rebuilt here if it is older than the CSV
+            outputs=SOURCE_DIRS
+            + [
+                config.LABEL_TRUE_DIR,
+                config.VERIFY_VERDICTS_CSV,
+                utils.metrics_path("filter_verified"),
+            ],
+            optional=True,
+            description="Moving fully verified labels...",
+        ),
+        # 6. Final Reports
+        Stage(
+            "reports",
+            generate_final_reports.generate_reports,
+            inputs=[
+                POST_REPORT,
+                config.ERROR_PDF_REPORT,
+                config.IMAGE_PDF_REPORT,
+                MISSING_CSV,
+                SIMILAR_CSV,
+                config.VERIFY_REPORT_TXT,
+                config.VERIFY_REPORT_CSV,
+                config.VERIFY_RESULTS_DB,
+            ]
+            + [
+                utils.metrics_path(name)
+                for name in generate_final_reports.TIMED_STAGES + ["extract_pdf"]
+            ],
+            outputs=[OVERVIEW_REPORT, ERRORS_REPORT, config.REPORT_PAGES_DIR],
+            description="Generating final reports...",
+        ),
+    ]
+
 
 # --- Workflow ---
-def run_pipeline():
-    print(">>> STARTING PIPELINE")
-    
+def run_pipeline(stages=None, force=False, jobs=None):
+    """
+    Run the pipeline stage graph.
+
+    Args:
+        stages: Stage names to run (default: all non-optional stages)
+        force: Re-run stages even if their inputs are unchanged
+        jobs: Maximum number of stages running concurrently
+    """
+    run_id = run_history.new_run_id()
+    started = time.time()
+    print(f">>> STARTING PIPELINE (run {run_id})")
+
     # Ensure review dir exists
     utils.ensure_dir_exists(config.REVIEW_DIR)
 
-    # 1. Initial Analysis (Pre-Separation)
-    print("\n[Step 1] Initial Analysis...")
-    pre_report = os.path.join(config.REVIEW_DIR, "data_summary_report_pre.txt")
-    pre_diff = os.path.join(config.REVIEW_DIR, "file_differences_pre.txt")
-    pre_final = os.path.join(config.REVIEW_DIR, "final_summary_pre.txt")
-    pre_csv = os.path.join(config.REVIEW_DIR, "data_statistics_pre.csv") 
-
-    # Run Analyze
-    analyze_data.analyze_directories(output_csv=pre_csv, output_report=pre_report)
-    
-    # Run Compare
-    compare_files.compare_directories(output_file=pre_diff)
-    
-    # Run Merge
-    merge_reports.merge(report_path=pre_report, diff_path=pre_diff, output_path=pre_final)
-    
-    # 2. Files Separation (Move)
-    print("\n[Step 2] Moving Files...")
-    separate_files.copy_files() # Note: function name is copy_files but logic moves files (as updated)
-    
-    # 3. Post-Separation Analysis
-    print("\n[Step 3] Post-Separation Analysis...")
-        
-    post_report = os.path.join(config.REVIEW_DIR, "data_summary_report.txt")
-    post_diff = os.path.join(config.REVIEW_DIR, "file_differences.txt")
-    post_csv = os.path.join(config.REVIEW_DIR, "data_statistics.csv")
-    # Note: User didn't ask for a final merged summary in review_data, but only "Lưu các file phân tích vào folder review_data"
-    # Analyze and Compare are the main analysis scripts.
-    
-    # Run Analyze
-    analyze_data.analyze_directories(output_csv=post_csv, output_report=post_report)
-    
-    # Run Compare
-    compare_files.compare_directories(output_file=post_diff)
+    results = stage_runner.run_stages(
+        build_stages(),
+        selected=stages,
+        force=force,
+        jobs=jobs or config.PIPELINE_JOBS,
+    )
+    stage_runner.print_timings(results)
+    run_history.record_run(run_id, started, results)
 
     print("\n>>> PIPELINE FINISHED.")
-    print(f"Pre-Analysis Reports: {pre_final}")
+    print(f"Pre-Analysis Reports: {PRE_FINAL}")
     print(f"Post-Analysis Reports: {config.REVIEW_DIR}")
+    return results
+
 
 if __name__ == "__main__":
-    run_pipeline()
+    parser = argparse.ArgumentParser(description="Run the data audit pipeline")
+    parser.add_argument(
+        "--stages",
+        help="Comma-separated stage names to run (default: all non-optional stages)",
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="Re-run stages even if up to date"
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=None, help="Stages to run concurrently"
+    )
+    parser.add_argument(
+        "--list", action="store_true", help="List stages and their dependencies"
+    )
+    args = parser.parse_args()
+
+    if args.list:
+        stage_runner.list_stages(build_stages())
+    else:
+        selected = args.stages.split(",") if args.stages else None
+        run_pipeline(stages=selected, force=args.force, jobs=args.jobs)
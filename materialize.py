@@ -0,0 +1,160 @@
+import os
+import csv
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+import config
+import utils
+
+# Order in which "auto" mode tries to place a file in a review folder.
+# A reflink is an independent copy-on-write clone; a real copy is only made
+# when the filesystem does not support reflinks.
+AUTO_METHODS = ["reflink", "copy"]
+# Only used when requested explicitly (config.MATERIALIZE_MODE): a hardlink
+# shares the source's data, so editing the review copy (e.g. fixing a label
+# in check_for_missing) writes through to LABEL_DIR/DATASET_DIR; a symlink
+# dangles once the source is moved (duplicates, image or verified folders).
+LINK_METHODS = ["hardlink", "symlink"]
+MODES = AUTO_METHODS + LINK_METHODS + ["auto", "manifest"]
+
+# Linux FICLONE ioctl (btrfs, XFS, ...): copy-on-write clone of a whole file
+FICLONE = 0x40049409
+
+
+def reflink_file(src, dst):
+    """
+    Create dst as a copy-on-write clone of src.
+    Raises OSError if the platform or filesystem does not support reflinks.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError("reflink not supported on this platform")
+
+    with open(src, "rb") as f_src, open(dst, "wb") as f_dst:
+        try:
+            fcntl.ioctl(f_dst.fileno(), FICLONE, f_src.fileno())
+        except OSError:
+            f_dst.close()
+            os.remove(dst)
+            raise
+    shutil.copystat(src, dst)
+
+
+def _place(src, dst, method):
+    if method == "reflink":
+        reflink_file(src, dst)
+    elif method == "hardlink":
+        os.link(src, dst)
+    elif method == "symlink":
+        os.symlink(os.path.abspath(src), dst)
+    elif method == "copy":
+        shutil.copy2(src, dst)
+    else:
+        raise ValueError(f"Unknown materialization method: {method}")
+
+
+def materialize_file(src, dst, mode=None):
+    """
+    Make src available at dst without copying bytes where possible.
+
+    Args:
+        src: Source file path
+        dst: Destination file path (replaced if it already exists)
+        mode: One of MODES (default: config.MATERIALIZE_MODE)
+
+    Returns:
+        Name of the method used ("reflink", "hardlink", "symlink", "copy", "manifest")
+
+    Raises:
+        OSError if the file could not be placed with any allowed method.
+    """
+    mode = mode or config.MATERIALIZE_MODE
+    if mode not in MODES:
+        raise ValueError(f"Unknown materialization mode: {mode}")
+
+    if not os.path.exists(src):
+        raise FileNotFoundError(f"Source not found: {src}")
+
+    if mode == "manifest":
+        return "manifest"
+
+    utils.ensure_dir_exists(os.path.dirname(dst))
+    if os.path.lexists(dst):
+        # Links fail on existing targets; also avoids writing through an old hardlink
+        os.remove(dst)
+
+    methods = AUTO_METHODS if mode == "auto" else [mode]
+    last_error = None
+    for method in methods:
+        try:
+            _place(src, dst, method)
+            return method
+        except OSError as e:
+            last_error = e
+    raise last_error
+
+
+def materialize_files(jobs, mode=None, workers=None, manifest_path=None):
+    """
+    Materialize many (src, dst) pairs in a parallel I/O pool.
+
+    Args:
+        jobs: Iterable of (src, dst) tuples
+        mode: One of MODES (default: config.MATERIALIZE_MODE)
+        workers: Thread pool size (default: config.MATERIALIZE_WORKERS)
+        manifest_path: Optional CSV listing every job and how it was placed.
+            Always written when mode is "manifest".
+
+    Returns:
+        List of (src, dst, method, error) tuples in job order.
+        method is None and error is the exception message when a job failed.
+    """
+    mode = mode or config.MATERIALIZE_MODE
+    workers = workers or config.MATERIALIZE_WORKERS
+    jobs = list(jobs)
+
+    def run(job):
+        src, dst = job
+        try:
+            return src, dst, materialize_file(src, dst, mode), None
+        except Exception as e:
+            return src, dst, None, str(e)
+
+    if not jobs:
+        results = []
+    elif workers <= 1 or len(jobs) == 1:
+        results = [run(job) for job in jobs]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(run, jobs))
+
+    if mode == "manifest" and manifest_path is None and jobs:
+        # Default manifest location: next to the first destination
+        manifest_path = os.path.join(os.path.dirname(jobs[0][1]), "manifest.csv")
+
+    if manifest_path:
+        write_manifest(results, manifest_path)
+
+    return results
+
+
+def write_manifest(results, manifest_path):
+    """Writes materialization results as CSV (Source, Destination, Method, Error)."""
+    try:
+        utils.ensure_dir_exists(os.path.dirname(manifest_path))
+        with open(manifest_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Source", "Destination", "Method", "Error"])
+            for src, dst, method, error in results:
+                writer.writerow([src, dst, method or "", error or ""])
+    except Exception as e:
+        print(f"Error writing manifest {manifest_path}: {e}")
+
+
+def summarize(results):
+    """Returns a short 'method: count' summary string for printing."""
+    counts = {}
+    for _, _, method, error in results:
+        key = method if not error else "failed"
+        counts[key] = counts.get(key, 0) + 1
+    return ", ".join(f"{k}: {v}" for k, v in sorted(counts.items()))
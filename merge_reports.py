@@ -1,32 +1,31 @@
-import os
+from datetime import datetime
 import config
 import utils
 
 def merge(report_path=config.DEFAULT_OUTPUT_REPORT, diff_path=config.DEFAULT_OUTPUT_DIFF, output_path=config.DEFAULT_OUTPUT_FINAL):
-    report_content = utils.read_file(report_path)
-    diff_content = utils.read_file(diff_path)
-
-    final_lines = []
-    final_lines.append("BÁO CÁO TỔNG HỢP DỮ LIỆU (DATA REPORT)")
-    final_lines.append("=" * 80)
-    final_lines.append("Thời gian tạo: " + os.popen('date /t').read().strip() + " " + os.popen('time /t').read().strip())
-    final_lines.append("=" * 80)
-    
-    final_lines.append("\nI. THỐNG KÊ CHI TIẾT (STATISTICS)")
-    final_lines.append("-" * 80)
-    final_lines.append(report_content)
-    
-    final_lines.append("\n\n" + "=" * 80)
-    final_lines.append("II. SO SÁNH & KHÁC BIỆT FILE (FILE DIFFERENCES)")
-    final_lines.append("-" * 80)
-    final_lines.append(diff_content)
-    
-    final_lines.append("\n\n" + "=" * 80)
-    final_lines.append("KẾT THÚC BÁO CÁO")
-
+    """
+    Concatenate the statistics report and the file differences into the final
+    summary. Both inputs are streamed into the output, so their size does not
+    matter.
+    """
     try:
         with open(output_path, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(final_lines))
+            f.write("BÁO CÁO TỔNG HỢP DỮ LIỆU (DATA REPORT)\n")
+            f.write("=" * 80 + "\n")
+            f.write("Thời gian tạo: " + datetime.now().strftime("%d/%m/%Y %H:%M") + "\n")
+            f.write("=" * 80 + "\n")
+
+            f.write("\nI. THỐNG KÊ CHI TIẾT (STATISTICS)\n")
+            f.write("-" * 80 + "\n")
+            utils.copy_text(report_path, f)
+
+            f.write("\n\n\n" + "=" * 80 + "\n")
+            f.write("II. SO SÁNH & KHÁC BIỆT FILE (FILE DIFFERENCES)\n")
+            f.write("-" * 80 + "\n")
+            utils.copy_text(diff_path, f)
+
+            f.write("\n\n\n" + "=" * 80 + "\n")
+            f.write("KẾT THÚC BÁO CÁO")
         print(f"Final summary created successfully at:\n{output_path}")
     except Exception as e:
         print(f"Error writing final summary: {e}")
@@ -0,0 +1,226 @@
+import os
+import csv
+import json
+import argparse
+import config
+import inventory
+import utils
+import extract_pdf
+import verify_labels
+import find_duplicates
+
+STEPS = ["duplicates", "extract", "verify"]
+
+
+def load_shard_summaries(template, count):
+    """
+    Load the JSON outputs of shards 1..count.
+
+    Returns:
+        List of parsed summaries in shard order, or None if any shard is missing
+        (merging an incomplete set would silently drop work)
+    """
+    paths = [utils.shard_path(template, (i, count)) for i in range(1, count + 1)]
+    missing = [p for p in paths if not os.path.exists(p)]
+    if missing:
+        print(f"Missing {len(missing)}/{count} shard outputs, e.g. {missing[0]}")
+        return None
+
+    summaries = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            summaries.append(json.load(f))
+    return summaries
+
+
+def remove_shard_outputs(templates, count):
+    """
+    Delete the partial outputs of a merged step, so a later merge does not
+    apply them a second time (e.g. re-moving duplicates after extraction).
+    """
+    for template in templates:
+        for i in range(1, count + 1):
+            path = utils.shard_path(template, (i, count))
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def order_like(names, reference, key=None):
+    """
+    Sort names in the order of reference (the directory listing a single-node run
+    iterates); names no longer in reference (e.g. moved files) go last, sorted.
+    """
+    position = {name: i for i, name in enumerate(reference)}
+    key = key or (lambda name: name)
+    return sorted(
+        names, key=lambda n: (position.get(key(n), len(position)), key(n))
+    )
+
+
+def merge_duplicates(count):
+    """Group the content hashes of all shards and move duplicates."""
+    print(">>> MERGING DUPLICATE DETECTION SHARDS")
+    shards = load_shard_summaries(find_duplicates.SHARD_HASHES, count)
+    if shards is None:
+        return False
+
+    hashes = {}
+    for shard_hashes in shards:
+        hashes.update(shard_hashes)
+
+    reference = [
+        e.name
+        for e in inventory.get_inventory(config.LABEL_DIR).files(
+            ".json", recursive=False
+        )
+    ]
+    content_map = {}
+    for filename in order_like(hashes, reference):
+        content_map.setdefault(hashes[filename], []).append(filename)
+
+    print(f"Hashes from {count} shards: {len(hashes)} JSON files")
+    find_duplicates.move_duplicates(content_map, len(hashes))
+    return True
+
+
+def merge_extraction(count):
+    """Combine the extraction reports of all shards."""
+    print(">>> MERGING PDF EXTRACTION SHARDS")
+    shards = load_shard_summaries(extract_pdf.SHARD_SUMMARY, count)
+    if shards is None:
+        return False
+
+    reference = utils.list_files_recursive(config.DATASET_DIR, ".pdf")
+    error_files = order_like(
+        [line for s in shards for line in s["error_files"]],
+        reference,
+        key=lambda line: line.split(" | ")[0],
+    )
+    image_files = order_like([f for s in shards for f in s["image_files"]], reference)
+    no_label_files = order_like(
+        [f for s in shards for f in s["no_label_files"]], reference
+    )
+
+    extract_pdf.write_extraction_reports(
+        error_files,
+        image_files,
+        no_label_files,
+        total_files=sum(s["total"] for s in shards),
+        success=sum(s["success"] for s in shards),
+    )
+
+    print(f"Total processed: {sum(s['total'] for s in shards)}")
+    print(f"Success (Text found): {sum(s['success'] for s in shards)}")
+    print(f"Image - Has Label: {len(image_files)}")
+    print(f"Image - No Label: {len(no_label_files)}")
+    print(f"Errors (Read failed): {len(error_files)}")
+    return True
+
+
+def merge_verification(count):
+    """
+    Combine the verification CSVs and counters of all shards, then write the
+    same CSV, reports and review folders as a single-node verify_labels run.
+    """
+    print(">>> MERGING LABEL VERIFICATION SHARDS")
+    shards = load_shard_summaries(verify_labels.SHARD_SUMMARY, count)
+    if shards is None:
+        return False
+
+    results = []
+    for i in range(1, count + 1):
+        csv_path = utils.shard_path(config.VERIFY_REPORT_CSV, (i, count))
+        try:
+            with open(csv_path, "r", newline="", encoding="utf-8") as f:
+                results.extend(csv.DictReader(f))
+        except Exception as e:
+            print(f"Error reading {csv_path}: {e}")
+            return False
+
+    reference = utils.list_files_recursive(config.LABEL_DIR, ".json")
+    # Stable sort: rows of one label keep their field order
+    results = order_like(results, reference, key=lambda row: row["Filename"])
+    json_errors = order_like(
+        [e for s in shards for e in s["json_errors"]],
+        reference,
+        key=lambda error: error["Filename"],
+    )
+
+    stats = verify_labels.new_stats()
+    for s in shards:
+        for key, value in s["stats"].items():
+            stats[key] += value
+    total_files = sum(s["total"] for s in shards)
+
+    print(f"Rows from {count} shards: {len(results)} ({total_files} labels)")
+    verify_labels.check_file_consistency()
+    verify_labels.write_verification_outputs(results, json_errors, total_files, stats)
+    return True
+
+
+def merge_shards(count, steps=None):
+    """
+    Merge the partial outputs of `count` shards into the regular review_data
+    outputs. Steps without any shard output are skipped; the shard outputs of a
+    merged step are deleted.
+
+    Args:
+        count: Number of shards (N in --shard i/N)
+        steps: Steps to merge (default: all of STEPS, in pipeline order)
+    """
+    # {step: (merge function, shard outputs; the first one marks a sharded run)}
+    merge_funcs = {
+        "duplicates": (merge_duplicates, [find_duplicates.SHARD_HASHES]),
+        "extract": (
+            merge_extraction,
+            [
+                extract_pdf.SHARD_SUMMARY,
+                config.ERROR_PDF_REPORT,
+                config.IMAGE_PDF_REPORT,
+                config.NO_LABEL_PDF_REPORT,
+            ],
+        ),
+        "verify": (
+            merge_verification,
+            [verify_labels.SHARD_SUMMARY, config.VERIFY_REPORT_CSV],
+        ),
+    }
+    explicit = steps is not None
+    steps = steps or STEPS
+
+    merged = []
+    for step in STEPS:
+        if step not in steps:
+            continue
+        func, templates = merge_funcs[step]
+        # Without an explicit selection, only merge steps that were run sharded
+        if not explicit and not any(
+            os.path.exists(utils.shard_path(templates[0], (i, count)))
+            for i in range(1, count + 1)
+        ):
+            continue
+        if func(count):
+            remove_shard_outputs(templates, count)
+            merged.append(step)
+        print()
+
+    print(f">>> MERGE COMPLETE: {', '.join(merged) or 'nothing to merge'}")
+    return merged
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Merge the outputs of --shard i/N runs into review_data"
+    )
+    parser.add_argument("count", type=int, help="Number of shards (N)")
+    parser.add_argument(
+        "--steps",
+        help=f"Comma-separated steps to merge ({', '.join(STEPS)}; default: all found)",
+    )
+    args = parser.parse_args()
+
+    steps = args.steps.split(",") if args.steps else None
+    if steps and set(steps) - set(STEPS):
+        parser.error(f"Unknown step(s): {', '.join(sorted(set(steps) - set(STEPS)))}")
+
+    merge_shards(args.count, steps)
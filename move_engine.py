@@ -0,0 +1,320 @@
+import os
+import sys
+import json
+import time
+import shutil
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import config
+import utils
+
+# Keeps journal names unique when one process starts several batches per second
+_sequence = itertools.count(1)
+
+# Journal line types:
+#   {"op": "header", "name": ..., "created": ...}
+#   {"op": "plan", "id": i, "src": ..., "dst": ...}
+#   {"op": "done", "ids": [...]}
+#   {"op": "failed", "id": i, "error": ...}
+#   {"op": "complete"}
+#   {"op": "undone", "ids": [...]}
+
+
+class Journal:
+    """Append-only JSON-lines journal of planned and completed moves."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        utils.ensure_dir_exists(os.path.dirname(path))
+        self.f = open(path, "a", encoding="utf-8")
+
+    def write(self, *records, sync=True):
+        with self.lock:
+            for record in records:
+                self.f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.f.flush()
+            if sync:
+                os.fsync(self.f.fileno())
+
+    def close(self):
+        self.f.close()
+
+
+def read_journal(journal_path):
+    """
+    Parse a journal.
+
+    Returns:
+        Tuple of (plan: {id: (src, dst)}, done: set of ids, undone: set of ids,
+        complete: bool)
+    """
+    plan = {}
+    done = set()
+    undone = set()
+    complete = False
+    with open(journal_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Torn last line after a crash
+                continue
+            op = record.get("op")
+            if op == "plan":
+                plan[record["id"]] = (record["src"], record["dst"])
+            elif op == "done":
+                done.update(record["ids"])
+            elif op == "undone":
+                undone.update(record["ids"])
+                done.difference_update(record["ids"])
+            elif op == "complete":
+                complete = True
+    return plan, done, undone, complete
+
+
+def _same_device(src, dst):
+    try:
+        return os.stat(src).st_dev == os.stat(os.path.dirname(dst)).st_dev
+    except OSError:
+        return False
+
+
+def _run(journal, items, workers):
+    """
+    Execute (id, src, dst) moves. Same-filesystem moves are atomic os.replace calls
+    journaled in batches; cross-device moves run in parallel (copy + delete).
+
+    Returns:
+        Dict {id: error message or None}
+    """
+    errors = {}
+    same_dev = []
+    cross_dev = []
+    refused = []
+
+    for item in items:
+        move_id, src, dst = item
+        if os.path.lexists(dst):
+            # A replaced file could not be restored by undo(): never overwrite
+            errors[move_id] = "destination exists"
+            refused.append({"op": "failed", "id": move_id, "error": errors[move_id]})
+            continue
+        utils.ensure_dir_exists(os.path.dirname(dst))
+        (same_dev if _same_device(src, dst) else cross_dev).append(item)
+    if refused:
+        journal.write(*refused)
+
+    batch_size = config.MOVE_BATCH_SIZE
+    for start in range(0, len(same_dev), batch_size):
+        moved = []
+        for move_id, src, dst in same_dev[start : start + batch_size]:
+            try:
+                os.replace(src, dst)
+                moved.append(move_id)
+                errors[move_id] = None
+            except OSError as e:
+                # e.g. EXDEV on bind mounts: retry as a cross-device move
+                cross_dev.append((move_id, src, dst))
+                errors[move_id] = str(e)
+        if moved:
+            journal.write({"op": "done", "ids": moved})
+
+    def move_cross(item):
+        move_id, src, dst = item
+        try:
+            shutil.move(src, dst)
+        except Exception as e:
+            journal.write(
+                {"op": "failed", "id": move_id, "error": str(e)}, sync=False
+            )
+            return move_id, str(e)
+        journal.write({"op": "done", "ids": [move_id]})
+        return move_id, None
+
+    if cross_dev:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for move_id, error in pool.map(move_cross, cross_dev):
+                errors[move_id] = error
+
+    return errors
+
+
+def move_files(pairs, name="moves", workers=None):
+    """
+    Move many files with a crash-safe journal.
+
+    All moves are planned and written to the journal before any file is touched.
+    A run that dies halfway can be finished with resume() or reverted with undo().
+
+    Args:
+        pairs: Iterable of (src, dst); pairs whose src does not exist are skipped
+        name: Journal name prefix (e.g. the calling script)
+        workers: Threads for cross-device moves (default: config.MOVE_WORKERS)
+
+    Returns:
+        List of (src, dst, error) in input order; error is None on success,
+        "skipped: source not found" if src was missing and "destination exists"
+        if dst is already there (existing files are never overwritten)
+    """
+    workers = workers or config.MOVE_WORKERS
+    pairs = list(pairs)
+
+    # Move ids are positions in pairs
+    results = [(src, dst, "skipped: source not found") for src, dst in pairs]
+    items = [
+        (i, src, dst) for i, (src, dst) in enumerate(pairs) if os.path.exists(src)
+    ]
+    if not items:
+        return results
+
+    stamp = time.strftime("%Y%m%d_%H%M%S")
+    journal_name = f"{name}_{stamp}_{os.getpid()}_{next(_sequence)}.jsonl"
+    journal_path = os.path.join(config.MOVE_JOURNAL_DIR, journal_name)
+    journal = Journal(journal_path)
+    try:
+        journal.write(
+            {"op": "header", "name": name, "created": stamp},
+            *[{"op": "plan", "id": i, "src": s, "dst": d} for i, s, d in items],
+        )
+        errors = _run(journal, items, workers)
+        journal.write({"op": "complete"})
+    finally:
+        journal.close()
+
+    for move_id, src, dst in items:
+        results[move_id] = (src, dst, errors.get(move_id))
+
+    failed = sum(1 for e in errors.values() if e)
+    if failed:
+        print(f"  {failed} move(s) failed. Journal: {journal_path}")
+    prune_journals()
+    return results
+
+
+def prune_journals(keep=None):
+    """
+    Keep the newest `keep` journals (default: config.MOVE_JOURNAL_KEEP) and
+    delete older ones whose batch fully succeeded. Incomplete journals and
+    journals with failed or undone moves are kept for resume() and inspection.
+
+    Returns:
+        Number of journals deleted
+    """
+    keep = config.MOVE_JOURNAL_KEEP if keep is None else keep
+    try:
+        paths = [
+            os.path.join(config.MOVE_JOURNAL_DIR, filename)
+            for filename in os.listdir(config.MOVE_JOURNAL_DIR)
+            if filename.endswith(".jsonl")
+        ]
+        paths.sort(key=os.path.getmtime, reverse=True)
+    except OSError:
+        return 0
+
+    removed = 0
+    for path in paths[keep:]:
+        try:
+            plan, done, undone, complete = read_journal(path)
+            if complete and not undone and len(done) == len(plan):
+                os.remove(path)
+                removed += 1
+        except OSError as e:
+            print(f"Warning: could not prune journal {path}: {e}")
+    return removed
+
+
+def resume(journal_path, workers=None):
+    """Finish the moves of an interrupted journal. Returns number of files moved."""
+    plan, done, _, complete = read_journal(journal_path)
+    if complete and len(done) == len(plan):
+        print(f"Journal already complete: {journal_path}")
+        return 0
+
+    items = []
+    recovered = []
+    for move_id, (src, dst) in sorted(plan.items()):
+        if move_id in done:
+            continue
+        if not os.path.exists(src) and os.path.exists(dst):
+            # Moved before the crash, but not yet journaled
+            recovered.append(move_id)
+        elif os.path.exists(src):
+            items.append((move_id, src, dst))
+        else:
+            print(f"  Missing source and destination: {src}")
+
+    journal = Journal(journal_path)
+    try:
+        if recovered:
+            journal.write({"op": "done", "ids": recovered})
+        errors = _run(journal, items, workers or config.MOVE_WORKERS)
+        journal.write({"op": "complete"})
+    finally:
+        journal.close()
+
+    moved = sum(1 for e in errors.values() if e is None)
+    print(f"Resumed {journal_path}: {moved} moved, {len(recovered)} already done")
+    return moved
+
+
+def undo(journal_path):
+    """Move every completed file of a journal back to its source. Returns count."""
+    plan, done, _, _ = read_journal(journal_path)
+
+    # A crash may have moved files that were never journaled as done
+    for move_id, (src, dst) in plan.items():
+        if move_id not in done and not os.path.exists(src) and os.path.exists(dst):
+            done.add(move_id)
+
+    journal = Journal(journal_path)
+    restored = []
+    try:
+        for move_id in sorted(done, reverse=True):
+            src, dst = plan[move_id]
+            if not os.path.exists(dst) or os.path.exists(src):
+                print(f"  Cannot restore {dst} -> {src}")
+                continue
+            try:
+                utils.ensure_dir_exists(os.path.dirname(src))
+                shutil.move(dst, src)
+                restored.append(move_id)
+            except Exception as e:
+                print(f"  Error restoring {dst}: {e}")
+        if restored:
+            journal.write({"op": "undone", "ids": restored})
+    finally:
+        journal.close()
+
+    print(f"Undo {journal_path}: {len(restored)} files restored")
+    return len(restored)
+
+
+def list_journals():
+    """Print journals with their progress."""
+    if not os.path.exists(config.MOVE_JOURNAL_DIR):
+        print("No journals found.")
+        return
+    for filename in sorted(os.listdir(config.MOVE_JOURNAL_DIR)):
+        path = os.path.join(config.MOVE_JOURNAL_DIR, filename)
+        plan, done, undone, complete = read_journal(path)
+        state = "complete" if complete else "INCOMPLETE"
+        if undone:
+            state += f", {len(undone)} undone"
+        print(f"{filename}: {len(done)}/{len(plan)} moved ({state})")
+
+
+if __name__ == "__main__":
+    # Usage: python move_engine.py list | resume <journal> | undo <journal>
+    if len(sys.argv) >= 2 and sys.argv[1] == "list":
+        list_journals()
+    elif len(sys.argv) == 3 and sys.argv[1] == "resume":
+        resume(sys.argv[2])
+    elif len(sys.argv) == 3 and sys.argv[1] == "undo":
+        undo(sys.argv[2])
+    else:
+        print("Usage: python move_engine.py list | resume <journal> | undo <journal>")
@@ -1,7 +1,11 @@
 import os
+import glob
+import time
 import shutil
-import sys
+import argparse
 import config
+import utils
+import move_engine
 
 # Define the destination folder name
 # Files will be moved to: <script_directory>/verification_needed
@@ -50,6 +54,13 @@ def move_file_safe(src, dest_folder):
         return False
 
 
+def first_match(paths, kind):
+    """First of the files found for a name; warns if the name is ambiguous."""
+    if len(paths) > 1:
+        print(f"Warning: {len(paths)} {kind} files with this name, using: {paths[0]}")
+    return paths[0] if paths else None
+
+
 def find_and_move_files(json_path):
     # Ensure absolute path and correct separators
     json_path = os.path.abspath(json_path)
@@ -63,7 +74,13 @@ def find_and_move_files(json_path):
         os.makedirs(dest_dir)
         print(f"Created destination directory: {dest_dir}")
 
+    base_name = os.path.splitext(os.path.basename(json_path))[0]
+    located = utils.locate_files(base_name)
+
     # 1. Move the JSON file itself
+    if not os.path.exists(json_path) and located["json"]:
+        # Not at the given path: the label of that name in LABEL_DIR
+        json_path = first_match(located["json"], "JSON")
     if os.path.exists(json_path):
         print(f"Processing JSON: {json_path}")
         move_file_safe(json_path, dest_dir)
@@ -73,23 +90,14 @@ def find_and_move_files(json_path):
         # assuming the filename without path is the key.
 
     # 2. Find and move the corresponding PDF
-    base_name = os.path.splitext(os.path.basename(json_path))[0]
     dataset_dir = config.DATASET_DIR
     print(f"Searching for PDF for '{base_name}' in: {dataset_dir}")
 
     pdf_path = None
 
-    # Recursively search for the PDF file
+    # Indexed lookup (inventory snapshot, refreshed when a directory changes)
     if os.path.exists(dataset_dir):
-        for root, dirs, files in os.walk(dataset_dir):
-            for file in files:
-                if file.lower().endswith(".pdf"):
-                    file_base = os.path.splitext(file)[0]
-                    if file_base == base_name:
-                        pdf_path = os.path.join(root, file)
-                        break
-            if pdf_path:
-                break
+        pdf_path = first_match(located["pdf"], "PDF")
     else:
         print(f"Error: Dataset directory not found: {dataset_dir}")
 
@@ -100,17 +108,103 @@ def find_and_move_files(json_path):
             f"Error: Could not find corresponding PDF for '{base_name}' in {dataset_dir}"
         )
 
-    # 3. Move the corresponding text file in output_analyze/Extracted_Text_data_1
-    txt_filename = base_name + ".txt"
-    txt_path = os.path.join(
-        script_dir, "output_analyze", "Extracted_Text_data_1", txt_filename
-    )
+    # 3. Move the corresponding text file in EXTRACTED_TEXT_DIR
+    txt_path = first_match(located["txt"], "text")
 
-    if os.path.exists(txt_path):
+    if txt_path:
         print(f"Found TXT: {txt_path}")
         move_file_safe(txt_path, dest_dir)
     else:
-        print(f"Warning: Text file not found at {txt_path}")
+        print(f"Warning: Text file '{base_name}.txt' not found in {config.EXTRACTED_TEXT_DIR}")
+
+
+def read_json_list(list_path=None, pattern=None, paths=()):
+    """
+    JSON paths for bulk mode: one per line of list_path (blank lines and
+    "#" comments skipped), files matching the glob pattern ("**" recursive),
+    and paths; duplicates are dropped.
+    """
+    json_paths = list(paths)
+    if list_path:
+        with open(list_path, "r", encoding="utf-8-sig") as f:
+            json_paths += [
+                line.strip() for line in f if line.strip() and not line.startswith("#")
+            ]
+    if pattern:
+        json_paths += sorted(glob.glob(pattern, recursive=True))
+    return list(dict.fromkeys(json_paths))
+
+
+def move_files_bulk(json_paths, dest_dir=None):
+    """
+    Move many labels with their PDF and text files to the verification folder.
+    All partners are resolved in one pass over the name indexes, then moved as
+    one journaled move_engine batch: atomic renames on the same filesystem,
+    concurrent copy + delete across devices.
+
+    Args:
+        json_paths: Label paths, or bare label names found in LABEL_DIR
+        dest_dir: Destination (default: <script directory>/DESTINATION_FOLDER)
+
+    Returns:
+        Dict of counts {"json"|"pdf"|"txt": moved, "missing_*": not found, "failed": errors}
+    """
+    started = time.perf_counter()
+    if dest_dir is None:
+        dest_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), DESTINATION_FOLDER)
+    utils.ensure_dir_exists(dest_dir)
+
+    indexes = utils.file_indexes()
+    jobs = []  # (src, dst, kind)
+    missing = {"json": [], "pdf": [], "txt": []}
+    targets = set()
+
+    for json_path in json_paths:
+        base_name = os.path.splitext(os.path.basename(json_path))[0]
+        located = utils.locate_files(base_name, indexes)
+        if os.path.exists(json_path):
+            located["json"] = [os.path.abspath(json_path)]
+        for kind in ("json", "pdf", "txt"):
+            paths = located[kind]
+            if not paths:
+                missing[kind].append(base_name)
+                continue
+            src = first_match(paths, kind.upper())
+            dst = os.path.join(dest_dir, os.path.basename(src))
+            if dst in targets:
+                print(f"Warning: {os.path.basename(src)} listed twice, moving it once")
+                continue
+            targets.add(dst)
+            jobs.append((src, dst, kind))
+
+    print(f"Resolved {len(json_paths)} labels: {len(jobs)} files to move")
+    results = move_engine.move_files(
+        [(src, dst) for src, dst, _ in jobs], name="move_files_for_verification"
+    )
+
+    summary = {"json": 0, "pdf": 0, "txt": 0, "failed": 0}
+    for (src, _, kind), (_, _, error) in zip(jobs, results):
+        if error is None:
+            summary[kind] += 1
+        else:
+            summary["failed"] += 1
+            print(f"Error moving {src}: {error}")
+    for kind, names in missing.items():
+        summary[f"missing_{kind}"] = len(names)
+
+    print("\n" + "=" * 60)
+    print(f"Moved to: {dest_dir}")
+    print(f"Labels: {len(json_paths)}  ({time.perf_counter() - started:.2f}s)")
+    print(f"  JSON moved: {summary['json']}  (not found: {summary['missing_json']})")
+    print(f"  PDF moved:  {summary['pdf']}  (not found: {summary['missing_pdf']})")
+    print(f"  TXT moved:  {summary['txt']}  (not found: {summary['missing_txt']})")
+    print(f"  Failed:     {summary['failed']}")
+    for kind, names in missing.items():
+        if names:
+            more = f" ... (+{len(names) - 10})" if len(names) > 10 else ""
+            print(f"  No {kind.upper()} for: {', '.join(names[:10])}{more}")
+    print("=" * 60)
+    return summary
 
 
 if __name__ == "__main__":
@@ -123,20 +217,35 @@ if __name__ == "__main__":
         "Curveseries New Subscription.json",
     ]
 
-    files_to_process = []
+    parser = argparse.ArgumentParser(
+        description="Move labels with their PDF and text to verification_needed"
+    )
+    parser.add_argument("files", nargs="*", help="Label JSON paths or names")
+    parser.add_argument("--list", help="Bulk mode: text file with one JSON path/name per line")
+    parser.add_argument("--glob", help='Bulk mode: JSON glob, e.g. "review/**/*.json"')
+    parser.add_argument(
+        "--bulk", action="store_true", help="Move the given files in bulk mode"
+    )
+    args = parser.parse_args()
 
-    # If command line arguments are provided, use them as the list
-    if len(sys.argv) > 1:
-        files_to_process = sys.argv[1:]
+    if args.list or args.glob or args.bulk:
+        json_paths = read_json_list(args.list, args.glob, args.files)
+        if not json_paths:
+            parser.error("No JSON files given")
+        move_files_bulk(json_paths)
     else:
-        # Otherwise use the default list and prepend the directory
-        files_to_process = [
-            os.path.join(json_input_dir, f) if not os.path.dirname(f) else f
-            for f in default_file_list
-        ]
+        # If command line arguments are provided, use them as the list
+        if args.files:
+            files_to_process = args.files
+        else:
+            # Otherwise use the default list and prepend the directory
+            files_to_process = [
+                os.path.join(json_input_dir, f) if not os.path.dirname(f) else f
+                for f in default_file_list
+            ]
 
-    print(f"Processing {len(files_to_process)} files...")
+        print(f"Processing {len(files_to_process)} files...")
 
-    for link_f in files_to_process:
-        print(f"\n--- Processing: {link_f} ---")
-        find_and_move_files(link_f)
+        for link_f in files_to_process:
+            print(f"\n--- Processing: {link_f} ---")
+            find_and_move_files(link_f)
@@ -0,0 +1,549 @@
+import os
+import csv
+import random
+import argparse
+import hashlib
+from itertools import chain, combinations
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import config
+import inventory
+import utils
+from find_duplicates import DUPLICATE_DIR
+from verify_labels import flatten_json
+
+NEAR_DUPLICATE_REPORT = os.path.join(DUPLICATE_DIR, "near_duplicate_report.txt")
+NEAR_DUPLICATE_CSV = os.path.join(DUPLICATE_DIR, "near_duplicates.csv")
+TEXT_DUPLICATE_REPORT = os.path.join(DUPLICATE_DIR, "near_duplicate_text_report.txt")
+TEXT_DUPLICATE_CSV = os.path.join(DUPLICATE_DIR, "near_duplicate_texts.csv")
+
+# MinHash permutations h -> (a * h + b) mod P, fixed seed: signatures are stable
+# across processes and runs
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)
+PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(config.NEAR_DUP_NUM_PERM)
+]
+
+# Below this many files, signatures are computed in-process
+PARALLEL_MIN_FILES = 256
+
+
+def label_values(data):
+    """
+    {key: value} of a parsed label, using the same flattening as verify_labels
+    (nested keys joined with "."); empty values are skipped and values are
+    normalized to compare case- and whitespace-insensitively.
+    """
+    values = {}
+    for key, value in flatten_json(data).items():
+        if value is None or str(value).strip() == "":
+            continue
+        values[key] = " ".join(str(value).lower().split())
+    return values
+
+
+def label_shingles(values):
+    """Set of "key=value" strings hashed into the MinHash signature."""
+    return {f"{key}={value}" for key, value in values.items()}
+
+
+def values_digest(values):
+    """Digest of a {key: value} dict; equal for labels with the same pairs."""
+    h = hashlib.blake2b(digest_size=16)
+    for key, value in sorted(values.items()):
+        h.update(f"{len(key)}:{key}{len(value)}:{value}".encode("utf-8"))
+    return h.digest()
+
+
+def _shingle_hash(shingle):
+    digest = hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def minhash_signature(shingles):
+    """MinHash signature (NEAR_DUP_NUM_PERM values) of a set of strings."""
+    hashes = [_shingle_hash(s) for s in shingles]
+    return [
+        min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in PERMUTATIONS
+    ]
+
+
+def band_keys(signature):
+    """
+    LSH band keys: the signature is cut into NEAR_DUP_BANDS bands; two labels
+    become candidates if any band is identical.
+    """
+    rows = len(signature) // config.NEAR_DUP_BANDS
+    return [
+        hash(tuple(signature[b * rows : (b + 1) * rows]))
+        for b in range(config.NEAR_DUP_BANDS)
+    ]
+
+
+def _label_bands(json_path):
+    # Worker: (band keys or None, values digest or None, error message or None)
+    try:
+        values = label_values(utils.load_json(json_path))
+    except Exception as e:
+        return None, None, str(e)
+    if not values:
+        return None, None, None
+    signature = minhash_signature(label_shingles(values))
+    return band_keys(signature), values_digest(values), None
+
+
+def _label_values(json_path):
+    try:
+        return label_values(utils.load_json(json_path))
+    except Exception:
+        return {}
+
+
+def _map(func, items, workers):
+    """pool.map for large inputs, plain map for small ones."""
+    if len(items) < PARALLEL_MIN_FILES or workers <= 1:
+        return list(map(func, items))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(func, items, chunksize=64))
+
+
+def jaccard(a, b):
+    """Jaccard similarity of two sets (or dict item views)."""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def find_candidate_pairs(json_files, workers):
+    """
+    Candidate pairs from LSH buckets, without comparing all pairs. A label with
+    the same key/value pairs as an earlier one is not indexed; it is paired
+    with that label directly.
+
+    Returns:
+        Tuple of (set of (i, j) candidate index pairs with i < j, list of
+        oversized buckets (see bucket_pairs), list of identical (i, j) pairs)
+    """
+    paths = [os.path.join(config.LABEL_DIR, f) for f in json_files]
+    buckets = defaultdict(list)
+    first = {}
+    identical = []
+    for i, (bands, digest, error) in enumerate(_map(_label_bands, paths, workers)):
+        if error is not None:
+            print(f"Error processing {paths[i]}: {error}")
+            continue
+        if bands is None:
+            continue
+        if digest in first:
+            identical.append((first[digest], i))
+            continue
+        first[digest] = i
+        for band, key in enumerate(bands):
+            buckets[(band, key)].append(i)
+
+    pairs, oversized = bucket_pairs(buckets)
+    return pairs, oversized, identical
+
+
+def bucket_pairs(buckets):
+    """
+    All pairs of indexes that share a bucket. Buckets larger than
+    config.NEAR_DUP_MAX_BUCKET are returned instead of expanded (their pair set
+    grows quadratically); their pairs are scored one at a time with
+    oversized_pairs(). Buckets with the same members are returned once.
+
+    Returns:
+        Tuple of (set of (i, j) index pairs with i < j, list of oversized
+        buckets as sorted index lists)
+    """
+    pairs = set()
+    oversized = set()
+    for members in buckets.values():
+        if len(members) < 2:
+            continue
+        if len(members) > config.NEAR_DUP_MAX_BUCKET:
+            oversized.add(tuple(sorted(members)))
+            continue
+        for x in range(len(members)):
+            for y in range(x + 1, len(members)):
+                pairs.add((members[x], members[y]))
+    return pairs, sorted(oversized)
+
+
+def oversized_pairs(oversized, pairs=()):
+    """
+    Iterate over the pairs of oversized buckets, skipping pairs already in
+    `pairs`. The pairs are generated lazily; none of the buckets is expanded
+    into a pair set.
+    """
+    for members in oversized:
+        for pair in combinations(members, 2):
+            if pair not in pairs:
+                yield pair
+
+
+def group_pairs(scored_pairs):
+    """
+    Union-find over similar pairs.
+
+    Returns:
+        List of sorted index lists, one per group
+    """
+    parent = {}
+
+    def find(i):
+        parent.setdefault(i, i)
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j, _ in scored_pairs:
+        parent[find(i)] = find(j)
+
+    groups = defaultdict(list)
+    for i in parent:
+        groups[find(i)].append(i)
+    return [sorted(members) for members in groups.values()]
+
+
+def changed_keys(a, b):
+    """Keys whose values differ between two {key: value} dicts."""
+    return sorted(k for k in a.keys() | b.keys() if a.get(k) != b.get(k))
+
+
+def find_near_duplicates(threshold=None, workers=None):
+    """
+    Group labels whose flattened key/value sets have a Jaccard similarity of at
+    least `threshold` (MinHash + LSH candidates, exact score on candidates),
+    and write a grouped text report and a CSV. Files are not moved.
+
+    Args:
+        threshold: Minimum similarity (default: config.NEAR_DUP_THRESHOLD)
+        workers: Worker processes (default: config.PDF_WORKERS)
+
+    Returns:
+        List of groups, each a list of (filename, similarity to the group's
+        first file, changed keys)
+    """
+    threshold = threshold if threshold is not None else config.NEAR_DUP_THRESHOLD
+    workers = workers or config.PDF_WORKERS
+
+    print(">>> STARTING NEAR-DUPLICATE DETECTION")
+    print(f"Scanning directory: {config.LABEL_DIR}")
+    if not os.path.exists(config.LABEL_DIR):
+        print(f"Error: Label directory not found: {config.LABEL_DIR}")
+        return []
+
+    json_files = sorted(
+        e.name
+        for e in inventory.get_inventory(config.LABEL_DIR).files(
+            ".json", recursive=False
+        )
+    )
+    print(f"Found {len(json_files)} JSON files. Computing MinHash signatures...")
+
+    pairs, oversized, identical = find_candidate_pairs(json_files, workers)
+    print(f"Candidate pairs from LSH: {len(pairs)}")
+    if identical:
+        print(f"Labels identical to an earlier label: {len(identical)}")
+    if oversized:
+        print(
+            f"Comparing {len(oversized)} buckets with more than "
+            f"{config.NEAR_DUP_MAX_BUCKET} labels pair by pair..."
+        )
+
+    # Exact similarity, only for files that appear in a candidate pair
+    involved = sorted(
+        {i for pair in chain(pairs, identical) for i in pair}.union(*oversized)
+    )
+    label_sets = dict(
+        zip(
+            involved,
+            _map(
+                _label_values,
+                [os.path.join(config.LABEL_DIR, json_files[i]) for i in involved],
+                workers,
+            ),
+        )
+    )
+    scored = [(i, j, 1.0) for i, j in identical]
+    for i, j in chain(pairs, oversized_pairs(oversized, pairs)):
+        score = jaccard(label_sets[i].items(), label_sets[j].items())
+        if score >= threshold:
+            scored.append((i, j, score))
+
+    groups = []
+    for members in sorted(group_pairs(scored)):
+        reference = members[0]
+        group = [(json_files[reference], 1.0, [])]
+        for i in members[1:]:
+            a, b = label_sets[reference], label_sets[i]
+            score = jaccard(a.items(), b.items())
+            group.append((json_files[i], score, changed_keys(a, b)))
+        groups.append(group)
+
+    write_near_duplicate_report(groups, len(json_files), threshold)
+    return groups
+
+
+def write_near_duplicate_report(groups, total_files, threshold):
+    """Write the grouped text report and the CSV of near-duplicate labels."""
+    utils.ensure_dir_exists(os.path.dirname(NEAR_DUPLICATE_REPORT))
+    total_similar = sum(len(g) - 1 for g in groups)
+
+    with open(NEAR_DUPLICATE_REPORT, "w", encoding="utf-8") as f:
+        f.write("BÁO CÁO CÁC FILE NHÃN GẦN TRÙNG LẶP (NEAR-DUPLICATE REPORT)\n")
+        f.write("=" * 70 + "\n")
+        f.write(f"Tổng số file JSON: {total_files}\n")
+        f.write(f"Ngưỡng tương đồng (Jaccard trên các cặp key=value): {threshold}\n")
+        f.write(f"Tổng số nhóm gần trùng lặp: {len(groups)}\n")
+        f.write(f"Tổng số file gần trùng với file đầu nhóm: {total_similar}\n")
+        f.write("=" * 70 + "\n\n")
+
+        for idx, group in enumerate(groups, 1):
+            f.write(f"Nhóm {idx} ({len(group)} file):\n")
+            f.write(f"   [GỐC] {group[0][0]}\n")
+            for filename, score, keys in group[1:]:
+                detail = ", ".join(keys) if keys else "trùng hoàn toàn"
+                f.write(f"   [{score:.2f}] {filename} (khác: {detail})\n")
+            f.write("-" * 50 + "\n")
+
+    with open(NEAR_DUPLICATE_CSV, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Group", "Filename", "Reference", "Similarity", "ChangedKeys"])
+        for idx, group in enumerate(groups, 1):
+            reference = group[0][0]
+            for filename, score, keys in group:
+                writer.writerow([idx, filename, reference, f"{score:.4f}", ";".join(keys)])
+
+    print(f"\nFound {len(groups)} near-duplicate groups ({total_similar} files).")
+    print(f"Report saved to: {NEAR_DUPLICATE_REPORT}")
+    print(f"CSV saved to: {NEAR_DUPLICATE_CSV}")
+
+
+def text_shingles(text):
+    """
+    Counter of word n-grams (config.TEXT_DUP_SHINGLE_WORDS words) of a document,
+    case- and whitespace-insensitive. Texts shorter than one shingle give a single
+    shingle of all their words.
+    """
+    words = text.lower().split()
+    n = config.TEXT_DUP_SHINGLE_WORDS
+    if len(words) <= n:
+        return Counter([" ".join(words)]) if words else Counter()
+    return Counter(" ".join(words[i : i + n]) for i in range(len(words) - n + 1))
+
+
+def simhash(shingles):
+    """
+    64-bit SimHash of weighted shingles: each bit is the sign of the weighted
+    sum of that bit over all shingle hashes. Similar texts differ in few bits.
+    """
+    totals = [0] * 64
+    for shingle, weight in shingles.items():
+        h = _shingle_hash(shingle)
+        for bit in range(64):
+            totals[bit] += weight if h >> bit & 1 else -weight
+    return sum(1 << bit for bit in range(64) if totals[bit] > 0)
+
+
+def simhash_bands(fingerprint, max_distance):
+    """
+    Banded index keys of a fingerprint: it is cut into config.TEXT_DUP_BLOCKS
+    blocks and every combination of (blocks - max_distance) blocks is one key.
+    Two fingerprints at most max_distance bits apart differ in at most that many
+    blocks, so they always share at least one key.
+    """
+    width = 64 // config.TEXT_DUP_BLOCKS
+    mask = (1 << width) - 1
+    blocks = [fingerprint >> (b * width) & mask for b in range(config.TEXT_DUP_BLOCKS)]
+    return [
+        (combo, tuple(blocks[b] for b in combo))
+        for combo in combinations(
+            range(config.TEXT_DUP_BLOCKS), config.TEXT_DUP_BLOCKS - max_distance
+        )
+    ]
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def _text_simhash(txt_path):
+    # Worker: (fingerprint or None for empty text, error message or None)
+    try:
+        with open(txt_path, "r", encoding="utf-8", errors="replace") as f:
+            shingles = text_shingles(f.read())
+    except Exception as e:
+        return None, str(e)
+    if not shingles:
+        return None, None
+    return simhash(shingles), None
+
+
+def find_near_duplicate_texts(max_distance=None, workers=None):
+    """
+    Group documents whose extracted text (EXTRACTED_TEXT_DIR) has SimHash
+    fingerprints at most `max_distance` bits apart, using a banded index
+    instead of comparing all pairs, and write a grouped text report and a CSV.
+    Catches the same invoice re-sent as a new PDF (other producer, timestamp).
+    Files are not moved.
+
+    Args:
+        max_distance: Maximum Hamming distance (default: config.TEXT_DUP_MAX_DISTANCE)
+        workers: Worker processes (default: config.PDF_WORKERS)
+
+    Returns:
+        List of groups, each a list of (text file, distance to the group's first
+        file)
+    """
+    if max_distance is None:
+        max_distance = config.TEXT_DUP_MAX_DISTANCE
+    workers = workers or config.PDF_WORKERS
+
+    print(">>> STARTING NEAR-DUPLICATE TEXT DETECTION")
+    print(f"Scanning directory: {config.EXTRACTED_TEXT_DIR}")
+    if not os.path.exists(config.EXTRACTED_TEXT_DIR):
+        print(f"Error: Extracted text directory not found: {config.EXTRACTED_TEXT_DIR}")
+        print("Run extract_pdf.py first.")
+        return []
+    if not 0 <= max_distance < config.TEXT_DUP_BLOCKS:
+        print(
+            f"Error: maximum distance must be between 0 and "
+            f"{config.TEXT_DUP_BLOCKS - 1} (config.TEXT_DUP_BLOCKS - 1)"
+        )
+        return []
+
+    txt_files = sorted(
+        e.rel_path
+        for e in inventory.get_inventory(config.EXTRACTED_TEXT_DIR).files(".txt")
+    )
+    print(f"Found {len(txt_files)} text files. Computing SimHash fingerprints...")
+
+    paths = [os.path.join(config.EXTRACTED_TEXT_DIR, f) for f in txt_files]
+    fingerprints = {}
+    buckets = defaultdict(list)
+    first = {}
+    identical = []
+    empty = 0
+    for i, (fingerprint, error) in enumerate(_map(_text_simhash, paths, workers)):
+        if error is not None:
+            print(f"Error processing {paths[i]}: {error}")
+            continue
+        if fingerprint is None:
+            # Image PDFs leave empty text files; they are all "identical"
+            empty += 1
+            continue
+        fingerprints[i] = fingerprint
+        # Same fingerprint as an earlier document: paired directly, not indexed
+        if fingerprint in first:
+            identical.append((first[fingerprint], i))
+            continue
+        first[fingerprint] = i
+        for key in simhash_bands(fingerprint, max_distance):
+            buckets[key].append(i)
+
+    pairs, oversized = bucket_pairs(buckets)
+    print(f"Candidate pairs from banded index: {len(pairs)}")
+    if identical:
+        print(f"Documents identical to an earlier fingerprint: {len(identical)}")
+    if oversized:
+        print(
+            f"Comparing {len(oversized)} buckets with more than "
+            f"{config.NEAR_DUP_MAX_BUCKET} documents pair by pair..."
+        )
+
+    scored = [(i, j, 0) for i, j in identical]
+    for i, j in chain(pairs, oversized_pairs(oversized, pairs)):
+        distance = hamming(fingerprints[i], fingerprints[j])
+        if distance <= max_distance:
+            scored.append((i, j, distance))
+
+    groups = []
+    for members in sorted(group_pairs(scored)):
+        reference = fingerprints[members[0]]
+        groups.append(
+            [(txt_files[i], hamming(reference, fingerprints[i])) for i in members]
+        )
+
+    write_near_duplicate_text_report(groups, len(txt_files), empty, max_distance)
+    return groups
+
+
+def write_near_duplicate_text_report(groups, total_files, empty_files, max_distance):
+    """Write the grouped text report and the CSV of near-duplicate documents."""
+    utils.ensure_dir_exists(os.path.dirname(TEXT_DUPLICATE_REPORT))
+    total_similar = sum(len(g) - 1 for g in groups)
+
+    def label_note(txt_file):
+        label = os.path.splitext(txt_file)[0] + ".json"
+        if os.path.exists(os.path.join(config.LABEL_DIR, label)):
+            return f"label: {label}"
+        return "không có label"
+
+    with open(TEXT_DUPLICATE_REPORT, "w", encoding="utf-8") as f:
+        f.write("BÁO CÁO CÁC TÀI LIỆU GẦN TRÙNG LẶP NỘI DUNG TEXT (SIMHASH REPORT)\n")
+        f.write("=" * 70 + "\n")
+        f.write(f"Tổng số file text: {total_files}\n")
+        f.write(f"Số file text rỗng (bỏ qua): {empty_files}\n")
+        f.write(f"Khoảng cách Hamming tối đa (SimHash 64 bit): {max_distance}\n")
+        f.write(f"Tổng số nhóm gần trùng lặp: {len(groups)}\n")
+        f.write(f"Tổng số tài liệu gần trùng với tài liệu đầu nhóm: {total_similar}\n")
+        f.write("=" * 70 + "\n\n")
+
+        for idx, group in enumerate(groups, 1):
+            f.write(f"Nhóm {idx} ({len(group)} tài liệu):\n")
+            reference = group[0][0]
+            f.write(f"   [GỐC] {reference} ({label_note(reference)})\n")
+            for txt_file, distance in group[1:]:
+                f.write(f"   [{distance} bit] {txt_file} ({label_note(txt_file)})\n")
+            f.write("-" * 50 + "\n")
+
+    with open(TEXT_DUPLICATE_CSV, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Group", "TextFile", "PdfFile", "Reference", "Distance"])
+        for idx, group in enumerate(groups, 1):
+            reference = group[0][0]
+            for txt_file, distance in group:
+                pdf_file = os.path.splitext(txt_file)[0] + ".pdf"
+                writer.writerow([idx, txt_file, pdf_file, reference, distance])
+
+    print(f"\nFound {len(groups)} near-duplicate document groups ({total_similar} files).")
+    print(f"Report saved to: {TEXT_DUPLICATE_REPORT}")
+    print(f"CSV saved to: {TEXT_DUPLICATE_CSV}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Report labels that differ in only a few fields, or with "
+        "--text, documents whose extracted text is nearly identical"
+    )
+    parser.add_argument(
+        "--text",
+        action="store_true",
+        help="Compare extracted texts (SimHash) instead of labels",
+    )
+    parser.add_argument(
+        "--max-distance",
+        type=int,
+        default=None,
+        help="--text: maximum Hamming distance (default: config.TEXT_DUP_MAX_DISTANCE)",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=None,
+        help="Minimum Jaccard similarity (default: config.NEAR_DUP_THRESHOLD)",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="Worker processes (default: config)"
+    )
+    args = parser.parse_args()
+
+    if args.text:
+        find_near_duplicate_texts(max_distance=args.max_distance, workers=args.workers)
+    else:
+        find_near_duplicates(threshold=args.threshold, workers=args.workers)
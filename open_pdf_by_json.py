@@ -1,6 +1,7 @@
 import os
 import sys
 import config
+import utils
 
 
 def open_file_default(file_path):
@@ -21,8 +22,25 @@ def open_file_default(file_path):
         print(f"Error opening file: {e}")
 
 
+def first_match(paths, kind):
+    """First of the files found for a name; warns if the name is ambiguous."""
+    if len(paths) > 1:
+        print(f"Warning: {len(paths)} {kind} files with this name, using: {paths[0]}")
+    return paths[0] if paths else None
+
+
 def find_and_open_files(json_path):
+    """
+    Open a label JSON with its PDF and extracted text. json_path may also be a
+    bare label name (e.g. "invoice 12.json"), looked up in LABEL_DIR.
+    """
+    base_name = os.path.splitext(os.path.basename(json_path))[0]
+    located = utils.locate_files(base_name)
+
     # 1. Open the JSON file itself
+    if not os.path.exists(json_path) and located["json"]:
+        # Not at the given path: the label of that name in LABEL_DIR
+        json_path = first_match(located["json"], "JSON")
     if os.path.exists(json_path):
         open_file_default(json_path)
     else:
@@ -30,23 +48,14 @@ def find_and_open_files(json_path):
         return
 
     # 2. Find and open the corresponding PDF
-    base_name = os.path.splitext(os.path.basename(json_path))[0]
     dataset_dir = config.DATASET_DIR
     print(f"Searching for PDF for '{base_name}' in: {dataset_dir}")
 
     pdf_path = None
 
-    # Recursively search for the PDF file
+    # Indexed lookup (inventory snapshot, refreshed when a directory changes)
     if os.path.exists(dataset_dir):
-        for root, dirs, files in os.walk(dataset_dir):
-            for file in files:
-                if file.lower().endswith(".pdf"):
-                    file_base = os.path.splitext(file)[0]
-                    if file_base == base_name:
-                        pdf_path = os.path.join(root, file)
-                        break
-            if pdf_path:
-                break
+        pdf_path = first_match(located["pdf"], "PDF")
     else:
         print(f"Error: Dataset directory not found: {dataset_dir}")
 
@@ -58,21 +67,13 @@ def find_and_open_files(json_path):
             f"Error: Could not find corresponding PDF for '{base_name}' in {dataset_dir}"
         )
 
-    # 3. Open the corresponding text file in output_analyze/Extracted_Text_data_1
-    txt_filename = base_name + ".txt"
-    # Assuming output_analyze is relative to the script's directory or current working directory
-    # We can use os.getcwd() or relative to this script file if needed.
-    # For now, let's try relative to CWD as the user usually runs from root of project.
-    # Or better, relative to the script's location.
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    txt_path = os.path.join(
-        script_dir, "output_analyze", "Extracted_Text_data_1", txt_filename
-    )
-
-    if os.path.exists(txt_path):
+    # 3. Open the corresponding text file in EXTRACTED_TEXT_DIR
+    txt_path = first_match(located["txt"], "text")
+
+    if txt_path:
         open_file_default(txt_path)
     else:
-        print(f"Warning: Text file not found at {txt_path}")
+        print(f"Warning: Text file '{base_name}.txt' not found in {config.EXTRACTED_TEXT_DIR}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,169 @@
+import os
+import sqlite3
+from collections import Counter
+import config
+
+# Same columns as label_verification.csv (verify_labels.RESULT_FIELDNAMES).
+# Columns have no declared type, so values come back exactly as verify_labels
+# produced them (int, float or str)
+COLUMNS = [
+    "Filename",
+    "Key",
+    "Value",
+    "Status",
+    "Score",
+    "BestMatchLine",
+    "DateFormat",
+    "ContextLine",
+]
+
+SCHEMA_VERSION = "1"
+
+
+def csv_signature(csv_path=None):
+    """(size, mtime_ns) of the verification CSV as text, or None if missing."""
+    try:
+        st = os.stat(csv_path or config.VERIFY_REPORT_CSV)
+    except OSError:
+        return None
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+def _create_tables(conn):
+    columns = ", ".join(f'"{c}"' for c in COLUMNS)
+    conn.execute(f"CREATE TABLE results (row_id INTEGER PRIMARY KEY, {columns})")
+    conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+
+
+def _create_indexes(conn):
+    conn.execute('CREATE INDEX idx_results_filename ON results ("Filename")')
+    conn.execute('CREATE INDEX idx_results_key ON results ("Key")')
+    conn.execute('CREATE INDEX idx_results_status ON results ("Status")')
+
+
+def _insert_rows(conn, rows):
+    columns = ", ".join(f'"{c}"' for c in COLUMNS)
+    placeholders = ", ".join("?" for _ in COLUMNS)
+    conn.executemany(
+        f"INSERT INTO results ({columns}) VALUES ({placeholders})",
+        ([row.get(c) for c in COLUMNS] for row in rows),
+    )
+
+
+def _set_meta(conn, csv_path):
+    conn.executemany(
+        "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+        [("version", SCHEMA_VERSION), ("csv_signature", csv_signature(csv_path))],
+    )
+
+
+def write_results(rows, db_path=None, csv_path=None):
+    """
+    Write verification result rows to a new SQLite database, indexed on
+    Filename, Key and Status. Call after the CSV is complete: the database
+    records the CSV's size and mtime and is only used while they match.
+
+    Args:
+        rows: Result rows (dicts with the CSV columns)
+        db_path: Database file (default: config.VERIFY_RESULTS_DB)
+        csv_path: CSV the rows were written to (default: config.VERIFY_REPORT_CSV)
+    """
+    db_path = db_path or config.VERIFY_RESULTS_DB
+    tmp_path = db_path + ".tmp"
+    try:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        conn = sqlite3.connect(tmp_path)
+        # Built in a temporary file that replaces the database when complete,
+        # so the rollback journal and fsyncs are not needed
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        try:
+            with conn:
+                _create_tables(conn)
+                _insert_rows(conn, rows)
+                # Building indexes after the bulk insert is much faster
+                _create_indexes(conn)
+                _set_meta(conn, csv_path)
+        finally:
+            conn.close()
+        os.replace(tmp_path, db_path)
+        print(f"Verification results database saved to: {db_path}")
+    except Exception as e:
+        print(f"Error writing results database: {e}")
+
+
+def connect(db_path=None, csv_path=None):
+    """
+    Open the results database if it exists and matches the current CSV.
+
+    Returns:
+        sqlite3.Connection, or None if the database is missing, unreadable or
+        older than the CSV (callers then read the CSV)
+    """
+    db_path = db_path or config.VERIFY_RESULTS_DB
+    if not config.VERIFY_RESULTS_DB_ENABLED or not os.path.exists(db_path):
+        return None
+    conn = sqlite3.connect(db_path)
+    try:
+        meta = dict(conn.execute("SELECT key, value FROM meta"))
+    except sqlite3.Error:
+        conn.close()
+        return None
+    if meta.get("version") != SCHEMA_VERSION or meta.get(
+        "csv_signature"
+    ) != csv_signature(csv_path):
+        conn.close()
+        return None
+    return conn
+
+
+def append_results(conn, rows, csv_path=None, replace=()):
+    """
+    Add rows appended to the CSV (watch mode) to an open, current database and
+    record the new CSV signature. Closes the connection.
+
+    Args:
+        replace: Label filenames whose existing rows are deleted first (labels
+            processed again, whose old rows were removed from the CSV)
+    """
+    try:
+        with conn:
+            conn.executemany(
+                'DELETE FROM results WHERE "Filename" = ?',
+                ((filename,) for filename in replace),
+            )
+            _insert_rows(conn, rows)
+            _set_meta(conn, csv_path)
+    except sqlite3.Error as e:
+        print(f"Error updating results database: {e}")
+    finally:
+        conn.close()
+
+
+def status_counts(conn):
+    """Counter {status: rows}."""
+    return Counter(
+        dict(conn.execute('SELECT "Status", COUNT(*) FROM results GROUP BY "Status"'))
+    )
+
+
+def rows_with_status(conn, status):
+    """Yields result rows (tuples in COLUMNS order) of one status, in CSV order."""
+    columns = ", ".join(f'"{c}"' for c in COLUMNS)
+    yield from conn.execute(
+        f'SELECT {columns} FROM results WHERE "Status" = ? ORDER BY row_id',
+        (status,),
+    )
+
+
+def rows_for_file(conn, filename):
+    """Result rows (dicts) of one label, in CSV order, via the Filename index."""
+    columns = ", ".join(f'"{c}"' for c in COLUMNS)
+    return [
+        dict(zip(COLUMNS, row))
+        for row in conn.execute(
+            f'SELECT {columns} FROM results WHERE "Filename" = ? ORDER BY row_id',
+            (filename,),
+        )
+    ]
@@ -0,0 +1,420 @@
+import os
+import re
+import csv
+import html
+import json
+import hashlib
+import argparse
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, urlencode
+import fitz  # PyMuPDF
+import config
+import utils
+import results_db
+import filter_verified_labels
+
+# Values shorter than this are not highlighted (would mark every "1" or "a")
+MIN_HIGHLIGHT_LENGTH = 3
+
+# Case list filters: {name: verdict row -> bool}
+LIST_FILTERS = {
+    "review": lambda row: row["Verdict"] == "REVIEW",
+    "missing": lambda row: int(row["Missing"]) > 0,
+    "similar": lambda row: int(row["Similar"]) > 0,
+    "all": lambda row: True,
+}
+
+STYLE = """
+body { font-family: sans-serif; margin: 0; font-size: 14px; }
+header { padding: 8px 12px; background: #263238; color: #fff; }
+header a { color: #b3e5fc; margin-right: 12px; }
+main { display: grid; grid-template-columns: 1fr 1fr 1.3fr; gap: 8px; padding: 8px; }
+section { border: 1px solid #ccc; overflow: auto; max-height: 88vh; padding: 6px; }
+pre { white-space: pre-wrap; margin: 0; }
+table { border-collapse: collapse; }
+td, th { border: 1px solid #ddd; padding: 2px 6px; text-align: left; }
+mark.found { background: #c8e6c9; }
+mark.similar { background: #fff59d; }
+.MISSING { color: #c62828; font-weight: bold; }
+.SIMILAR { color: #f57f17; font-weight: bold; }
+img { max-width: 100%; border: 1px solid #999; }
+"""
+
+# Highlight colors of the PDF page (RGB 0..1), by mark class
+PAGE_COLORS = {"found": (0.5, 0.9, 0.5), "similar": (1.0, 0.9, 0.2)}
+
+
+class PageCache:
+    """
+    Size-bounded LRU cache of rendered pages on disk. Recency is kept in the
+    file mtimes, so the order survives a server restart.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        utils.ensure_dir_exists(directory)
+        # {file name: size}, least recently used first
+        self.entries = OrderedDict()
+        self.total = 0
+        files = [e for e in os.scandir(directory) if e.name.endswith(".png")]
+        for entry in sorted(files, key=lambda e: e.stat().st_mtime_ns):
+            self.entries[entry.name] = entry.stat().st_size
+            self.total += entry.stat().st_size
+
+    def get(self, key):
+        """Cached bytes of key, or None."""
+        name = key + ".png"
+        with self.lock:
+            if name not in self.entries:
+                return None
+            self.entries.move_to_end(name)
+        path = os.path.join(self.directory, name)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+            return data
+        except OSError:
+            with self.lock:
+                self.total -= self.entries.pop(name, 0)
+            return None
+
+    def put(self, key, data):
+        name = key + ".png"
+        path = os.path.join(self.directory, name)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self.lock:
+            self.total += len(data) - self.entries.pop(name, 0)
+            self.entries[name] = len(data)
+            while self.total > self.max_bytes and len(self.entries) > 1:
+                old_name, size = self.entries.popitem(last=False)
+                self.total -= size
+                try:
+                    os.remove(os.path.join(self.directory, old_name))
+                except OSError:
+                    pass
+
+
+class ReviewData:
+    """Verdicts, verification rows and file locations, reloaded when their files change."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.verdicts = {}
+        self.verdicts_mtime = None
+        self.csv_rows = None  # {filename: rows}, only without a results database
+        self.csv_mtime = None
+
+    def get_verdicts(self):
+        """Dict {filename: verdict row}, re-read when the results CSV changes."""
+        with self.lock:
+            try:
+                mtime = os.stat(config.VERIFY_REPORT_CSV).st_mtime_ns
+            except OSError:
+                return {}
+            if mtime != self.verdicts_mtime:
+                self.verdicts = filter_verified_labels.load_verdicts(config.VERIFY_REPORT_CSV)
+                self.verdicts_mtime = mtime
+            return self.verdicts
+
+    def result_rows(self, filename):
+        """Verification rows of a label: indexed query, else an in-memory copy of the CSV."""
+        db = results_db.connect()
+        if db is not None:
+            try:
+                return results_db.rows_for_file(db, filename)
+            finally:
+                db.close()
+
+        with self.lock:
+            try:
+                mtime = os.stat(config.VERIFY_REPORT_CSV).st_mtime_ns
+            except OSError:
+                return []
+            if mtime != self.csv_mtime:
+                print(f"Loading verification results: {config.VERIFY_REPORT_CSV}")
+                self.csv_rows = {}
+                with open(config.VERIFY_REPORT_CSV, "r", newline="", encoding="utf-8") as f:
+                    for row in csv.DictReader(f):
+                        self.csv_rows.setdefault(row["Filename"], []).append(row)
+                self.csv_mtime = mtime
+            return self.csv_rows.get(filename, [])
+
+
+def highlight_terms(rows):
+    """
+    (text, mark class) pairs to highlight for a label's result rows: the matched
+    line (or value) of found and similar fields, longest first.
+    """
+    terms = {}
+    for row in rows:
+        status = str(row["Status"])
+        if "FOUND" in status:
+            mark = "found"
+        elif status == "SIMILAR":
+            mark = "similar"
+        else:
+            continue
+        term = str(row.get("BestMatchLine") or row.get("Value") or "").strip()
+        if len(term) >= MIN_HIGHLIGHT_LENGTH:
+            terms.setdefault(term, mark)
+    return sorted(terms.items(), key=lambda t: -len(t[0]))
+
+
+def highlight_text(text, terms):
+    """HTML-escaped text with the terms wrapped in <mark> (case-insensitive)."""
+    if not terms:
+        return html.escape(text)
+    marks = {term.lower(): mark for term, mark in terms}
+    pattern = re.compile("|".join(re.escape(term) for term, _ in terms), re.IGNORECASE)
+    parts = []
+    position = 0
+    for match in pattern.finditer(text):
+        parts.append(html.escape(text[position : match.start()]))
+        mark = marks.get(match.group(0).lower(), "found")
+        parts.append(f'<mark class="{mark}">{html.escape(match.group(0))}</mark>')
+        position = match.end()
+    parts.append(html.escape(text[position:]))
+    return "".join(parts)
+
+
+class BadRequest(ValueError):
+    """A malformed query parameter; answered with HTTP 400."""
+
+
+def int_param(params, name):
+    """Non-negative integer query parameter (default 0)."""
+    try:
+        return max(0, int(params.get(name, 0)))
+    except ValueError:
+        raise BadRequest(f"{name} must be an integer")
+
+
+def render_page(pdf_path, page_number, terms, zoom):
+    """PNG bytes of one PDF page with the terms highlighted."""
+    with fitz.open(pdf_path) as doc:
+        page = doc[page_number]
+        for term, mark in terms:
+            for rect in page.search_for(term):
+                page.draw_rect(
+                    rect, color=None, fill=PAGE_COLORS[mark], fill_opacity=0.4, overlay=True
+                )
+        return page.get_pixmap(matrix=fitz.Matrix(zoom, zoom)).tobytes("png")
+
+
+def page_cache_key(pdf_path, page_number, terms, zoom):
+    """Changes with the PDF (size, mtime), the page, the zoom and the highlights."""
+    st = os.stat(pdf_path)
+    raw = json.dumps([pdf_path, st.st_size, st.st_mtime_ns, page_number, zoom, terms])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class ReviewHandler(BaseHTTPRequestHandler):
+    """
+    GET /            case list (?filter=review|missing|similar|all&q=&offset=)
+    GET /doc?name=   label JSON, extracted text and PDF page side by side
+    GET /page?name=&page=   rendered PDF page (PNG)
+    """
+
+    data = None
+    cache = None
+    zoom = config.REVIEW_PAGE_ZOOM
+    render_lock = threading.Lock()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        routes = {"/": self.case_list, "/doc": self.document, "/page": self.page_image}
+        handler = routes.get(url.path)
+        if handler is None:
+            self.send_error(404)
+            return
+        try:
+            handler(params)
+        except BadRequest as e:
+            self.send_error(400, str(e))
+        except Exception as e:
+            print(f"Error serving {self.path}: {e}")
+            self.send_error(500, str(e))
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, body, content_type="text/html; charset=utf-8", cache=False):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if cache:
+            self.send_header("Cache-Control", "max-age=3600")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_page(self, title, content):
+        self.send_body(
+            f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>{html.escape(title)}</title>"
+            f"<style>{STYLE}</style></head><body>{content}</body></html>"
+        )
+
+    def case_list(self, params):
+        name_filter = params.get("filter", "review")
+        if name_filter not in LIST_FILTERS:
+            name_filter = "review"
+        query = params.get("q", "").lower()
+        offset = int_param(params, "offset")
+        page_size = config.REVIEW_LIST_PAGE_SIZE
+
+        verdicts = self.data.get_verdicts()
+        cases = [
+            row
+            for name, row in verdicts.items()
+            if LIST_FILTERS[name_filter](row) and query in name.lower()
+        ]
+
+        links = " ".join(
+            f"<a href='/?{urlencode({'filter': f, 'q': query})}'>{f}</a>" for f in LIST_FILTERS
+        )
+        lines = [
+            f"<header><b>Label review</b> &nbsp; {links}"
+            f"<form style='display:inline' action='/'><input type='hidden' name='filter' value='{name_filter}'>"
+            f"<input name='q' value='{html.escape(query)}' placeholder='file name'></form></header>",
+            f"<p style='padding:0 12px'>{len(cases)} of {len(verdicts)} labels ({name_filter})</p>",
+            "<table style='margin:0 12px'><tr><th>File</th><th>Fields</th><th>Found</th>"
+            "<th>Similar</th><th>Missing</th><th>N/A</th><th>Verdict</th></tr>",
+        ]
+        for row in cases[offset : offset + page_size]:
+            link = "/doc?" + urlencode({"name": row["Filename"]})
+            cells = "".join(
+                f"<td>{html.escape(str(row[column]))}</td>"
+                for column in ("Total", "Found", "Similar", "Missing", "NA", "Verdict")
+            )
+            lines.append(
+                f"<tr><td><a href='{link}'>{html.escape(row['Filename'])}</a></td>{cells}</tr>"
+            )
+        lines.append("</table><p style='padding:0 12px'>")
+        for label, start in (("&laquo; previous", offset - page_size), ("next &raquo;", offset + page_size)):
+            if 0 <= start < len(cases):
+                args = urlencode({"filter": name_filter, "q": query, "offset": start})
+                lines.append(f"<a href='/?{args}'>{label}</a> ")
+        lines.append("</p>")
+        self.send_page("Label review", "".join(lines))
+
+    def document(self, params):
+        name = params.get("name", "")
+        base_name = os.path.splitext(name)[0]
+        located = utils.locate_files(base_name)
+        rows = self.data.result_rows(name)
+        terms = highlight_terms(rows)
+
+        json_paths = located["json"]
+        label = utils.read_file(json_paths[0]) if json_paths else "(label not found)"
+        try:
+            label = json.dumps(json.loads(label), ensure_ascii=False, indent=2)
+        except ValueError:
+            pass
+        text = utils.read_file(located["txt"][0]) if located["txt"] else "(no extracted text)"
+
+        fields = ["<table><tr><th>Key</th><th>Value</th><th>Status</th><th>Score</th></tr>"]
+        for row in rows:
+            fields.append(
+                f"<tr><td>{html.escape(str(row['Key']))}</td><td>{html.escape(str(row['Value']))}</td>"
+                f"<td class='{html.escape(str(row['Status']))}'>{html.escape(str(row['Status']))}</td>"
+                f"<td>{html.escape(str(row['Score']))}</td></tr>"
+            )
+        fields.append("</table>")
+
+        pdf_panel = "(PDF not found)"
+        if located["pdf"]:
+            page_number = int_param(params, "page")
+            with self.render_lock, fitz.open(located["pdf"][0]) as doc:
+                page_count = doc.page_count
+            page_number = min(page_number, max(page_count - 1, 0))
+            nav = []
+            for label_text, number in (("&laquo;", page_number - 1), ("&raquo;", page_number + 1)):
+                if 0 <= number < page_count:
+                    nav.append(f"<a href='/doc?{urlencode({'name': name, 'page': number})}'>{label_text}</a>")
+            image = "/page?" + urlencode({"name": name, "page": page_number})
+            pdf_panel = (
+                f"<p>{' '.join(nav)} Page {page_number + 1}/{page_count} "
+                f"{html.escape(os.path.basename(located['pdf'][0]))}</p><img src='{image}'>"
+            )
+
+        content = (
+            f"<header><a href='/'>&laquo; cases</a><b>{html.escape(name)}</b></header><main>"
+            f"<section><h3>Label</h3>{''.join(fields)}<pre>{html.escape(label)}</pre></section>"
+            f"<section><h3>Extracted text</h3><pre>{highlight_text(text, terms)}</pre></section>"
+            f"<section>{pdf_panel}</section></main>"
+        )
+        self.send_page(name, content)
+
+    def page_image(self, params):
+        name = params.get("name", "")
+        located = utils.locate_files(os.path.splitext(name)[0])
+        if not located["pdf"]:
+            self.send_error(404, "PDF not found")
+            return
+        pdf_path = located["pdf"][0]
+        page_number = int_param(params, "page")
+        terms = highlight_terms(self.data.result_rows(name))
+
+        # Cached pages are served without opening the PDF; only pages that
+        # exist are cached, so the page number is checked on a miss only
+        key = page_cache_key(pdf_path, page_number, terms, self.zoom)
+        data = self.cache.get(key)
+        if data is None:
+            # PyMuPDF is not thread-safe: documents are opened one at a time
+            with self.render_lock:
+                with fitz.open(pdf_path) as doc:
+                    page_count = doc.page_count
+                if not page_count:
+                    self.send_error(404, "PDF has no pages")
+                    return
+                if page_number >= page_count:
+                    page_number = page_count - 1
+                    key = page_cache_key(pdf_path, page_number, terms, self.zoom)
+                data = self.cache.get(key)
+                if data is None:
+                    data = render_page(pdf_path, page_number, terms, self.zoom)
+                    self.cache.put(key, data)
+        self.send_body(data, "image/png", cache=True)
+
+
+def serve(host=None, port=None):
+    """Run the review server until interrupted."""
+    host = host or config.REVIEW_SERVER_HOST
+    port = port or config.REVIEW_SERVER_PORT
+    ReviewHandler.data = ReviewData()
+    ReviewHandler.cache = PageCache(
+        config.REVIEW_PAGE_CACHE_DIR, config.REVIEW_PAGE_CACHE_MB * 1024 * 1024
+    )
+    server = ThreadingHTTPServer((host, port), ReviewHandler)
+    print(f"Review server: http://{host}:{port}/  (Ctrl+C to stop)")
+    print(
+        f"Page cache: {config.REVIEW_PAGE_CACHE_DIR} "
+        f"({len(ReviewHandler.cache.entries)} pages, limit {config.REVIEW_PAGE_CACHE_MB} MB)"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopped.")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Browse labels, extracted text and PDF pages in a web browser"
+    )
+    parser.add_argument("--host", default=None, help=f"Default: {config.REVIEW_SERVER_HOST}")
+    parser.add_argument("--port", type=int, default=None, help=f"Default: {config.REVIEW_SERVER_PORT}")
+    args = parser.parse_args()
+
+    serve(args.host, args.port)
@@ -0,0 +1,387 @@
+import os
+import sys
+import json
+import time
+import uuid
+import sqlite3
+import argparse
+import config
+import utils
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Main counts recorded with every run: {name: (metrics file, key)}
+RUN_COUNTS = {
+    "pdfs": ("extract_pdf", "total"),
+    "pdf_errors": ("extract_pdf", "errors"),
+    "pdf_images": ("extract_pdf", "images"),
+    "labels": ("verify_labels", "labels"),
+    "duplicates": ("find_duplicates", "duplicates"),
+    "verified": ("filter_verified", "verified"),
+}
+
+# Items processed by a pipeline stage, for its throughput: {stage: (metrics file, key)}.
+# "files" of an analysis is summed over its directories
+STAGE_ITEMS = {
+    "analyze_pre": ("data_summary_report_pre", "files"),
+    "analyze_post": ("data_summary_report", "files"),
+    "find_duplicates": ("find_duplicates", "labels"),
+    "extract": ("extract_pdf", "total"),
+    "verify": ("verify_labels", "labels"),
+    "filter_results": ("filter_results", "rows"),
+    "filter_verified": ("filter_verified", "labels"),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    started TEXT,
+    started_ts REAL,
+    seconds REAL,
+    peak_memory_mb REAL,
+    stages_failed INTEGER,
+    counts TEXT
+);
+CREATE TABLE IF NOT EXISTS stages (
+    run_id TEXT REFERENCES runs(run_id) ON DELETE CASCADE,
+    stage TEXT,
+    status TEXT,
+    seconds REAL,
+    items INTEGER,
+    throughput REAL,
+    PRIMARY KEY (run_id, stage)
+);
+"""
+
+
+def new_run_id():
+    """Sortable, unique run ID: <start time>-<random suffix>."""
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:4]}"
+
+
+def peak_memory_mb():
+    """Peak resident memory of this process and its finished children, None if unknown."""
+    if resource is None:
+        return None
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # ru_maxrss is in bytes on macOS, kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def stage_items(stage):
+    """Number of items the last run of a stage processed (from its metrics), or None."""
+    if stage not in STAGE_ITEMS:
+        return None
+    name, key = STAGE_ITEMS[stage]
+    metrics = utils.load_metrics(name)
+    if metrics is None:
+        return None
+    if key == "files":
+        return sum(d.get("files", 0) for d in metrics.get("directories", {}).values())
+    return metrics.get(key)
+
+
+def run_counts():
+    """Main counts of the current outputs (RUN_COUNTS), plus MISSING/SIMILAR fields."""
+    counts = {}
+    for name, (metrics_name, key) in RUN_COUNTS.items():
+        metrics = utils.load_metrics(metrics_name)
+        if metrics is not None and metrics.get(key) is not None:
+            counts[name] = metrics[key]
+    verification = utils.load_metrics("verify_labels")
+    if verification is not None:
+        statuses = verification.get("statuses", {})
+        counts["missing_fields"] = statuses.get("MISSING", 0)
+        counts["similar_fields"] = statuses.get("SIMILAR", 0)
+    return counts
+
+
+def connect(db_path=None):
+    db_path = db_path or config.RUN_HISTORY_DB
+    utils.ensure_dir_exists(os.path.dirname(db_path))
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def record_run(run_id, started_ts, results, db_path=None):
+    """
+    Save a pipeline run: per-stage status, duration and throughput, the peak
+    memory and the main counts; then apply the retention policy.
+
+    Args:
+        run_id: From new_run_id()
+        started_ts: time.time() at the start of the run
+        results: stage_runner.run_stages() result [(stage, status, seconds)]
+    """
+    if not config.RUN_HISTORY_ENABLED:
+        return
+    # Recording must never fail the pipeline: metrics files are read inside the guard
+    try:
+        stage_rows = []
+        for stage, status, seconds in results:
+            # Skipped stages did no work: their metrics belong to an earlier run
+            items = stage_items(stage) if status == "ran" else None
+            throughput = round(items / seconds, 2) if items and seconds > 0 else None
+            stage_rows.append(
+                (run_id, stage, status, round(seconds, 3), items, throughput)
+            )
+
+        conn = connect(db_path)
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        run_id,
+                        time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(started_ts)),
+                        started_ts,
+                        round(time.time() - started_ts, 3),
+                        peak_memory_mb(),
+                        sum(1 for _, status, _ in results if status == "failed"),
+                        json.dumps(run_counts()),
+                    ),
+                )
+                conn.executemany(
+                    "INSERT INTO stages VALUES (?, ?, ?, ?, ?, ?)", stage_rows
+                )
+            removed = prune(conn)
+        finally:
+            conn.close()
+        print(f"Run recorded: {run_id} (history: {config.RUN_HISTORY_DB})")
+        if removed:
+            print(f"Removed {removed} old run(s) from the history")
+    except Exception as e:
+        print(f"Error recording run history: {e}")
+
+
+def prune(conn, keep_runs=None, keep_days=None):
+    """
+    Delete runs beyond the newest keep_runs or older than keep_days
+    (defaults: RUN_HISTORY_KEEP_RUNS / RUN_HISTORY_KEEP_DAYS).
+
+    Returns:
+        Number of runs deleted
+    """
+    keep_runs = config.RUN_HISTORY_KEEP_RUNS if keep_runs is None else keep_runs
+    keep_days = config.RUN_HISTORY_KEEP_DAYS if keep_days is None else keep_days
+    with conn:
+        before = conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+        if keep_days is not None:
+            conn.execute(
+                "DELETE FROM runs WHERE started_ts < ?",
+                (time.time() - keep_days * 86400,),
+            )
+        if keep_runs is not None:
+            conn.execute(
+                "DELETE FROM runs WHERE run_id NOT IN "
+                "(SELECT run_id FROM runs ORDER BY started_ts DESC LIMIT ?)",
+                (keep_runs,),
+            )
+        after = conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+    return before - after
+
+
+def load_runs(conn, last=None):
+    """Runs as dicts (oldest first, the last `last` only), with their stages."""
+    query = (
+        "SELECT run_id, started, seconds, peak_memory_mb, stages_failed, counts "
+        "FROM runs ORDER BY started_ts DESC"
+    )
+    if last:
+        rows = conn.execute(query + " LIMIT ?", (last,)).fetchall()
+    else:
+        rows = conn.execute(query).fetchall()
+    runs = []
+    for run_id, started, seconds, peak, failed, counts in reversed(rows):
+        stages = {
+            stage: {"status": status, "seconds": s, "items": items, "throughput": tp}
+            for stage, status, s, items, tp in conn.execute(
+                "SELECT stage, status, seconds, items, throughput FROM stages "
+                "WHERE run_id = ? ORDER BY rowid",
+                (run_id,),
+            )
+        }
+        runs.append(
+            {
+                "run_id": run_id,
+                "started": started,
+                "seconds": seconds,
+                "peak_memory_mb": peak,
+                "failed": failed,
+                "counts": json.loads(counts),
+                "stages": stages,
+            }
+        )
+    return runs
+
+
+def find_run(runs, run_id):
+    """Run with this ID (or unique ID prefix), None if not found."""
+    matches = [r for r in runs if r["run_id"].startswith(run_id)]
+    return matches[0] if len(matches) == 1 else None
+
+
+def _fmt(value, suffix=""):
+    if value is None:
+        return "-"
+    return f"{value}{suffix}" if isinstance(value, int) else f"{value:.2f}{suffix}"
+
+
+def _change(old, new):
+    """Relative change old -> new as text, "" if not comparable."""
+    if not old or new is None:
+        return ""
+    return f"{(new - old) / old:+.0%}"
+
+
+def list_runs(runs):
+    print(f"{'Run':<22} | {'Started':<19} | {'Time':>9} | {'Peak MB':>8} | Failed | Counts")
+    print("-" * 100)
+    for run in runs:
+        counts = ", ".join(f"{k}={v}" for k, v in run["counts"].items())
+        print(
+            f"{run['run_id']:<22} | {run['started']:<19} | {_fmt(run['seconds'], 's'):>9} | "
+            f"{_fmt(run['peak_memory_mb']):>8} | {run['failed']:>6} | {counts}"
+        )
+
+
+def compare_runs(old, new):
+    """
+    Print stage durations and throughput of two runs side by side; stages whose
+    throughput dropped by more than RUN_HISTORY_REGRESSION are flagged.
+
+    Returns:
+        Names of the regressed stages
+    """
+    print(f"Comparing {old['run_id']} -> {new['run_id']}\n")
+    print(
+        f"{'Stage':<18} | {'Time A':>9} | {'Time B':>9} | {'Change':>7} | "
+        f"{'Items/s A':>10} | {'Items/s B':>10} | {'Change':>7}"
+    )
+    print("-" * 92)
+    regressions = []
+    for stage in list(dict.fromkeys(list(old["stages"]) + list(new["stages"]))):
+        a = old["stages"].get(stage, {})
+        b = new["stages"].get(stage, {})
+        tp_a, tp_b = a.get("throughput"), b.get("throughput")
+        flag = ""
+        if tp_a and tp_b is not None and tp_b < tp_a * (1 - config.RUN_HISTORY_REGRESSION):
+            flag = "  << REGRESSION"
+            regressions.append(stage)
+        print(
+            f"{stage:<18} | {_fmt(a.get('seconds'), 's'):>9} | {_fmt(b.get('seconds'), 's'):>9} | "
+            f"{_change(a.get('seconds'), b.get('seconds')):>7} | {_fmt(tp_a):>10} | "
+            f"{_fmt(tp_b):>10} | {_change(tp_a, tp_b):>7}{flag}"
+        )
+    print("-" * 92)
+    print(
+        f"{'Total':<18} | {_fmt(old['seconds'], 's'):>9} | {_fmt(new['seconds'], 's'):>9} | "
+        f"{_change(old['seconds'], new['seconds']):>7}"
+    )
+    print(
+        f"{'Peak memory (MB)':<18} | {_fmt(old['peak_memory_mb']):>9} | "
+        f"{_fmt(new['peak_memory_mb']):>9} | {_change(old['peak_memory_mb'], new['peak_memory_mb']):>7}"
+    )
+
+    print("\nCounts:")
+    for name in dict.fromkeys(list(old["counts"]) + list(new["counts"])):
+        a, b = old["counts"].get(name), new["counts"].get(name)
+        marker = "" if a == b else "  (changed)"
+        print(f"  {name:<16} {_fmt(a):>10} -> {_fmt(b):<10}{marker}")
+
+    if regressions:
+        print(f"\nThroughput regressions: {', '.join(regressions)}")
+    return regressions
+
+
+def show_trends(runs, stage=None):
+    """
+    Print one row per run (oldest first): total time, peak memory and the
+    throughput of every stage, or time/items/throughput of one stage.
+    """
+    if stage:
+        print(f"Stage: {stage}")
+        print(f"{'Run':<22} | {'Status':<8} | {'Time':>9} | {'Items':>9} | {'Items/s':>10}")
+        print("-" * 70)
+        for run in runs:
+            s = run["stages"].get(stage)
+            if s is None:
+                continue
+            print(
+                f"{run['run_id']:<22} | {s['status']:<8} | {_fmt(s['seconds'], 's'):>9} | "
+                f"{_fmt(s['items']):>9} | {_fmt(s['throughput']):>10}"
+            )
+        return
+
+    stages = [s for s in STAGE_ITEMS if any(s in run["stages"] for run in runs)]
+    print("Throughput in items/s ('-': stage skipped or not run)")
+    print(f"{'Run':<22} | {'Time':>9} | {'Peak MB':>8} | " + " | ".join(f"{s:>15}" for s in stages))
+    print("-" * (48 + 18 * len(stages)))
+    for run in runs:
+        values = [_fmt(run["stages"].get(s, {}).get("throughput")) for s in stages]
+        print(
+            f"{run['run_id']:<22} | {_fmt(run['seconds'], 's'):>9} | "
+            f"{_fmt(run['peak_memory_mb']):>8} | " + " | ".join(f"{v:>15}" for v in values)
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Inspect the history of main_pipeline.py runs"
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_list = sub.add_parser("list", help="List recorded runs")
+    p_list.add_argument("--last", type=int, default=20, help="Newest N runs (default 20)")
+    p_compare = sub.add_parser(
+        "compare", help="Compare two runs (default: the two newest)"
+    )
+    p_compare.add_argument("runs", nargs="*", help="Run IDs or ID prefixes: OLD NEW, or NEW")
+    p_trends = sub.add_parser("trends", help="Throughput of the last runs")
+    p_trends.add_argument("--stage", help="Show one stage in detail")
+    p_trends.add_argument("--last", type=int, default=20, help="Newest N runs (default 20)")
+    p_prune = sub.add_parser("prune", help="Apply the retention policy")
+    p_prune.add_argument("--keep-runs", type=int, default=None)
+    p_prune.add_argument("--keep-days", type=float, default=None)
+    args = parser.parse_args()
+
+    if not os.path.exists(config.RUN_HISTORY_DB):
+        print(f"No run history yet: {config.RUN_HISTORY_DB}")
+        sys.exit(1)
+
+    conn = connect()
+    try:
+        if args.command == "prune":
+            removed = prune(conn, args.keep_runs, args.keep_days)
+            print(f"Removed {removed} run(s)")
+        elif args.command == "list":
+            list_runs(load_runs(conn, args.last))
+        elif args.command == "trends":
+            show_trends(load_runs(conn, args.last), args.stage)
+        else:
+            runs = load_runs(conn)
+            if len(args.runs) > 2:
+                parser.error("compare takes at most two runs")
+            selected = [find_run(runs, r) for r in args.runs]
+            if None in selected:
+                parser.error(f"Unknown or ambiguous run: {args.runs[selected.index(None)]}")
+            # Missing runs: the newest one(s), newest last
+            if len(selected) == 1:
+                position = runs.index(selected[0])
+                selected = runs[max(0, position - 1):position] + selected
+            elif not selected:
+                selected = runs[-2:]
+            if len(selected) < 2:
+                print("Need at least two runs to compare")
+                sys.exit(1)
+            regressions = compare_runs(*selected)
+            sys.exit(2 if regressions else 0)
+    finally:
+        conn.close()
@@ -1,6 +1,6 @@
 import os
-import shutil
 import config
+import move_engine
 import utils
 
 def copy_files():
@@ -16,45 +16,51 @@ def copy_files():
 
     # 1. Identify Missing Files (In Dataset but NOT in Label)
     missing_bases = dataset_bases - label_bases
-    count_missing_moved = 0
 
     print(f"Found {len(missing_bases)} missing basenames.")
 
+    # Plan every move up front; the move engine journals them so an interrupted
+    # run can be resumed or undone (python move_engine.py list/resume/undo)
+    planned = []
+    missing_files = set()
     for base in missing_bases:
         for filename in dataset_map[base]:
-            src = os.path.join(config.DATASET_DIR, filename)
-            dst = os.path.join(config.DEST_MISSING, filename)
-            try:
-                if os.path.exists(dst):
-                    # If already copied in previous step, just delete source
-                    os.remove(src)
-                else:
-                    shutil.move(src, dst)
-                count_missing_moved += 1
-            except Exception as e:
-                print(f"Error moving {filename}: {e}")
+            missing_files.add(filename)
+            planned.append(
+                (
+                    "missing",
+                    os.path.join(config.DATASET_DIR, filename),
+                    os.path.join(config.DEST_MISSING, filename),
+                )
+            )
 
-    # 2. Identify DOCX Files in Dataset
-    count_docx_moved = 0
+    # 2. Identify DOCX Files in Dataset (not already moved as missing)
     for base, files in dataset_map.items():
         for filename in files:
-            if filename.lower().endswith('.docx'):
-                src = os.path.join(config.DATASET_DIR, filename)
-                dst = os.path.join(config.DEST_DOCX, filename)
-                
-                # Check if it's one of the missing ones we just moved?
-                # If so, it won't exist in src anymore.
-                if not os.path.exists(src):
-                    continue
+            if filename.lower().endswith(".docx") and filename not in missing_files:
+                planned.append(
+                    (
+                        "docx",
+                        os.path.join(config.DATASET_DIR, filename),
+                        os.path.join(config.DEST_DOCX, filename),
+                    )
+                )
+
+    # Existing destinations (from a previous run) are replaced by the source
+    results = move_engine.move_files(
+        [(src, dst) for _, src, dst in planned], name="separate_files"
+    )
 
-                try:
-                    if os.path.exists(dst):
-                         os.remove(src)
-                    else:
-                        shutil.move(src, dst)
-                    count_docx_moved += 1
-                except Exception as e:
-                    print(f"Error moving {filename}: {e}")
+    count_missing_moved = 0
+    count_docx_moved = 0
+    for (kind, _, _), (src, _, error) in zip(planned, results):
+        if error:
+            if not error.startswith("skipped"):
+                print(f"Error moving {os.path.basename(src)}: {error}")
+        elif kind == "missing":
+            count_missing_moved += 1
+        else:
+            count_docx_moved += 1
 
     print("-" * 50)
     print(f"Process Complete.")
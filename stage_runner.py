@@ -0,0 +1,284 @@
+import os
+import json
+import time
+import hashlib
+import inspect
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import config
+import inventory
+import utils
+
+# Files up to this size are fingerprinted by content, larger ones by size + mtime
+CONTENT_HASH_MAX_BYTES = 1024 * 1024
+
+
+class Stage:
+    """
+    One step of the pipeline.
+
+    Args:
+        name: Unique stage name
+        func: Callable run without arguments (functools.partial for arguments)
+        inputs: Files/directories the stage reads
+        outputs: Files/directories the stage writes (or moves files into/out of)
+        optional: Only run when explicitly selected
+        description: Short text for listings
+    """
+
+    def __init__(
+        self, name, func, inputs=(), outputs=(), optional=False, description=""
+    ):
+        self.name = name
+        self.func = func
+        self.inputs = [os.path.normpath(p) for p in inputs]
+        self.outputs = [os.path.normpath(p) for p in outputs]
+        self.optional = optional
+        self.description = description
+
+
+def _overlaps(paths_a, paths_b):
+    """True if a path in paths_a equals, contains or is inside a path in paths_b."""
+    for a in paths_a:
+        for b in paths_b:
+            if a == b or a.startswith(b + os.sep) or b.startswith(a + os.sep):
+                return True
+    return False
+
+
+def build_dependencies(stages):
+    """
+    Infer ordering from declared paths. A stage depends on every earlier stage that
+    writes something it reads, reads something it writes, or writes the same path.
+
+    Returns:
+        Dict {stage name: set of stage names it must wait for}
+    """
+    deps = {s.name: set() for s in stages}
+    for i, later in enumerate(stages):
+        for earlier in stages[:i]:
+            if (
+                _overlaps(earlier.outputs, later.inputs)
+                or _overlaps(earlier.inputs, later.outputs)
+                or _overlaps(earlier.outputs, later.outputs)
+            ):
+                deps[later.name].add(earlier.name)
+    return deps
+
+
+def path_signature(path, rescan=True):
+    """
+    Fingerprint of a file or directory tree; small files are hashed by content.
+    Directories use a full inventory scan if rescan (a snapshot reused by
+    directory mtime misses files rewritten in place), else an incremental one.
+    """
+    if os.path.isdir(path):
+        return "dir:" + inventory.get_inventory(path, refresh=rescan).signature()
+    if not os.path.exists(path):
+        return None
+
+    st = os.stat(path)
+    if st.st_size <= CONTENT_HASH_MAX_BYTES:
+        with open(path, "rb") as f:
+            return "sha1:" + hashlib.sha1(f.read()).hexdigest()
+    return f"stat:{st.st_size}:{st.st_mtime_ns}"
+
+
+def code_signature(func):
+    """Fingerprint of the module that implements a stage (re-run when code changes)."""
+    func = getattr(func, "func", func)  # functools.partial
+    try:
+        path = inspect.getsourcefile(func)
+        st = os.stat(path)
+        return f"{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns}"
+    except (TypeError, OSError):
+        return ""
+
+
+class SignatureCache:
+    """
+    Path fingerprints shared by the stages of one run_stages() call.
+    Each path is fingerprinted once (directories with a full scan); a finished
+    stage invalidates the paths its outputs overlap, which are then refreshed
+    with an incremental scan of the shared inventory.
+    """
+
+    def __init__(self):
+        self._signatures = {}
+        self._scanned = set()
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        with self._lock:
+            if path not in self._signatures:
+                self._signatures[path] = path_signature(
+                    path, rescan=path not in self._scanned
+                )
+                self._scanned.add(path)
+            return self._signatures[path]
+
+    def invalidate(self, outputs):
+        with self._lock:
+            for path in list(self._signatures):
+                if _overlaps([path], outputs):
+                    del self._signatures[path]
+
+
+def stage_signature(stage, signatures=None):
+    """
+    Code, input and output fingerprints of a stage. Outputs that are also inputs
+    (directories a stage moves files out of) are covered by the inputs; outputs
+    a run did not create are recorded as None.
+    """
+    get = signatures.get if signatures is not None else path_signature
+    return {
+        "code": code_signature(stage.func),
+        "inputs": {p: get(p) for p in stage.inputs},
+        "outputs": {
+            p: get(p) for p in stage.outputs if not _overlaps([p], stage.inputs)
+        },
+    }
+
+
+def load_state(state_path):
+    if not os.path.exists(state_path):
+        return {}
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Warning: ignoring unreadable pipeline state {state_path}: {e}")
+        return {}
+
+
+def save_state(state, state_path):
+    utils.ensure_dir_exists(os.path.dirname(state_path))
+    tmp_path = state_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, state_path)
+
+
+def is_up_to_date(stage, state, signatures=None):
+    """
+    True if the stage ran successfully before and its code, inputs and outputs
+    are unchanged since then (a deleted or edited output runs it again).
+    """
+    previous = state.get(stage.name)
+    if not previous or previous.get("status") != "ok":
+        return False
+    return previous.get("signature") == stage_signature(stage, signatures)
+
+
+def run_stages(stages, selected=None, force=False, jobs=1, state_path=None):
+    """
+    Run stages in dependency order, concurrently where they are independent,
+    skipping stages that are up to date.
+
+    Args:
+        stages: List of Stage in declaration order
+        selected: Names of stages to run (default: all non-optional stages)
+        force: Run even if up to date
+        jobs: Maximum stages running at the same time
+        state_path: JSON file recording signatures and timings
+
+    Returns:
+        List of (name, status, seconds); status is "ran", "skipped", "failed" or "blocked"
+    """
+    state_path = state_path or config.PIPELINE_STATE_FILE
+    if selected is None:
+        selected = [s.name for s in stages if not s.optional]
+    unknown = set(selected) - {s.name for s in stages}
+    if unknown:
+        raise ValueError(f"Unknown stage(s): {', '.join(sorted(unknown))}")
+
+    stages = [s for s in stages if s.name in selected]
+    deps = build_dependencies(stages)
+    by_name = {s.name: s for s in stages}
+    state = load_state(state_path)
+    state_lock = threading.Lock()
+    signatures = SignatureCache()
+
+    results = {}
+    pending = [s.name for s in stages]
+    running = {}
+
+    def execute(stage):
+        if not force and is_up_to_date(stage, state, signatures):
+            print(f"\n[{stage.name}] Up to date, skipping.")
+            return "skipped", 0.0
+
+        print(f"\n[{stage.name}] {stage.description or 'Running...'}")
+        start = time.perf_counter()
+        try:
+            stage.func()
+        finally:
+            # Also after a failure: the stage may have written part of its outputs
+            signatures.invalidate(stage.outputs)
+        duration = time.perf_counter() - start
+
+        # Inputs are fingerprinted after the run: stages that also write their
+        # inputs (file moves) are then up to date on the next run
+        record = {
+            "status": "ok",
+            "signature": stage_signature(stage, signatures),
+            "duration": round(duration, 3),
+            "finished": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        with state_lock:
+            state[stage.name] = record
+            save_state(state, state_path)
+        return "ran", duration
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        while pending or running:
+            for name in list(pending):
+                finished = [d for d in deps[name] if d in results]
+                if any(results[d][0] in ("failed", "blocked") for d in finished):
+                    results[name] = ("blocked", 0.0)
+                    pending.remove(name)
+                elif all(d in results for d in deps[name]):
+                    pending.remove(name)
+                    running[pool.submit(execute, by_name[name])] = name
+
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    print(f"\n[{name}] FAILED: {e}")
+                    results[name] = ("failed", 0.0)
+                    with state_lock:
+                        state[name] = {"status": "failed", "error": str(e)}
+                        save_state(state, state_path)
+
+    return [(s.name,) + results[s.name] for s in stages]
+
+
+def print_timings(results):
+    """Print a per-stage status and timing table."""
+    print("\n" + "=" * 60)
+    print(f"{'Stage':<22} | {'Status':<8} | {'Time'}")
+    print("-" * 60)
+    total = 0.0
+    for name, status, seconds in results:
+        total += seconds
+        print(f"{name:<22} | {status:<8} | {seconds:.2f}s")
+    print("-" * 60)
+    print(f"{'Total':<22} | {'':<8} | {total:.2f}s")
+    print("=" * 60)
+
+
+def list_stages(stages):
+    """Print the stage graph (name, dependencies, description)."""
+    deps = build_dependencies(stages)
+    for s in stages:
+        flag = " (optional)" if s.optional else ""
+        after = ", ".join(sorted(deps[s.name])) or "-"
+        print(f"{s.name:<22} after: {after}{flag}")
+        if s.description:
+            print(f"{'':<22} {s.description}")
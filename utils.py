@@ -1,6 +1,21 @@
 import os
 import re
+import json
+import argparse
+import time
+import zlib
+import itertools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import config
+import inventory
+
+# Optional fast JSON parser (pip install orjson)
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Month dictionary for parsing dates in format "DD Mon YYYY"
 MONTH_DICT = {
@@ -158,6 +173,7 @@ def get_files_map(directory):
     Scans a directory and returns a dictionary mapping basenames (no extension)
     to a list of full filenames.
     Example: {'report': ['report.pdf', 'report.docx']}
+    Uses the shared file inventory, so repeated calls do not rescan the directory.
     """
     files_map = {}
     if not os.path.exists(directory):
@@ -165,13 +181,10 @@ def get_files_map(directory):
         return files_map
 
     try:
-        for f in os.listdir(directory):
-            full_path = os.path.join(directory, f)
-            if os.path.isfile(full_path):
-                base_name = os.path.splitext(f)[0]
-                if base_name not in files_map:
-                    files_map[base_name] = []
-                files_map[base_name].append(f)
+        for entry in inventory.get_inventory(directory).files(recursive=False):
+            if entry.base not in files_map:
+                files_map[entry.base] = []
+            files_map[entry.base].append(entry.name)
     except Exception as e:
         print(f"Error reading {directory}: {e}")
     return files_map
@@ -188,6 +201,33 @@ def read_file(path):
         return f"[Error reading {path}: {e}]"
 
 
+def copy_text(path, out, chunk_size=1024 * 1024):
+    """
+    Streams a text file into an open file object, stripped like read_file(),
+    without loading it into memory.
+
+    Returns:
+        Number of characters written
+    """
+    if not os.path.exists(path):
+        return out.write(f"[Error: File not found - {path}]")
+    written = 0
+    pending = ""  # trailing whitespace, written only if more text follows
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for chunk in iter(lambda: f.read(chunk_size), ""):
+                if not written and not pending:
+                    chunk = chunk.lstrip()
+                data = pending + chunk
+                text = data.rstrip()
+                pending = data[len(text):]
+                if text:
+                    written += out.write(text)
+    except Exception as e:
+        written += out.write(f"[Error reading {path}: {e}]")
+    return written
+
+
 def ensure_dir_exists(directory):
     """Creates the directory if it does not exist."""
     if not os.path.exists(directory):
@@ -204,17 +244,217 @@ def list_files_recursive(directory, extension):
     """
     List files with specific extension recursively (all levels).
     Returns matched files with relative paths from the directory.
+    Uses the shared file inventory, so repeated calls do not rescan the directory.
     """
-    files = []
     if not os.path.exists(directory):
-        return files
-
-    for root, dirs, filenames in os.walk(directory):
-        for filename in filenames:
-            if filename.lower().endswith(extension.lower()):
-                # Get full path
-                full_path = os.path.join(root, filename)
-                # Get relative path from valid directory
-                rel_path = os.path.relpath(full_path, directory)
-                files.append(rel_path)
-    return files
+        return []
+
+    return [e.rel_path for e in inventory.get_inventory(directory).files(extension)]
+
+
+def file_indexes():
+    """
+    Name indexes of the review files, from the inventories of the dataset,
+    extracted text and label directories. The inventories are cached on disk
+    and rescanned only where a directory mtime changed, so building the
+    indexes does not walk the dataset.
+
+    Returns:
+        Dict {"pdf"|"txt"|"json": {base name: [paths]}}
+    """
+    return {
+        kind: inventory.get_inventory(directory).by_base("." + kind)
+        for kind, directory in (
+            ("pdf", config.DATASET_DIR),
+            ("txt", config.EXTRACTED_TEXT_DIR),
+            ("json", config.LABEL_DIR),
+        )
+    }
+
+
+def locate_files(base_name, indexes=None):
+    """
+    Finds the files of a document by base name (no extension).
+
+    Args:
+        base_name: File name without extension
+        indexes: Result of file_indexes(), to resolve many names with one snapshot
+
+    Returns:
+        Dict {"pdf": [paths], "txt": [paths], "json": [paths]} (empty lists if not found)
+    """
+    indexes = indexes or file_indexes()
+    return {kind: index.get(base_name, []) for kind, index in indexes.items()}
+
+
+def load_json(path):
+    """
+    Reads and parses a JSON file.
+    Uses orjson when installed and config.JSON_PARSER allows it; falls back to the
+    standard json module for documents orjson rejects (e.g. NaN, huge integers),
+    so results and error messages match json.load.
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+
+    if orjson is not None and config.JSON_PARSER != "json":
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            pass
+
+    return json.loads(raw.decode("utf-8"))
+
+
+def prefetch(func, items, depth=8, workers=None):
+    """
+    Yields func(item) for every item, in order, while the next `depth` items are
+    already being processed on a background thread pool.
+    Use it to hide file I/O latency behind CPU work done on each result.
+
+    Args:
+        func: Function called with one item (runs on worker threads)
+        items: Iterable of items
+        depth: Number of items read ahead (<= 0 disables prefetching)
+        workers: Thread pool size (default: depth)
+    """
+    if depth <= 0:
+        for item in items:
+            yield func(item)
+        return
+
+    items = iter(items)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers or depth) as pool:
+        for item in itertools.islice(items, depth):
+            pending.append(pool.submit(func, item))
+
+        while pending:
+            future = pending.popleft()
+            for item in itertools.islice(items, 1):
+                pending.append(pool.submit(func, item))
+            yield future.result()
+
+
+def parse_shard(spec):
+    """
+    Parses a shard specification "i/N" (1-based, e.g. "2/4").
+
+    Returns:
+        Tuple of (index, count), or None if spec is empty
+
+    Raises:
+        ValueError: If spec is malformed or index is outside 1..N
+    """
+    if not spec:
+        return None
+    try:
+        index, count = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard '{spec}', expected i/N (e.g. 1/4)")
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Invalid shard '{spec}', index must be between 1 and N")
+    return index, count
+
+
+def shard_arg(spec):
+    """parse_shard() for argparse type=: errors keep their "expected i/N" message."""
+    try:
+        return parse_shard(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def in_shard(filename, shard):
+    """
+    True if filename belongs to shard (index, count); always True if shard is None.
+    Files are assigned by a stable hash (CRC32) of their path without extension,
+    so a PDF, its label and its extracted text always land in the same shard,
+    on every machine and every run.
+    """
+    if shard is None:
+        return True
+    index, count = shard
+    base = os.path.splitext(filename)[0].replace("\\", "/")
+    return zlib.crc32(base.encode("utf-8")) % count == index - 1
+
+
+def shard_path(path, shard):
+    """
+    Partial output path of a shard: <SHARD_DIR>/<name>.shard<i>of<N><ext>.
+    Returns path unchanged if shard is None.
+    """
+    if shard is None:
+        return path
+    index, count = shard
+    name, ext = os.path.splitext(os.path.basename(path))
+    return os.path.join(config.SHARD_DIR, f"{name}.shard{index}of{count}{ext}")
+
+
+def metrics_path(name):
+    """Metrics file of a stage: <METRICS_DIR>/<name>.json."""
+    return os.path.join(config.METRICS_DIR, f"{name}.json")
+
+
+def source_signature(path):
+    """(size, mtime_ns) of a file as text, or None if missing."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+def write_metrics(name, metrics, started=None, sources=()):
+    """
+    Save the machine-readable summary of a stage (counts, output paths), read by
+    generate_final_reports.py instead of re-parsing the text reports.
+
+    Args:
+        name: Stage name (file name of the metrics)
+        metrics: JSON-serializable dict
+        started: time.perf_counter() value at the start of the stage, to record
+            its duration
+        sources: Output files the counts describe; their signatures are recorded
+            so readers can tell when the files changed after the stage (see
+            metrics_current)
+    """
+    record = dict(metrics)
+    record["finished"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    if started is not None:
+        record["seconds"] = round(time.perf_counter() - started, 3)
+    if sources:
+        record["sources"] = {p: source_signature(p) for p in sources}
+    path = metrics_path(name)
+    tmp_path = path + ".tmp"
+    try:
+        ensure_dir_exists(config.METRICS_DIR)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"Warning: could not save metrics {path}: {e}")
+
+
+def metrics_current(metrics):
+    """
+    True if the metrics record their source files and none changed since (a
+    later run, watch mode or a failed stage may have rewritten them).
+    """
+    sources = metrics.get("sources")
+    if not isinstance(sources, dict) or not sources:
+        return False
+    return all(source_signature(p) == sig for p, sig in sources.items())
+
+
+def load_metrics(name):
+    """Returns the metrics dict of a stage, or None if it has not written any."""
+    path = metrics_path(name)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Warning: ignoring unreadable metrics {path}: {e}")
+        return None
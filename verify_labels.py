@@ -1,9 +1,14 @@
 import os
 import json
+import time
 import difflib
 import csv
-import shutil
+import argparse
+import itertools
+from collections import Counter
 import config
+import materialize
+import results_db
 import utils
 
 # Fields that should use date-specific matching logic
@@ -18,6 +23,58 @@ DATE_RELATED_FIELDS = [
 # Fields that should use percentage normalization (handle "7%" vs "7 %")
 PERCENTAGE_FIELDS = ["tax type", "tax rate", "gst", "vat", "gst rate"]
 
+# Per-shard counters and JSON errors, combined by merge_shards.py
+SHARD_SUMMARY = os.path.join(config.SHARD_DIR, "verify_labels_summary.json")
+
+# Columns of label_verification.csv
+RESULT_FIELDNAMES = [
+    "Filename",
+    "Key",
+    "Value",
+    "Status",
+    "Score",
+    "BestMatchLine",
+    "DateFormat",
+    "ContextLine",
+]
+
+# Columns of label_verification_verdicts.csv (one row per label)
+VERDICT_FIELDNAMES = [
+    "Filename",
+    "Total",
+    "Found",
+    "Similar",
+    "Missing",
+    "CheckDate",
+    "NA",
+    "Verdict",
+]
+
+# Statuses that count as verified (explicit check)
+ACCEPTED_STATUSES = [
+    "FOUND",
+    "FOUND_DATE_ALT_FORMAT",
+    "FOUND_CASE_INSENSITIVE",
+    "FOUND_NORMALIZED",
+    "CHECK_DATE",
+    # "FOUND_NUMERIC_FORMAT",
+]
+
+# Any of these makes a label need review; N/A (empty fields) is not an issue
+ISSUE_STATUSES = ["MISSING", "SIMILAR"]
+
+
+def new_stats():
+    """Returns a fresh set of verification counters."""
+    return {
+        "Total Fields": 0,
+        "Found": 0,
+        "Similar": 0,
+        "Missing": 0,
+        "Date Fields": 0,
+        "Date Alt Format Found": 0,
+    }
+
 
 def flatten_json(y):
     out = {}
@@ -517,6 +574,188 @@ def get_best_match(value, text_content, field_name=""):
     return "MISSING", best_ratio, best_line, date_format if is_date_valid else "", ""
 
 
+def load_label_pair(json_filename):
+    """
+    Reads and parses a JSON label and its extracted text (runs on prefetch threads).
+
+    Returns:
+        Tuple of (json_filename, data, text_content, error).
+        error is the exception raised while reading the JSON, otherwise None.
+        text_content is "" when the text file is missing or unreadable.
+    """
+    json_path = os.path.join(config.LABEL_DIR, json_filename)
+    txt_path = os.path.join(
+        config.EXTRACTED_TEXT_DIR, os.path.splitext(json_filename)[0] + ".txt"
+    )
+
+    try:
+        data = utils.load_json(json_path)
+    except Exception as e:
+        return json_filename, None, "", e
+
+    text_content = utils.read_file(txt_path)
+    if text_content.startswith("[Error"):
+        # If text extracted failed or file missing, mark all as missing
+        text_content = ""
+
+    return json_filename, data, text_content, None
+
+
+def verify_label_data(json_filename, data, text_content, stats):
+    """
+    Match every non-empty field of a parsed label against the extracted text.
+
+    Args:
+        json_filename: Label filename (used in result rows)
+        data: Parsed JSON label
+        text_content: Extracted PDF text
+        stats: Dict of counters updated in place
+
+    Returns:
+        List of result rows for label_verification.csv
+    """
+    results = []
+
+    # Flatten JSON to get all values
+    flat_data = flatten_json(data)
+
+    for key, value in flat_data.items():
+        if value is None or str(value).strip() == "":
+            continue  # Skip empty fields
+
+        stats["Total Fields"] += 1
+
+        # Use enhanced date-aware matching (pass key for date-specific logic)
+        status, score, match_text, date_format, context_line = get_best_match(
+            value, text_content, key
+        )
+
+        # Track date fields
+        if date_format:
+            stats["Date Fields"] += 1
+
+        if "FOUND" in status:
+            stats["Found"] += 1
+            if status == "FOUND_DATE_ALT_FORMAT":
+                stats["Date Alt Format Found"] += 1
+        elif status == "SIMILAR":
+            stats["Similar"] += 1
+        else:
+            stats["Missing"] += 1
+
+        results.append(
+            {
+                "Filename": json_filename,
+                "Key": key,
+                "Value": str(value),
+                "Status": status,
+                "Score": f"{score:.2f}",
+                "BestMatchLine": match_text if status != "FOUND" else "",
+                "DateFormat": date_format,
+                "ContextLine": context_line,
+            }
+        )
+
+    return results
+
+
+def file_verdict(json_filename, rows):
+    """
+    Per-label verdict row: status counts and "VERIFIED" if at least one field
+    has an accepted status and none is MISSING or SIMILAR, else "REVIEW".
+    """
+    counts = Counter(row["Status"] for row in rows)
+    accepted = sum(counts[s] for s in ACCEPTED_STATUSES)
+    issues = sum(counts[s] for s in ISSUE_STATUSES)
+    return {
+        "Filename": json_filename,
+        "Total": len(rows),
+        "Found": sum(v for k, v in counts.items() if "FOUND" in k),
+        "Similar": counts["SIMILAR"],
+        "Missing": counts["MISSING"],
+        "CheckDate": counts["CHECK_DATE"],
+        "NA": counts["N/A"],
+        "Verdict": "VERIFIED" if accepted and not issues else "REVIEW",
+    }
+
+
+def file_verdicts(rows):
+    """
+    Yields file_verdict() for each run of consecutive rows of one label (the
+    layout of label_verification.csv).
+    """
+    for json_filename, group in itertools.groupby(rows, key=lambda r: r["Filename"]):
+        yield file_verdict(json_filename, list(group))
+
+
+def verdicts_current():
+    """True if the verdict table exists and was written after the results CSV."""
+    try:
+        verdicts_mtime = os.stat(config.VERIFY_VERDICTS_CSV).st_mtime_ns
+        return verdicts_mtime >= os.stat(config.VERIFY_REPORT_CSV).st_mtime_ns
+    except OSError:
+        return False
+
+
+def write_verdicts(verdicts, append=False):
+    """Write (or append) verdict rows to config.VERIFY_VERDICTS_CSV."""
+    path = config.VERIFY_VERDICTS_CSV
+    new_file = not append or not os.path.exists(path) or os.path.getsize(path) == 0
+    with open(path, "w" if new_file else "a", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=VERDICT_FIELDNAMES)
+        if new_file:
+            writer.writeheader()
+        writer.writerows(verdicts)
+
+
+def materialize_review_files(json_filenames, dest_dir, include_pdf=True):
+    """
+    Place JSON labels (and their PDFs) into a review folder.
+    Uses reflinks where possible (see materialize.py)
+    and records every placement in <dest_dir>/manifest.csv.
+
+    Args:
+        json_filenames: Label filenames relative to LABEL_DIR
+        dest_dir: Review folder
+        include_pdf: Also place the matching PDF from DATASET_DIR
+
+    Returns:
+        Dict {json_filename: [note, ...]} with per-file problems for the report
+    """
+    jobs = []
+    owners = []
+    notes = {name: [] for name in json_filenames}
+
+    for json_filename in json_filenames:
+        src_json = os.path.join(config.LABEL_DIR, json_filename)
+        if os.path.exists(src_json) or not include_pdf:
+            jobs.append((src_json, os.path.join(dest_dir, json_filename)))
+            owners.append((json_filename, "JSON"))
+
+        if include_pdf:
+            pdf_filename = os.path.splitext(json_filename)[0] + ".pdf"
+            src_pdf = os.path.join(config.DATASET_DIR, pdf_filename)
+            if os.path.exists(src_pdf):
+                jobs.append((src_pdf, os.path.join(dest_dir, pdf_filename)))
+                owners.append((json_filename, "PDF"))
+            else:
+                notes[json_filename].append(f"[PDF không tồn tại: {pdf_filename}]")
+
+    results = materialize.materialize_files(
+        jobs, manifest_path=os.path.join(dest_dir, "manifest.csv")
+    )
+    print(f"  Materialized {len(results)} files ({materialize.summarize(results)})")
+
+    for (json_filename, kind), (_, _, _, error) in zip(owners, results):
+        if error:
+            if include_pdf:
+                notes[json_filename].append(f"[Lỗi copy {kind}: {error}]")
+            else:
+                notes[json_filename].append(error)
+
+    return notes
+
+
 def check_file_consistency():
     """
     Check consistency between JSON labels and PDF datasets.
@@ -591,11 +830,20 @@ def check_file_consistency():
     print("=" * 70 + "\n")
 
 
-def verify_labels():
+def verify_labels(shard=None):
+    """
+    Verify every JSON label against its extracted text.
+
+    Args:
+        shard: Optional (index, count); only labels of that shard are verified and
+            only the partial CSV + summary are written (see merge_shards.py)
+    """
     print(">>> STARTING LABEL VERIFICATION")
+    started = time.perf_counter()
 
-    # Check file consistency first
-    check_file_consistency()
+    # Check file consistency first (whole dataset: done by the merge when sharded)
+    if not shard:
+        check_file_consistency()
 
     # Ensure review dir exists
     utils.ensure_dir_exists(config.REVIEW_DIR)
@@ -607,6 +855,9 @@ def verify_labels():
 
     # Use recursive list
     json_files = utils.list_files_recursive(config.LABEL_DIR, ".json")
+    if shard:
+        json_files = [f for f in json_files if utils.in_shard(f, shard)]
+        print(f"Shard {shard[0]}/{shard[1]}")
 
     total_files = len(json_files)
     print(f"Found {total_files} JSON label files.")
@@ -614,80 +865,76 @@ def verify_labels():
     results = []
     json_errors = []  # Track JSON files with parsing errors
 
-    stats = {
-        "Total Fields": 0,
-        "Found": 0,
-        "Similar": 0,
-        "Missing": 0,
-        "Date Fields": 0,
-        "Date Alt Format Found": 0,
-    }
-
-    for i, json_filename in enumerate(json_files):
-        json_path = os.path.join(config.LABEL_DIR, json_filename)
-        base_name = os.path.splitext(json_filename)[0]
-        txt_filename = base_name + ".txt"
-        txt_path = os.path.join(config.EXTRACTED_TEXT_DIR, txt_filename)
+    stats = new_stats()
 
-        # Read JSON
-        try:
-            with open(json_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-        except Exception as e:
-            error_msg = f"Error reading JSON {json_filename}: {e}"
+    # Labels and texts are read on background threads while the current one is matched
+    loaded = utils.prefetch(
+        load_label_pair, json_files, depth=config.VERIFY_PREFETCH_DEPTH
+    )
+    for i, (json_filename, data, text_content, error) in enumerate(loaded):
+        if error is not None:
+            error_msg = f"Error reading JSON {json_filename}: {error}"
             print(error_msg)
-            json_errors.append({"Filename": json_filename, "Error": str(e)})
+            json_errors.append({"Filename": json_filename, "Error": str(error)})
             continue
 
-        # Read Text
-        text_content = utils.read_file(txt_path)
-        if text_content.startswith("[Error"):
-            # If text extracted failed or file missing, mark all as missing
-            text_content = ""
+        results.extend(verify_label_data(json_filename, data, text_content, stats))
 
-        # Flatten JSON to get all values
-        flat_data = flatten_json(data)
+        if (i + 1) % 100 == 0:
+            print(f"Processed {i + 1}/{total_files} labels...")
 
-        for key, value in flat_data.items():
-            if value is None or str(value).strip() == "":
-                continue  # Skip empty fields
+    if shard:
+        write_shard_outputs(shard, results, json_errors, total_files, stats)
+    else:
+        write_verification_outputs(
+            results, json_errors, total_files, stats, started=started
+        )
 
-            stats["Total Fields"] += 1
 
-            # Use enhanced date-aware matching (pass key for date-specific logic)
-            status, score, match_text, date_format, context_line = get_best_match(
-                value, text_content, key
-            )
+def write_shard_outputs(shard, results, json_errors, total_files, stats):
+    """
+    Write the partial outputs of one shard: its verification CSV and a JSON
+    summary (counters, JSON errors). Review folders and reports are produced
+    once for all shards by merge_shards.py.
+    """
+    utils.ensure_dir_exists(config.SHARD_DIR)
+    csv_path = utils.shard_path(config.VERIFY_REPORT_CSV, shard)
+    try:
+        with open(csv_path, "w", newline="", encoding="utf-8") as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=RESULT_FIELDNAMES)
+            writer.writeheader()
+            writer.writerows(results)
+        print(f"Shard verification CSV saved to: {csv_path}")
+    except Exception as e:
+        print(f"Error writing CSV report: {e}")
 
-            # Track date fields
-            if date_format:
-                stats["Date Fields"] += 1
+    summary_path = utils.shard_path(SHARD_SUMMARY, shard)
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"total": total_files, "stats": stats, "json_errors": json_errors},
+            f,
+            ensure_ascii=False,
+            indent=2,
+        )
+    print(f"Shard summary saved to: {summary_path}")
 
-            if "FOUND" in status:
-                stats["Found"] += 1
-                if status == "FOUND_DATE_ALT_FORMAT":
-                    stats["Date Alt Format Found"] += 1
-            elif status == "SIMILAR":
-                stats["Similar"] += 1
-            else:
-                stats["Missing"] += 1
-
-            results.append(
-                {
-                    "Filename": json_filename,
-                    "Key": key,
-                    "Value": str(value),
-                    "Status": status,
-                    "Score": f"{score:.2f}",
-                    "BestMatchLine": match_text if status != "FOUND" else "",
-                    "DateFormat": date_format,
-                    "ContextLine": context_line,
-                }
-            )
 
-        if (i + 1) % 100 == 0:
-            print(f"Processed {i + 1}/{total_files} labels...")
+def write_verification_outputs(
+    results, json_errors, total_files, stats, write_csv=True, started=None
+):
+    """
+    Write everything verify_labels produces from the collected results:
+    JSON error report, check_for_* review folders and reports, CSV and TXT summary.
 
+    Args:
+        results: Result rows (see verify_label_data)
+        json_errors: List of {"Filename", "Error"} for unparsable labels
+        total_files: Number of label files processed
+        stats: Counters from verify_label_data
+        write_csv: False if the caller already streamed the rows to VERIFY_REPORT_CSV
+            (the CSV must be complete: the results database records its signature)
+        started: perf_counter() at the start of the run, for the metrics duration
+    """
     # Analyze results to find files with MISSING, N/A, or SIMILAR status
     files_with_missing = set()
     files_with_na = set()
@@ -704,14 +951,20 @@ def verify_labels():
         elif status == "SIMILAR":
             files_with_similar.add(filename)
 
-    # Write JSON Error Report and copy error files to check_for folder
+    # Write JSON Error Report and place error files in check_for folder
     json_error_report = os.path.join(config.REVIEW_DIR, "json_parsing_errors.txt")
     check_for_dir = os.path.join(config.REVIEW_DIR, "check_for")
 
     try:
+        notes = {}
         # Create check_for directory if there are errors
         if json_errors:
             utils.ensure_dir_exists(check_for_dir)
+            notes = materialize_review_files(
+                [error_info["Filename"] for error_info in json_errors],
+                check_for_dir,
+                include_pdf=False,
+            )
 
         with open(json_error_report, "w", encoding="utf-8") as f:
             f.write("DANH SÁCH FILE JSON BỊ LỖI KHI PARSE\n")
@@ -729,15 +982,8 @@ def verify_labels():
                 for idx, error_info in enumerate(json_errors, 1):
                     f.write(f"{idx}. {error_info['Filename']}\n")
                     f.write(f"   Lỗi: {error_info['Error']}\n\n")
-
-                    # Copy error file to check_for folder
-                    try:
-                        src = os.path.join(config.LABEL_DIR, error_info["Filename"])
-                        dst = os.path.join(check_for_dir, error_info["Filename"])
-                        utils.ensure_dir_exists(os.path.dirname(dst))
-                        shutil.copy2(src, dst)
-                    except Exception as copy_error:
-                        f.write(f"   [Không thể copy file: {copy_error}]\n\n")
+                    for note in notes.get(error_info["Filename"], []):
+                        f.write(f"   [Không thể copy file: {note}]\n\n")
             else:
                 f.write("Không có file JSON nào bị lỗi.\n")
 
@@ -747,170 +993,90 @@ def verify_labels():
     except Exception as e:
         print(f"Error writing JSON error report: {e}")
 
-    # Copy MISSING, N/A, and SIMILAR files to separate folders
-    missing_dir = os.path.join(config.REVIEW_DIR, "check_for_missing")
-    na_dir = os.path.join(config.REVIEW_DIR, "check_for_na")
-    similar_dir = os.path.join(config.REVIEW_DIR, "check_for_similar")
+    # Place MISSING, N/A, and SIMILAR files in separate folders
+    review_folders = [
+        (
+            "MISSING",
+            files_with_missing,
+            os.path.join(config.REVIEW_DIR, "check_for_missing"),
+            os.path.join(config.REVIEW_DIR, "missing_files_report.txt"),
+            ["DANH SÁCH FILE CÓ TRƯỜNG DỮ LIỆU MISSING"],
+        ),
+        (
+            "N/A",
+            files_with_na,
+            os.path.join(config.REVIEW_DIR, "check_for_na"),
+            os.path.join(config.REVIEW_DIR, "na_files_report.txt"),
+            ["DANH SÁCH FILE CÓ TRƯỜNG DỮ LIỆU N/A"],
+        ),
+        (
+            "SIMILAR",
+            files_with_similar,
+            os.path.join(config.REVIEW_DIR, "check_for_similar"),
+            os.path.join(config.REVIEW_DIR, "similar_files_report.txt"),
+            [
+                "DANH SÁCH FILE CÓ TRƯỜNG DỮ LIỆU SIMILAR (Tương đồng > 80%)",
+                "Lưu ý: Các file này có độ tương đồng > 60% nhưng không khớp chính xác.",
+                "Cần kiểm tra để xác nhận dữ liệu có đúng hay không.",
+            ],
+        ),
+    ]
 
-    # Process MISSING files
-    if files_with_missing:
-        utils.ensure_dir_exists(missing_dir)
-        print(f"\nCopying {len(files_with_missing)} files with MISSING status...")
+    for status_name, filenames, dest_dir, report_path, header in review_folders:
+        if not filenames:
+            continue
 
-        missing_report = os.path.join(config.REVIEW_DIR, "missing_files_report.txt")
-        with open(missing_report, "w", encoding="utf-8") as f:
-            f.write("DANH SÁCH FILE CÓ TRƯỜNG DỮ LIỆU MISSING\n")
-            f.write("=" * 70 + "\n")
-            f.write(f"Tổng số file: {len(files_with_missing)}\n")
-            f.write(f"Đã copy vào: {missing_dir}\n")
-            f.write("=" * 70 + "\n\n")
+        utils.ensure_dir_exists(dest_dir)
+        print(f"\nCopying {len(filenames)} files with {status_name} status...")
 
-            for idx, json_filename in enumerate(sorted(files_with_missing), 1):
-                f.write(f"{idx}. {json_filename}\n")
+        sorted_files = sorted(filenames)
+        notes = materialize_review_files(sorted_files, dest_dir)
 
-                # Copy JSON file
-                try:
-                    src_json = os.path.join(config.LABEL_DIR, json_filename)
-                    dst_json = os.path.join(missing_dir, json_filename)
-                    if os.path.exists(src_json):
-                        utils.ensure_dir_exists(os.path.dirname(dst_json))
-                        shutil.copy2(src_json, dst_json)
-                except Exception as e:
-                    f.write(f"   [Lỗi copy JSON: {e}]\n")
-
-                # Copy corresponding PDF file
-                try:
-                    base_name = os.path.splitext(json_filename)[0]
-                    pdf_filename = base_name + ".pdf"
-                    src_pdf = os.path.join(config.DATASET_DIR, pdf_filename)
-                    dst_pdf = os.path.join(missing_dir, pdf_filename)
-
-                    if os.path.exists(src_pdf):
-                        utils.ensure_dir_exists(os.path.dirname(dst_pdf))
-                        shutil.copy2(src_pdf, dst_pdf)
-                    else:
-                        f.write(f"   [PDF không tồn tại: {pdf_filename}]\n")
-                except Exception as e:
-                    f.write(f"   [Lỗi copy PDF: {e}]\n")
-
-        print(f"MISSING files report saved to: {missing_report}")
-        print(f"MISSING files copied to: {missing_dir}")
-
-    # Process N/A files
-    if files_with_na:
-        utils.ensure_dir_exists(na_dir)
-        print(f"\nCopying {len(files_with_na)} files with N/A status...")
-
-        na_report = os.path.join(config.REVIEW_DIR, "na_files_report.txt")
-        with open(na_report, "w", encoding="utf-8") as f:
-            f.write("DANH SÁCH FILE CÓ TRƯỜNG DỮ LIỆU N/A\n")
+        with open(report_path, "w", encoding="utf-8") as f:
+            f.write(header[0] + "\n")
             f.write("=" * 70 + "\n")
-            f.write(f"Tổng số file: {len(files_with_na)}\n")
-            f.write(f"Đã copy vào: {na_dir}\n")
-            f.write("=" * 70 + "\n\n")
-
-            for idx, json_filename in enumerate(sorted(files_with_na), 1):
-                f.write(f"{idx}. {json_filename}\n")
-
-                # Copy JSON file
-                try:
-                    src_json = os.path.join(config.LABEL_DIR, json_filename)
-                    dst_json = os.path.join(na_dir, json_filename)
-                    if os.path.exists(src_json):
-                        utils.ensure_dir_exists(os.path.dirname(dst_json))
-                        shutil.copy2(src_json, dst_json)
-                except Exception as e:
-                    f.write(f"   [Lỗi copy JSON: {e}]\n")
-
-                # Copy corresponding PDF file
-                try:
-                    base_name = os.path.splitext(json_filename)[0]
-                    pdf_filename = base_name + ".pdf"
-                    src_pdf = os.path.join(config.DATASET_DIR, pdf_filename)
-                    dst_pdf = os.path.join(na_dir, pdf_filename)
-
-                    if os.path.exists(src_pdf):
-                        utils.ensure_dir_exists(os.path.dirname(dst_pdf))
-                        shutil.copy2(src_pdf, dst_pdf)
-                    else:
-                        f.write(f"   [PDF không tồn tại: {pdf_filename}]\n")
-                except Exception as e:
-                    f.write(f"   [Lỗi copy PDF: {e}]\n")
-
-        print(f"N/A files report saved to: {na_report}")
-        print(f"N/A files copied to: {na_dir}")
-
-    # Process SIMILAR files
-    if files_with_similar:
-        utils.ensure_dir_exists(similar_dir)
-        print(f"\nCopying {len(files_with_similar)} files with SIMILAR status...")
-
-        similar_report = os.path.join(config.REVIEW_DIR, "similar_files_report.txt")
-        with open(similar_report, "w", encoding="utf-8") as f:
-            f.write("DANH SÁCH FILE CÓ TRƯỜNG DỮ LIỆU SIMILAR (Tương đồng > 80%)\n")
+            f.write(f"Tổng số file: {len(filenames)}\n")
+            f.write(f"Đã copy vào: {dest_dir}\n")
             f.write("=" * 70 + "\n")
-            f.write(f"Tổng số file: {len(files_with_similar)}\n")
-            f.write(f"Đã copy vào: {similar_dir}\n")
-            f.write("=" * 70 + "\n")
-            f.write(
-                "Lưu ý: Các file này có độ tương đồng > 60% nhưng không khớp chính xác.\n"
-            )
-            f.write("Cần kiểm tra để xác nhận dữ liệu có đúng hay không.\n")
-            f.write("=" * 70 + "\n\n")
+            if len(header) > 1:
+                for line in header[1:]:
+                    f.write(line + "\n")
+                f.write("=" * 70 + "\n")
+            f.write("\n")
 
-            for idx, json_filename in enumerate(sorted(files_with_similar), 1):
+            for idx, json_filename in enumerate(sorted_files, 1):
                 f.write(f"{idx}. {json_filename}\n")
+                for note in notes[json_filename]:
+                    f.write(f"   {note}\n")
 
-                # Copy JSON file
-                try:
-                    src_json = os.path.join(config.LABEL_DIR, json_filename)
-                    dst_json = os.path.join(similar_dir, json_filename)
-                    if os.path.exists(src_json):
-                        utils.ensure_dir_exists(os.path.dirname(dst_json))
-                        shutil.copy2(src_json, dst_json)
-                except Exception as e:
-                    f.write(f"   [Lỗi copy JSON: {e}]\n")
-
-                # Copy corresponding PDF file
-                try:
-                    base_name = os.path.splitext(json_filename)[0]
-                    pdf_filename = base_name + ".pdf"
-                    src_pdf = os.path.join(config.DATASET_DIR, pdf_filename)
-                    dst_pdf = os.path.join(similar_dir, pdf_filename)
-
-                    if os.path.exists(src_pdf):
-                        utils.ensure_dir_exists(os.path.dirname(dst_pdf))
-                        shutil.copy2(src_pdf, dst_pdf)
-                    else:
-                        f.write(f"   [PDF không tồn tại: {pdf_filename}]\n")
-                except Exception as e:
-                    f.write(f"   [Lỗi copy PDF: {e}]\n")
-
-        print(f"SIMILAR files report saved to: {similar_report}")
-        print(f"SIMILAR files copied to: {similar_dir}")
+        print(f"{status_name} files report saved to: {report_path}")
+        print(f"{status_name} files copied to: {dest_dir}")
 
     # Write CSV Report
+    if write_csv:
+        try:
+            with open(
+                config.VERIFY_REPORT_CSV, "w", newline="", encoding="utf-8"
+            ) as csvfile:
+                writer = csv.DictWriter(csvfile, fieldnames=RESULT_FIELDNAMES)
+                writer.writeheader()
+                for r in results:
+                    writer.writerow(r)
+            print(f"Detailed verification CSV saved to: {config.VERIFY_REPORT_CSV}")
+        except Exception as e:
+            print(f"Error writing CSV report: {e}")
+
+    # Indexed copy of the rows for the filter/report scripts
+    if config.VERIFY_RESULTS_DB_ENABLED:
+        results_db.write_results(results)
+
+    # Per-label verdicts (written after the CSV: readers compare their mtimes)
+    verdicts = list(file_verdicts(results))
     try:
-        with open(
-            config.VERIFY_REPORT_CSV, "w", newline="", encoding="utf-8"
-        ) as csvfile:
-            fieldnames = [
-                "Filename",
-                "Key",
-                "Value",
-                "Status",
-                "Score",
-                "BestMatchLine",
-                "DateFormat",
-                "ContextLine",
-            ]
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            for r in results:
-                writer.writerow(r)
-        print(f"Detailed verification CSV saved to: {config.VERIFY_REPORT_CSV}")
+        write_verdicts(verdicts)
+        print(f"Per-file verdicts saved to: {config.VERIFY_VERDICTS_CSV}")
     except Exception as e:
-        print(f"Error writing CSV report: {e}")
+        print(f"Error writing verdict table: {e}")
 
     # Write Summary Text Report
     try:
@@ -947,6 +1113,35 @@ def verify_labels():
     except Exception as e:
         print(f"Error writing TXT report: {e}")
 
+    utils.write_metrics(
+        "verify_labels",
+        {
+            "labels": total_files,
+            "json_errors": len(json_errors),
+            "stats": stats,
+            "statuses": dict(Counter(r["Status"] for r in results)),
+            "verdicts": dict(Counter(v["Verdict"] for v in verdicts)),
+            "files_with_missing": len(files_with_missing),
+            "files_with_na": len(files_with_na),
+            "files_with_similar": len(files_with_similar),
+            "outputs": {
+                "csv": config.VERIFY_REPORT_CSV,
+                "report": config.VERIFY_REPORT_TXT,
+                "verdicts": config.VERIFY_VERDICTS_CSV,
+            },
+        },
+        started,
+        sources=[config.VERIFY_REPORT_CSV],
+    )
+
 
 if __name__ == "__main__":
-    verify_labels()
+    parser = argparse.ArgumentParser(description="Verify labels against PDF text")
+    parser.add_argument(
+        "--shard",
+        type=utils.shard_arg,
+        help="Verify only shard i of N (e.g. 1/4), see merge_shards.py",
+    )
+    args = parser.parse_args()
+
+    verify_labels(shard=args.shard)
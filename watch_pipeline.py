@@ -0,0 +1,508 @@
+import os
+import csv
+import json
+import time
+import signal
+import argparse
+import threading
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import config
+import inventory
+import utils
+import extract_pdf
+import extract_and_verify
+import results_db
+import verify_labels
+
+# Optional: inotify/FSEvents/ReadDirectoryChangesW notifications via watchdog.
+# Without it the directories are polled every config.WATCH_POLL_INTERVAL seconds.
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+
+if Observer is not None:
+
+    class _WakeHandler(FileSystemEventHandler):
+        """
+        Wakes the watch loop on any change in the watched directories and
+        records the paths the events name.
+        """
+
+        def __init__(self, wake):
+            super().__init__()
+            self.wake = wake
+            self.lock = threading.Lock()
+            self.paths = set()
+
+        def on_any_event(self, event):
+            with self.lock:
+                self.paths.add(os.path.normpath(event.src_path))
+                dest_path = getattr(event, "dest_path", "")
+                if dest_path:
+                    self.paths.add(os.path.normpath(dest_path))
+            self.wake.set()
+
+        def take_paths(self):
+            """Returns the paths recorded since the last call."""
+            with self.lock:
+                paths, self.paths = self.paths, set()
+            return paths
+
+
+def _ignore_sigint():
+    # Ctrl+C reaches the whole process group; only the main process handles it
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def load_state(state_path):
+    """Returns {pdf relative path: [pdf size, pdf mtime_ns, json size, json mtime_ns]}."""
+    if not os.path.exists(state_path):
+        return {}
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Warning: ignoring unreadable watch state {state_path}: {e}")
+        return {}
+
+
+def save_state(state, state_path):
+    utils.ensure_dir_exists(os.path.dirname(state_path))
+    tmp_path = state_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp_path, state_path)
+
+
+def pair_signature(pdf_filename):
+    """(size, mtime_ns) of a PDF and its label, or None if either is missing."""
+    label_filename = os.path.splitext(pdf_filename)[0] + ".json"
+    try:
+        pdf_st = os.stat(os.path.join(config.DATASET_DIR, pdf_filename))
+        label_st = os.stat(os.path.join(config.LABEL_DIR, label_filename))
+    except OSError:
+        return None
+    return [pdf_st.st_size, pdf_st.st_mtime_ns, label_st.st_size, label_st.st_mtime_ns]
+
+
+def changed_dirs(previous, current):
+    """
+    Relative directories whose mtime differs between two snapshots of the same
+    root (created and removed directories included), or None without a previous
+    snapshot.
+    """
+    if previous is None:
+        return None
+    old, new = previous.dir_mtimes, current.dir_mtimes
+    return {d for d in old.keys() | new.keys() if old.get(d) != new.get(d)}
+
+
+class PairWatcher:
+    """
+    Finds complete PDF + label pairs that are not processed yet and whose
+    files have stopped changing (size and mtime stable for `settle` seconds).
+    """
+
+    def __init__(self, state, settle):
+        self.state = state
+        self.settle = settle
+        # {pdf relative path: (signature, time first seen with this signature)}
+        self.candidates = {}
+        self._dataset = None
+        self._labels = None
+        # Pair index, rebuilt when a snapshot changes: {pdf: label entry},
+        # {pdf: pdf entry} and the pdfs of each dataset/label directory
+        self._pairs = {}
+        self._pdf_entries = {}
+        self._pdf_dirs = {}
+        self._label_dirs = {}
+        self._label_pdfs = {}
+
+    def _index(self):
+        label_entries = {
+            os.path.splitext(e.rel_path)[0]: e for e in self._labels.files(".json")
+        }
+        self._pairs = {}
+        self._pdf_entries = {}
+        self._pdf_dirs = defaultdict(list)
+        self._label_dirs = defaultdict(list)
+        self._label_pdfs = defaultdict(list)
+        for pdf in self._dataset.files(".pdf"):
+            label = label_entries.get(os.path.splitext(pdf.rel_path)[0])
+            if label is None:
+                continue
+            self._pairs[pdf.rel_path] = label
+            self._pdf_entries[pdf.rel_path] = pdf
+            self._pdf_dirs[os.path.dirname(pdf.rel_path)].append(pdf.rel_path)
+            self._label_dirs[os.path.dirname(label.rel_path)].append(pdf.rel_path)
+            self._label_pdfs[label.rel_path].append(pdf.rel_path)
+
+    def _named_pdfs(self, changed):
+        """PDFs of the indexed pairs whose PDF or label is among absolute paths."""
+        dataset_root = os.path.normpath(config.DATASET_DIR) + os.sep
+        label_root = os.path.normpath(config.LABEL_DIR) + os.sep
+        pdfs = set()
+        for path in changed:
+            if path.startswith(dataset_root):
+                rel_path = path[len(dataset_root) :]
+                if rel_path in self._pairs:
+                    pdfs.add(rel_path)
+            elif path.startswith(label_root):
+                pdfs.update(self._label_pdfs.get(path[len(label_root) :], ()))
+        return pdfs
+
+    def scan(self, changed=None):
+        """
+        Rescans the directories (only those whose mtime changed) and returns the
+        pairs ready for processing.
+
+        Args:
+            changed: Absolute paths named by change events since the last scan
+                (an empty set when polling). Only settling candidates, pairs in
+                a directory whose mtime changed and pairs named here are looked
+                at; of those, pairs processed with their snapshot values are
+                skipped without a stat(). None stats every pair: a file
+                rewritten in place keeps its directory mtime, so only a stat()
+                (or an event) reveals it.
+        """
+        old_dataset, old_labels = self._dataset, self._labels
+        self._dataset = inventory.Inventory(
+            config.DATASET_DIR, *inventory.scan(config.DATASET_DIR, old_dataset)
+        )
+        self._labels = inventory.Inventory(
+            config.LABEL_DIR, *inventory.scan(config.LABEL_DIR, old_labels)
+        )
+        dataset_dirs = changed_dirs(old_dataset, self._dataset)
+        label_dirs = changed_dirs(old_labels, self._labels)
+        if dataset_dirs is None or label_dirs is None or dataset_dirs or label_dirs:
+            self._index()
+
+        named = set()
+        if changed is None or dataset_dirs is None or label_dirs is None:
+            pending = set(self._pairs)
+        else:
+            named = self._named_pdfs(changed)
+            pending = set(self.candidates) | named
+            for rel_dir in dataset_dirs:
+                pending.update(self._pdf_dirs.get(rel_dir, ()))
+            for rel_dir in label_dirs:
+                pending.update(self._label_dirs.get(rel_dir, ()))
+
+        now = time.monotonic()
+        ready = []
+        for filename in sorted(pending):
+            label = self._pairs.get(filename)
+            if label is None:
+                continue
+
+            # Processed pairs that are neither settling nor named by an event are
+            # skipped from their snapshot values (fresh for rescanned directories)
+            if (
+                changed is not None
+                and filename not in self.candidates
+                and filename not in named
+            ):
+                pdf = self._pdf_entries[filename]
+                snapshot_sig = [pdf.size, pdf.mtime_ns, label.size, label.mtime_ns]
+                if self.state.get(filename) == snapshot_sig:
+                    continue
+
+            # Files may still be growing inside an unchanged directory: stat again
+            sig = pair_signature(filename)
+            if sig is None or self.state.get(filename) == sig:
+                continue
+
+            previous = self.candidates.get(filename)
+            if previous is None or previous[0] != sig:
+                self.candidates[filename] = (sig, now)
+            elif now - previous[1] >= self.settle:
+                ready.append(filename)
+
+        # Forget candidates whose PDF or label disappeared
+        for filename in list(self.candidates):
+            if filename not in self._pairs:
+                del self.candidates[filename]
+
+        return ready
+
+    def first_seen(self, filename):
+        return self.candidates[filename][1]
+
+    def done(self, filename):
+        """Record a pair as processed with the signature it was processed with."""
+        candidate = self.candidates.pop(filename, None)
+        if candidate is not None:
+            self.state[filename] = candidate[0]
+
+
+def load_verified_labels():
+    """Returns the set of label filenames that have rows in the verification CSV."""
+    if not os.path.exists(config.VERIFY_REPORT_CSV):
+        return set()
+    with open(config.VERIFY_REPORT_CSV, "r", newline="", encoding="utf-8") as f:
+        return {row["Filename"] for row in csv.DictReader(f)}
+
+
+def remove_label_rows(csv_path, labels):
+    """
+    Rewrite a CSV without the rows whose Filename is in labels (streamed through
+    a temporary file, so readers never see a partial file).
+    """
+    tmp_path = csv_path + ".tmp"
+    with open(csv_path, "r", newline="", encoding="utf-8") as f_in, open(
+        tmp_path, "w", newline="", encoding="utf-8"
+    ) as f_out:
+        reader = csv.DictReader(f_in)
+        writer = csv.DictWriter(f_out, fieldnames=reader.fieldnames)
+        writer.writeheader()
+        writer.writerows(row for row in reader if row["Filename"] not in labels)
+    os.replace(tmp_path, csv_path)
+
+
+def append_verification_rows(results, verified_labels):
+    """
+    Append the rows of processed labels to the verification CSV (header written
+    if the file is new), to the results database if it is in sync with the CSV
+    and to the verdict table. A label processed again after a change has its
+    old rows replaced, so readers never count it twice.
+
+    Args:
+        results: process_pdf() results of verified labels
+        verified_labels: Set of label filenames in the CSV; updated in place
+    """
+    if not results:
+        return
+    labels = {r["label"] for r in results}
+    rows = [row for r in results for row in r["rows"]]
+    new_file = (
+        not os.path.exists(config.VERIFY_REPORT_CSV)
+        or os.path.getsize(config.VERIFY_REPORT_CSV) == 0
+    )
+    replaced = set() if new_file else labels & verified_labels
+    # Checked before the rewrite changes the CSV signature and mtime
+    db = None if new_file else results_db.connect()
+    verdicts_current = new_file or verify_labels.verdicts_current()
+
+    if replaced:
+        remove_label_rows(config.VERIFY_REPORT_CSV, replaced)
+    with open(config.VERIFY_REPORT_CSV, "a", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=verify_labels.RESULT_FIELDNAMES)
+        if new_file:
+            writer.writeheader()
+        writer.writerows(rows)
+    verified_labels.update(labels)
+
+    if new_file and config.VERIFY_RESULTS_DB_ENABLED:
+        results_db.write_results(rows)
+    elif db is not None:
+        results_db.append_results(db, rows, replace=replaced)
+
+    # An outdated table is left alone (readers rebuild it from the CSV)
+    if verdicts_current:
+        if replaced:
+            remove_label_rows(config.VERIFY_VERDICTS_CSV, replaced)
+        verify_labels.write_verdicts(
+            verify_labels.file_verdicts(rows), append=not new_file
+        )
+
+
+def append_log(lines):
+    with open(config.WATCH_LOG, "a", encoding="utf-8") as f:
+        for line in lines:
+            f.write(line + "\n")
+
+
+def route_result(r, verified):
+    """
+    Route one processed pair like the batch pipeline does and return its verdict:
+    image PDFs are moved (with the label) to the image folders, unreadable PDFs
+    are copied to the error folders, verified labels are added to `verified`
+    (written with append_verification_rows()).
+    """
+    filename = r["filename"]
+    if r["kind"] == "image":
+        extract_pdf.separate_image_files([filename], [])
+        return "IMAGE (moved to PDF_Image_Files)"
+    if r["kind"] == "error":
+        extract_pdf.copy_files_and_labels(
+            [filename], config.PDF_ERROR_FILES_DIR, config.PDF_ERROR_LABELS_DIR
+        )
+        return f"ERROR ({r['error']})"
+    if r["label_error"] is not None:
+        return f"LABEL ERROR ({r['label_error']})"
+
+    verified.append(r)
+    return extract_and_verify.format_verdict(r["rows"])
+
+
+def watch(interval=None, settle=None, workers=None, once=False, skip_existing=False):
+    """
+    Watch DATASET_DIR and LABEL_DIR and push every new, complete PDF + label pair
+    through extraction, verification and routing as soon as it stops changing.
+
+    Args:
+        interval: Seconds between scans (default: config.WATCH_POLL_INTERVAL)
+        settle: Seconds a pair must stay unchanged before processing
+        workers: Worker processes (default: config.WATCH_WORKERS)
+        once: Process the pairs present now, then exit
+        skip_existing: Mark pairs present at startup as processed
+    """
+    interval = interval if interval is not None else config.WATCH_POLL_INTERVAL
+    settle = settle if settle is not None else config.WATCH_SETTLE_SECONDS
+    workers = workers or config.WATCH_WORKERS
+    max_in_flight = workers * 2
+
+    for path in (
+        config.REVIEW_DIR,
+        config.EXTRACTED_TEXT_DIR,
+        config.PDF_ERROR_FILES_DIR,
+        config.PDF_ERROR_LABELS_DIR,
+        config.PDF_IMAGE_FILES_DIR,
+        config.PDF_IMAGE_LABELS_DIR,
+    ):
+        utils.ensure_dir_exists(path)
+
+    state = load_state(config.WATCH_STATE_FILE)
+    watcher = PairWatcher(state, settle)
+    verified_labels = load_verified_labels()
+
+    if skip_existing:
+        # The first scan only registers candidates; record them all as processed
+        watcher.scan()
+        for filename in list(watcher.candidates):
+            watcher.done(filename)
+        save_state(state, config.WATCH_STATE_FILE)
+        print(f"Skipping {len(state)} existing pairs")
+
+    wake = threading.Event()
+    observer = None
+    if Observer is not None and not once:
+        observer = Observer()
+        handler = _WakeHandler(wake)
+        for path in (config.DATASET_DIR, config.LABEL_DIR):
+            observer.schedule(handler, path, recursive=True)
+        observer.start()
+        mode = "watchdog"
+    else:
+        mode = "polling"
+
+    print(">>> WATCH MODE STARTED")
+    print(f"Watching: {config.DATASET_DIR} + {config.LABEL_DIR} ({mode})")
+    print(f"Workers: {workers} | Settle: {settle}s | Verdict log: {config.WATCH_LOG}")
+    if not once:
+        print("Press Ctrl+C to stop.")
+
+    in_flight = {}  # {future: (filename, time first seen)}
+    processed = 0
+    last_full_scan = None
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_ignore_sigint)
+    try:
+        while True:
+            # Only pairs in directories whose mtime changed (and, with watchdog,
+            # pairs named by events) are stat()ed; a periodic full pass catches
+            # files rewritten in place and missed events
+            changed = handler.take_paths() if observer is not None else set()
+            now = time.monotonic()
+            if (
+                last_full_scan is None
+                or now - last_full_scan >= config.WATCH_FULL_SCAN_INTERVAL
+            ):
+                changed = None
+                last_full_scan = now
+            ready = watcher.scan(changed)
+            running = {filename for filename, _ in in_flight.values()}
+            for filename in ready:
+                if len(in_flight) >= max_in_flight:
+                    break
+                if filename in running:
+                    continue
+                future = pool.submit(extract_and_verify.process_pdf, filename, True)
+                in_flight[future] = (filename, watcher.first_seen(filename))
+                running.add(filename)
+
+            finished = [f for f in in_flight if f.done()]
+            log_lines = []
+            verified = []
+            for future in finished:
+                filename, first_seen = in_flight.pop(future)
+                try:
+                    verdict = route_result(future.result(), verified)
+                except Exception as e:
+                    verdict = f"ERROR ({e})"
+                # A later change to either file triggers a new run
+                watcher.done(filename)
+                processed += 1
+                latency = time.monotonic() - first_seen
+                stamp = time.strftime("%Y-%m-%d %H:%M:%S")
+                log_lines.append(f"{stamp} | {filename} | {verdict} | {latency:.1f}s")
+                print(f"[{verdict}] {filename} ({latency:.1f}s)")
+
+            if finished:
+                try:
+                    append_verification_rows(verified, verified_labels)
+                except Exception as e:
+                    print(f"Error writing verification results: {e}")
+                append_log(log_lines)
+                save_state(state, config.WATCH_STATE_FILE)
+
+            if once and not watcher.candidates and not in_flight:
+                break
+
+            # Results and settling pairs are checked often; idle scans every interval
+            if in_flight or watcher.candidates:
+                timeout = min(interval, max(settle / 4, 0.1))
+            else:
+                timeout = interval
+            wake.wait(timeout)
+            wake.clear()
+    except KeyboardInterrupt:
+        print("\nStopping watch mode...")
+    finally:
+        if observer is not None:
+            observer.stop()
+            observer.join()
+        pool.shutdown(wait=True, cancel_futures=True)
+        save_state(state, config.WATCH_STATE_FILE)
+
+    print(f"\n>>> WATCH MODE STOPPED. Pairs processed: {processed}")
+    return processed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Process new PDF/label pairs as they land in the dataset"
+    )
+    parser.add_argument(
+        "--interval", type=float, default=None, help="Seconds between scans"
+    )
+    parser.add_argument(
+        "--settle",
+        type=float,
+        default=None,
+        help="Seconds a pair must stay unchanged before processing",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="Worker processes (default: config)"
+    )
+    parser.add_argument(
+        "--once",
+        action="store_true",
+        help="Process the pairs present now, then exit",
+    )
+    parser.add_argument(
+        "--skip-existing",
+        action="store_true",
+        help="Only process pairs that arrive after startup",
+    )
+    args = parser.parse_args()
+
+    watch(
+        interval=args.interval,
+        settle=args.settle,
+        workers=args.workers,
+        once=args.once,
+        skip_existing=args.skip_existing,
+    )